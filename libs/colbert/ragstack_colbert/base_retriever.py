@@ -141,3 +141,167 @@ class BaseRetriever(ABC):
                 each representing a text chunk that is relevant to the query,
                 along with its similarity score.
         """
+
+    # handles LangChain MMR search by vector
+    def mmr_embedding_search(
+        self,
+        query_embedding: Embedding,
+        k: int | None = None,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        include_embedding: bool = False,
+        **kwargs: Any,
+    ) -> list[tuple[Chunk, float]]:
+        """Search for diverse relevant text chunks based on a query embedding.
+
+        Retrieves the `fetch_k` text chunks most relevant to a given query and
+        selects `k` of them using maximal marginal relevance (MMR), which trades
+        off relevance to the query against similarity to the chunks already
+        selected.
+
+        Args:
+            query_embedding: The query embedding to search for relevant
+                text chunks.
+            k: The number of top results to retrieve.
+            fetch_k: The number of candidate chunks to select from.
+            lambda_mult: Number between 0 and 1 that determines the degree
+                of diversity among the results with 0 corresponding to maximum
+                diversity and 1 to minimum diversity.
+            include_embedding: Optional (default False) flag to
+                include the embedding vectors in the returned chunks
+            **kwargs: Additional parameters that implementations might require
+                for customized retrieval operations.
+
+        Returns:
+            A list of retrieved Chunk, float Tuples, in selection order,
+                each representing a text chunk that is relevant to the query,
+                along with its similarity score.
+
+        Raises:
+            NotImplementedError: If the retriever doesn't support MMR searches.
+        """
+        raise NotImplementedError(f"{type(self).__name__} doesn't support MMR searches")
+
+    # handles LangChain async MMR search by vector
+    async def ammr_embedding_search(
+        self,
+        query_embedding: Embedding,
+        k: int | None = None,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        include_embedding: bool = False,
+        **kwargs: Any,
+    ) -> list[tuple[Chunk, float]]:
+        """Search for diverse relevant text chunks based on a query embedding.
+
+        Retrieves the `fetch_k` text chunks most relevant to a given query and
+        selects `k` of them using maximal marginal relevance (MMR), which trades
+        off relevance to the query against similarity to the chunks already
+        selected.
+
+        Args:
+            query_embedding: The query embedding to search for relevant
+                text chunks.
+            k: The number of top results to retrieve.
+            fetch_k: The number of candidate chunks to select from.
+            lambda_mult: Number between 0 and 1 that determines the degree
+                of diversity among the results with 0 corresponding to maximum
+                diversity and 1 to minimum diversity.
+            include_embedding: Optional (default False) flag to
+                include the embedding vectors in the returned chunks
+            **kwargs: Additional parameters that implementations might require
+                for customized retrieval operations.
+
+        Returns:
+            A list of retrieved Chunk, float Tuples, in selection order,
+                each representing a text chunk that is relevant to the query,
+                along with its similarity score.
+
+        Raises:
+            NotImplementedError: If the retriever doesn't support MMR searches.
+        """
+        raise NotImplementedError(f"{type(self).__name__} doesn't support MMR searches")
+
+    # handles LangChain MMR search
+    def mmr_text_search(
+        self,
+        query_text: str,
+        k: int | None = None,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        query_maxlen: int | None = None,
+        include_embedding: bool = False,
+        **kwargs: Any,
+    ) -> list[tuple[Chunk, float]]:
+        """Search for diverse relevant text chunks based on a query text.
+
+        Retrieves the `fetch_k` text chunks most relevant to a given query and
+        selects `k` of them using maximal marginal relevance (MMR), which trades
+        off relevance to the query against similarity to the chunks already
+        selected.
+
+        Args:
+            query_text: The query text to search for relevant text chunks.
+            k: The number of top results to retrieve.
+            fetch_k: The number of candidate chunks to select from.
+            lambda_mult: Number between 0 and 1 that determines the degree
+                of diversity among the results with 0 corresponding to maximum
+                diversity and 1 to minimum diversity.
+            query_maxlen: The maximum length of the query to consider.
+                If None, the maxlen will be dynamically generated.
+            include_embedding: Optional (default False) flag to
+                include the embedding vectors in the returned chunks
+            **kwargs: Additional parameters that implementations might require
+                for customized retrieval operations.
+
+        Returns:
+            A list of retrieved Chunk, float Tuples, in selection order,
+                each representing a text chunk that is relevant to the query,
+                along with its similarity score.
+
+        Raises:
+            NotImplementedError: If the retriever doesn't support MMR searches.
+        """
+        raise NotImplementedError(f"{type(self).__name__} doesn't support MMR searches")
+
+    # handles LangChain async MMR search
+    async def ammr_text_search(
+        self,
+        query_text: str,
+        k: int | None = None,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        query_maxlen: int | None = None,
+        include_embedding: bool = False,
+        **kwargs: Any,
+    ) -> list[tuple[Chunk, float]]:
+        """Search for diverse relevant text chunks based on a query text.
+
+        Retrieves the `fetch_k` text chunks most relevant to a given query and
+        selects `k` of them using maximal marginal relevance (MMR), which trades
+        off relevance to the query against similarity to the chunks already
+        selected.
+
+        Args:
+            query_text: The query text to search for relevant text chunks.
+            k: The number of top results to retrieve.
+            fetch_k: The number of candidate chunks to select from.
+            lambda_mult: Number between 0 and 1 that determines the degree
+                of diversity among the results with 0 corresponding to maximum
+                diversity and 1 to minimum diversity.
+            query_maxlen: The maximum length of the query to consider.
+                If None, the maxlen will be dynamically generated.
+            include_embedding: Optional (default False) flag to
+                include the embedding vectors in the returned chunks
+            **kwargs: Additional parameters that implementations might require
+                for customized retrieval operations.
+
+        Returns:
+            A list of retrieved Chunk, float Tuples, in selection order,
+                each representing a text chunk that is relevant to the query,
+                along with its similarity score.
+
+        Raises:
+            NotImplementedError: If the retriever doesn't support MMR searches.
+        """
+        raise NotImplementedError(f"{type(self).__name__} doesn't support MMR searches")
@@ -57,6 +57,7 @@ class BaseVectorStore(ABC):
         texts: list[str],
         metadatas: list[Metadata] | None,
         doc_id: str | None = None,
+        doc_ids: list[str] | None = None,
     ) -> list[tuple[str, int]]:
         """Adds text chunks to the vector store.
 
@@ -69,6 +70,9 @@ class BaseVectorStore(ABC):
                 stored. If provided, these are set 1 to 1 with the texts list.
             doc_id (Optional[str]): The document id associated with the texts.
                 If not provided, it is generated.
+            doc_ids (Optional[List[str]]): An optional list of document ids, set 1 to
+                1 with the texts list, to add the texts of several documents at once.
+                Cannot be used together with `doc_id`.
 
         Returns:
             a list of tuples: (doc_id, chunk_id)
@@ -111,6 +115,7 @@ class BaseVectorStore(ABC):
         metadatas: list[Metadata] | None,
         doc_id: str | None = None,
         concurrent_inserts: int = 100,
+        doc_ids: list[str] | None = None,
     ) -> list[tuple[str, int]]:
         """Adds text chunks to the vector store.
 
@@ -123,6 +128,9 @@ class BaseVectorStore(ABC):
                 stored. If provided, these are set 1 to 1 with the texts list.
             doc_id: The document id associated with the texts.
                 If not provided, it is generated.
+            doc_ids: An optional list of document ids, set 1 to 1 with the texts
+                list, to add the texts of several documents at once.
+                Cannot be used together with `doc_id`.
             concurrent_inserts: How many concurrent inserts to make to
                 the database. Defaults to 100.
 
@@ -10,7 +10,7 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from collections import defaultdict
+from collections import defaultdict, deque
 from typing import TYPE_CHECKING, Any, Awaitable
 
 import cassio
@@ -23,7 +23,7 @@ from .constant import DEFAULT_COLBERT_DIM
 from .objects import Chunk, Vector
 
 if TYPE_CHECKING:
-    from cassandra.cluster import Session
+    from cassandra.cluster import ResponseFuture, Session
 
 
 class CassandraDatabaseError(Exception):
@@ -133,52 +133,80 @@ class CassandraDatabase(BaseDatabase):
             )
 
     @override
-    def add_chunks(self, chunks: list[Chunk]) -> list[tuple[str, int]]:
-        failed_chunks: list[tuple[str, int]] = []
-        success_chunks: list[tuple[str, int]] = []
+    def add_chunks(
+        self, chunks: list[Chunk], concurrent_inserts: int = 100
+    ) -> list[tuple[str, int]]:
+        failed_chunks: dict[tuple[str, int], None] = {}
+        pending: deque[tuple[Chunk, int, ResponseFuture]] = deque()
+        # Embedding rows whose chunk body was written, and can be written next.
+        ready: deque[tuple[Chunk, int, Vector]] = deque()
 
-        for chunk in chunks:
-            doc_id = chunk.doc_id
-            chunk_id = chunk.chunk_id
+        def wait_oldest() -> None:
+            chunk, embedding_id, future = pending.popleft()
+            try:
+                future.result()
+            except Exception as exp:  # noqa: BLE001
+                self._log_insert_error(
+                    doc_id=chunk.doc_id,
+                    chunk_id=chunk.chunk_id,
+                    embedding_id=embedding_id,
+                    exp=exp,
+                )
+                failed_chunks[(chunk.doc_id, chunk.chunk_id)] = None
+                return
+            # The embeddings of a chunk are only written once its body is, so
+            # that a failed chunk doesn't leave vectors without a body.
+            if embedding_id == -1 and chunk.embedding:
+                ready.extend(
+                    (chunk, index, vector)
+                    for index, vector in enumerate(chunk.embedding)
+                )
 
+        def put(chunk: Chunk, embedding_id: int, vector: Vector | None) -> None:
+            if len(pending) >= concurrent_inserts:
+                wait_oldest()
+            columns: dict[str, Any] = (
+                {"body_blob": chunk.text, "metadata": chunk.metadata}
+                if vector is None
+                else {"vector": vector}
+            )
             try:
-                self._table.put(
-                    partition_id=doc_id,
-                    row_id=(chunk_id, -1),
-                    body_blob=chunk.text,
-                    metadata=chunk.metadata,
+                future = self._table.put_async(
+                    partition_id=chunk.doc_id,
+                    row_id=(chunk.chunk_id, embedding_id),
+                    **columns,
                 )
             except Exception as exp:  # noqa: BLE001
                 self._log_insert_error(
-                    doc_id=doc_id, chunk_id=chunk_id, embedding_id=-1, exp=exp
+                    doc_id=chunk.doc_id,
+                    chunk_id=chunk.chunk_id,
+                    embedding_id=embedding_id,
+                    exp=exp,
                 )
-                failed_chunks.append((doc_id, chunk_id))
-                continue
+                failed_chunks[(chunk.doc_id, chunk.chunk_id)] = None
+                return
+            pending.append((chunk, embedding_id, future))
 
-            if chunk.embedding:
-                for embedding_id, vector in enumerate(chunk.embedding):
-                    try:
-                        self._table.put(
-                            partition_id=doc_id,
-                            row_id=(chunk_id, embedding_id),
-                            vector=vector,
-                        )
-                    except Exception as exp:  # noqa: BLE001
-                        self._log_insert_error(
-                            doc_id=doc_id, chunk_id=chunk_id, embedding_id=-1, exp=exp
-                        )
-                        failed_chunks.append((doc_id, chunk_id))
-                        continue
+        # Rows are written with up to `concurrent_inserts` requests in flight, so
+        # the partitions of different documents are written concurrently.
+        for chunk in chunks:
+            put(chunk, -1, None)
+            while ready:
+                put(*ready.popleft())
 
-            success_chunks.append((doc_id, chunk_id))
+        while pending or ready:
+            if ready:
+                put(*ready.popleft())
+            else:
+                wait_oldest()
 
         if len(failed_chunks) > 0:
             raise CassandraDatabaseError(
-                f"add failed for these chunks: {failed_chunks}. "
+                f"add failed for these chunks: {list(failed_chunks)}. "
                 f"See error logs for more info."
             )
 
-        return success_chunks
+        return [(chunk.doc_id, chunk.chunk_id) for chunk in chunks]
 
     async def _limited_put(
         self,
@@ -12,6 +12,11 @@ with support for both CPU and GPU computing environments.
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+
 from colbert.infra import ColBERTConfig
 from typing_extensions import override
 
@@ -31,10 +36,15 @@ class ColbertEmbeddingModel(BaseEmbeddingModel):
 
     The class supports both GPU and CPU operations, with GPU usage recommended for
     performance efficiency.
+
+    The model can be loaded in a background thread (`background_load`), in which
+    case `is_ready`, `wait_until_ready` and `await_ready` tell when it can serve
+    requests. Embedding calls made before that block until the model is loaded.
     """
 
     _query_maxlen: int
     _chunk_batch_size: int
+    _encoder_future: Future[TextEncoder]
 
     def __init__(
         self,
@@ -46,6 +56,9 @@ class ColbertEmbeddingModel(BaseEmbeddingModel):
         query_maxlen: int | None = None,
         verbose: int = 3,  # 3 is the default on ColBERT checkpoint
         chunk_batch_size: int = 640,
+        background_load: bool = False,
+        warm_up_batch_size: int = 0,
+        weights_path: str | None = None,
     ):
         """Initializes a new instance of the ColbertEmbeddingModel class.
 
@@ -67,6 +80,15 @@ class ColbertEmbeddingModel(BaseEmbeddingModel):
             verbose: Verbosity level for logging.
             chunk_batch_size: The number of chunks to batch during
                 embedding. Defaults to 640.
+            background_load: Whether to load the model in a background thread
+                instead of blocking the constructor. Defaults to False.
+            warm_up_batch_size: Number of dummy chunks to encode, along with a
+                dummy query, once the model is loaded. This moves the lazy
+                initialization costs out of the first requests. Defaults to 0
+                (no warm-up).
+            weights_path: Optional path to a safetensors file with the model
+                weights. On CPU, the weights are memory-mapped so that workers
+                on the same host share the memory pages.
         """
         if query_maxlen is None:
             query_maxlen = -1
@@ -81,7 +103,68 @@ class ColbertEmbeddingModel(BaseEmbeddingModel):
             nranks=nranks,
             checkpoint=checkpoint,
         )
-        self._encoder = TextEncoder(config=colbert_config, verbose=verbose)
+        self._encoder_future = Future()
+        load_args = (colbert_config, verbose, warm_up_batch_size, weights_path)
+        if background_load:
+            threading.Thread(
+                target=self._load_encoder,
+                args=load_args,
+                name="colbert-model-loader",
+                daemon=True,
+            ).start()
+        else:
+            self._load_encoder(*load_args)
+            # Raise any loading error from the constructor.
+            self._encoder_future.result()
+
+    def _load_encoder(
+        self,
+        colbert_config: ColBERTConfig,
+        verbose: int,
+        warm_up_batch_size: int,
+        weights_path: str | None,
+    ) -> None:
+        try:
+            encoder = TextEncoder(
+                config=colbert_config, verbose=verbose, weights_path=weights_path
+            )
+            if warm_up_batch_size > 0:
+                encoder.warm_up(
+                    batch_size=warm_up_batch_size, query_maxlen=self._query_maxlen
+                )
+        except Exception as e:
+            logging.exception("Failed to load the ColBERT model")
+            self._encoder_future.set_exception(e)
+        else:
+            self._encoder_future.set_result(encoder)
+
+    @property
+    def _encoder(self) -> TextEncoder:
+        return self._encoder_future.result()
+
+    def is_ready(self) -> bool:
+        """Returns whether the model is loaded (and warmed up)."""
+        return self._encoder_future.done() and self._encoder_future.exception() is None
+
+    def wait_until_ready(self, timeout: float | None = None) -> None:
+        """Blocks until the model is loaded (and warmed up).
+
+        Args:
+            timeout: Optional maximum number of seconds to wait.
+
+        Raises:
+            TimeoutError: If the model is not loaded within `timeout`.
+            Exception: Any error raised while loading the model.
+        """
+        self._encoder_future.result(timeout=timeout)
+
+    async def await_ready(self) -> None:
+        """Waits, without blocking the event loop, for the model to be loaded.
+
+        Raises:
+            Exception: Any error raised while loading the model.
+        """
+        await asyncio.wrap_future(self._encoder_future)
 
     @override
     def embed_texts(self, texts: list[str]) -> list[Embedding]:
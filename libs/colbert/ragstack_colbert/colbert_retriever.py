@@ -112,6 +112,61 @@ def max_similarity_torch(
     return float(max_sim.item())
 
 
+def pad_chunk_embeddings(
+    chunk_embeddings: list[Embedding],
+    device: torch.device | None = None,
+    is_fp16: bool = False,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Stacks chunk embeddings of different lengths into a padded tensor.
+
+    Args:
+        chunk_embeddings: The embeddings to stack, each a list of token vectors.
+        device: Optional device to move the tensors to. Defaults to the CPU.
+        is_fp16: A flag indicating whether to use half-precision floating point
+            for the embeddings. Defaults to False.
+
+    Returns:
+        A tuple of the (N, L, dim) padded embeddings tensor, with L the maximum
+            number of tokens, and the (N, L) boolean mask of the real tokens.
+    """
+    tensors = [torch.tensor(e, dtype=torch.float32) for e in chunk_embeddings]
+    padded = torch.nn.utils.rnn.pad_sequence(tensors, batch_first=True)
+    lengths = torch.tensor([t.shape[0] for t in tensors])
+    mask = torch.arange(padded.shape[1]).unsqueeze(0) < lengths.unsqueeze(1)
+
+    if device is not None:
+        padded = padded.to(device)
+        mask = mask.to(device)
+    if is_fp16:
+        padded = padded.half()
+
+    return padded, mask
+
+
+def chunks_max_similarity(
+    padded_embeddings: torch.Tensor,
+    mask: torch.Tensor,
+    other_embedding: torch.Tensor,
+) -> torch.Tensor:
+    """Calculates the MaxSim of a batch of chunks against another chunk.
+
+    For each token of each chunk, the maximum dot product with the tokens of the
+    other chunk is computed. These are averaged over the chunk tokens, which
+    keeps the scores comparable between chunks of different lengths.
+
+    Args:
+        padded_embeddings: The (N, L, dim) padded embeddings of the chunks.
+        mask: The (N, L) boolean mask of the real tokens of the chunks.
+        other_embedding: The (M, dim) token embedding of the other chunk.
+
+    Returns:
+        A (N,) tensor with the average MaxSim of each chunk.
+    """
+    sims = torch.matmul(padded_embeddings, other_embedding.T)
+    token_max = torch.amax(sims, dim=2).float().masked_fill(~mask, 0.0)
+    return token_max.sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+
 class ColbertRetriever(BaseRetriever):
     """ColBERT Retriever.
 
@@ -216,6 +271,91 @@ class ColbertRetriever(BaseRetriever):
             )
         return chunk_scores
 
+    async def _search_and_score_chunks(
+        self, query_embedding: Embedding
+    ) -> tuple[list[Chunk], dict[Chunk, float]]:
+        """Finds the chunks relevant to the query and scores them.
+
+        Returns:
+            A tuple of the relevant chunks with `doc_id`, `chunk_id` and `embedding`
+                set, and of their MaxSim scores.
+        """
+        top_k = max(math.floor(len(query_embedding) / 2), 16)
+        logging.debug(
+            "based on query length of %s tokens, retrieving %s results per "
+            "token-embedding",
+            len(query_embedding),
+            top_k,
+        )
+
+        # search for relevant chunks (only with `doc_id` and `chunk_id` set)
+        relevant_chunks: set[Chunk] = await self._query_relevant_chunks(
+            query_embedding=query_embedding, top_k=top_k
+        )
+
+        # get the embedding for each chunk
+        # (with `doc_id`, `chunk_id`, and `embedding` set)
+        chunk_embeddings: list[Chunk] = await self._get_chunk_embeddings(
+            chunks=relevant_chunks
+        )
+
+        # score the chunks using max_similarity
+        chunk_scores: dict[Chunk, float] = self._score_chunks(
+            query_embedding=query_embedding,
+            chunk_embeddings=chunk_embeddings,
+        )
+
+        return chunk_embeddings, chunk_scores
+
+    def _select_mmr_chunks(
+        self,
+        query_embedding: Embedding,
+        candidates: list[Chunk],
+        chunk_scores: dict[Chunk, float],
+        k: int,
+        lambda_mult: float,
+    ) -> list[Chunk]:
+        """Selects `k` of the candidate chunks using maximal marginal relevance.
+
+        The relevance of a chunk is its MaxSim score averaged over the query
+        tokens. Its redundancy is the highest chunk-to-chunk MaxSim against the
+        chunks already selected, computed from the embeddings fetched for scoring.
+
+        Returns:
+            The selected chunks, in selection order.
+        """
+        if not candidates or k <= 0:
+            return []
+
+        device = torch.device("cuda") if self._is_cuda else None
+        padded, mask = pad_chunk_embeddings(
+            [c.embedding or [] for c in candidates],
+            device=device,
+            is_fp16=self._is_cuda and self._is_fp16,
+        )
+        relevance = torch.tensor(
+            [chunk_scores[c] for c in candidates], device=padded.device
+        ) / max(len(query_embedding), 1)
+        redundancy = torch.zeros_like(relevance)
+        available = torch.ones_like(relevance, dtype=torch.bool)
+
+        selected: list[Chunk] = []
+        for _ in range(min(k, len(candidates))):
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+            scores = scores.masked_fill(~available, float("-inf"))
+            index = int(torch.argmax(scores).item())
+
+            selected.append(candidates[index])
+            available[index] = False
+
+            similarity = chunks_max_similarity(padded, mask, padded[index][mask[index]])
+            if len(selected) == 1:
+                redundancy = similarity
+            else:
+                redundancy = torch.maximum(redundancy, similarity)
+
+        return selected
+
     async def _get_chunk_data(
         self,
         chunks: list[Chunk],
@@ -280,29 +420,9 @@ class ColbertRetriever(BaseRetriever):
     ) -> list[tuple[Chunk, float]]:
         if k is None:
             k = 5
-        top_k = max(math.floor(len(query_embedding) / 2), 16)
-        logging.debug(
-            "based on query length of %s tokens, retrieving %s results per "
-            "token-embedding",
-            len(query_embedding),
-            top_k,
-        )
 
-        # search for relevant chunks (only with `doc_id` and `chunk_id` set)
-        relevant_chunks: set[Chunk] = await self._query_relevant_chunks(
-            query_embedding=query_embedding, top_k=top_k
-        )
-
-        # get the embedding for each chunk
-        # (with `doc_id`, `chunk_id`, and `embedding` set)
-        chunk_embeddings: list[Chunk] = await self._get_chunk_embeddings(
-            chunks=relevant_chunks
-        )
-
-        # score the chunks using max_similarity
-        chunk_scores: dict[Chunk, float] = self._score_chunks(
-            query_embedding=query_embedding,
-            chunk_embeddings=chunk_embeddings,
+        _, chunk_scores = await self._search_and_score_chunks(
+            query_embedding=query_embedding
         )
 
         # only keep the top k sorted results
@@ -350,3 +470,107 @@ class ColbertRetriever(BaseRetriever):
                 include_embedding=include_embedding,
             )
         )
+
+    @override
+    async def ammr_embedding_search(
+        self,
+        query_embedding: Embedding,
+        k: int | None = 5,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        include_embedding: bool = False,
+        **kwargs: Any,
+    ) -> list[tuple[Chunk, float]]:
+        if k is None:
+            k = 5
+
+        chunk_embeddings, chunk_scores = await self._search_and_score_chunks(
+            query_embedding=query_embedding
+        )
+
+        # only consider the top fetch_k sorted results as MMR candidates
+        candidates: list[Chunk] = sorted(
+            chunk_scores, key=lambda c: chunk_scores.get(c, 0), reverse=True
+        )[:fetch_k]
+
+        selected_chunks = self._select_mmr_chunks(
+            query_embedding=query_embedding,
+            candidates=candidates,
+            chunk_scores=chunk_scores,
+            k=k,
+            lambda_mult=lambda_mult,
+        )
+
+        chunks: list[Chunk] = await self._get_chunk_data(
+            chunks=selected_chunks, include_embedding=include_embedding
+        )
+
+        return [(chunk, chunk_scores[chunk]) for chunk in chunks]
+
+    @override
+    async def ammr_text_search(
+        self,
+        query_text: str,
+        k: int | None = 5,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        query_maxlen: int | None = None,
+        include_embedding: bool = False,
+        **kwargs: Any,
+    ) -> list[tuple[Chunk, float]]:
+        query_embedding = self._embedding_model.embed_query(
+            query=query_text, query_maxlen=query_maxlen
+        )
+
+        return await self.ammr_embedding_search(
+            query_embedding=query_embedding,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            include_embedding=include_embedding,
+            **kwargs,
+        )
+
+    @override
+    def mmr_embedding_search(
+        self,
+        query_embedding: Embedding,
+        k: int | None = 5,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        include_embedding: bool = False,
+        **kwargs: Any,
+    ) -> list[tuple[Chunk, float]]:
+        return asyncio.run(
+            self.ammr_embedding_search(
+                query_embedding=query_embedding,
+                k=k,
+                fetch_k=fetch_k,
+                lambda_mult=lambda_mult,
+                include_embedding=include_embedding,
+                **kwargs,
+            )
+        )
+
+    @override
+    def mmr_text_search(
+        self,
+        query_text: str,
+        k: int | None = 5,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        query_maxlen: int | None = None,
+        include_embedding: bool = False,
+        **kwargs: Any,
+    ) -> list[tuple[Chunk, float]]:
+        return asyncio.run(
+            self.ammr_text_search(
+                query_text=query_text,
+                k=k,
+                fetch_k=fetch_k,
+                lambda_mult=lambda_mult,
+                query_maxlen=query_maxlen,
+                include_embedding=include_embedding,
+                **kwargs,
+            )
+        )
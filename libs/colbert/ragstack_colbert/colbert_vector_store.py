@@ -10,6 +10,7 @@ operations.
 from __future__ import annotations
 
 import uuid
+from collections import defaultdict
 from typing import TYPE_CHECKING
 
 from typing_extensions import override
@@ -56,23 +57,35 @@ class ColbertVectorStore(BaseVectorStore):
         texts: list[str],
         metadatas: list[Metadata] | None = None,
         doc_id: str | None = None,
+        doc_ids: list[str] | None = None,
     ) -> list[Chunk]:
         embedding_model = self._validate_embedding_model()
 
         if metadatas is not None and len(texts) != len(metadatas):
             raise ValueError("Length of texts and metadatas must match.")
 
-        if doc_id is None:
-            doc_id = str(uuid.uuid4())
+        if doc_ids is None:
+            doc_ids = [doc_id or str(uuid.uuid4())] * len(texts)
+        elif doc_id is not None:
+            raise ValueError("Only one of doc_id and doc_ids can be set.")
+        elif len(texts) != len(doc_ids):
+            raise ValueError("Length of texts and doc_ids must match.")
 
+        # All the texts are embedded together, so the documents share the
+        # encoder batches.
         embeddings = embedding_model.embed_texts(texts=texts)
 
+        # Chunks are numbered in order within each document.
+        chunk_counts: dict[str, int] = defaultdict(int)
+
         chunks: list[Chunk] = []
         for i, text in enumerate(texts):
+            chunk_id = chunk_counts[doc_ids[i]]
+            chunk_counts[doc_ids[i]] += 1
             chunks.append(
                 Chunk(
-                    doc_id=doc_id,
-                    chunk_id=i,
+                    doc_id=doc_ids[i],
+                    chunk_id=chunk_id,
                     text=text,
                     metadata={} if metadatas is None else metadatas[i],
                     embedding=embeddings[i],
@@ -90,8 +103,11 @@ class ColbertVectorStore(BaseVectorStore):
         texts: list[str],
         metadatas: list[Metadata] | None = None,
         doc_id: str | None = None,
+        doc_ids: list[str] | None = None,
     ) -> list[tuple[str, int]]:
-        chunks = self._build_chunks(texts=texts, metadatas=metadatas, doc_id=doc_id)
+        chunks = self._build_chunks(
+            texts=texts, metadatas=metadatas, doc_id=doc_id, doc_ids=doc_ids
+        )
         return self._database.add_chunks(chunks=chunks)
 
     @override
@@ -113,8 +129,11 @@ class ColbertVectorStore(BaseVectorStore):
         metadatas: list[Metadata] | None = None,
         doc_id: str | None = None,
         concurrent_inserts: int = 100,
+        doc_ids: list[str] | None = None,
     ) -> list[tuple[str, int]]:
-        chunks = self._build_chunks(texts=texts, metadatas=metadatas, doc_id=doc_id)
+        chunks = self._build_chunks(
+            texts=texts, metadatas=metadatas, doc_id=doc_id, doc_ids=doc_ids
+        )
         return await self._database.aadd_chunks(
             chunks=chunks, concurrent_inserts=concurrent_inserts
         )
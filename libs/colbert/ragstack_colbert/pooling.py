@@ -0,0 +1,69 @@
+"""Pooling of ColBERT token embeddings into single vectors.
+
+This module collapses the per-token embeddings produced by the ColBERT model into
+one fixed-size vector per text. The pooled vectors can be used wherever a
+single-vector representation is expected, such as a cheap first-stage vector index
+or an embedding cache, without running the model a second time.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Literal, cast
+
+import torch
+
+if TYPE_CHECKING:
+    from .objects import Embedding, Vector
+
+Pooling = Literal["mean", "max"]
+
+
+def pool_embeddings(
+    embeddings: list[Embedding],
+    pooling: Pooling = "mean",
+    normalize: bool = True,
+) -> list[Vector]:
+    """Pools a batch of token embeddings into one vector per embedding.
+
+    All the token vectors of the batch are stacked into a single tensor and reduced
+    per embedding with one scatter operation, so the cost does not depend on a
+    Python loop over the tokens.
+
+    Args:
+        embeddings: The token embeddings to pool, one per text.
+        pooling: The reduction to apply over the tokens of each embedding,
+            either "mean" or "max". Defaults to "mean".
+        normalize: Whether to L2-normalize the pooled vectors. Defaults to True.
+
+    Returns:
+        A list of pooled vectors, in the order of the input list. Empty embeddings
+            are pooled to zero vectors, or to empty vectors if the whole batch is
+            empty.
+    """
+    if pooling not in ("mean", "max"):
+        raise ValueError(f"Unsupported pooling: {pooling}")
+
+    non_empty = [embedding for embedding in embeddings if len(embedding) > 0]
+    if not non_empty:
+        return [[] for _ in embeddings]
+
+    dim = len(non_empty[0][0])
+    counts = torch.tensor([len(embedding) for embedding in embeddings])
+    tokens = torch.tensor(
+        [vector for embedding in non_empty for vector in embedding],
+        dtype=torch.float32,
+    )
+    segments = torch.repeat_interleave(torch.arange(len(embeddings)), counts)
+    index = segments.unsqueeze(1).expand(-1, dim)
+
+    pooled = torch.zeros((len(embeddings), dim), dtype=torch.float32)
+    if pooling == "mean":
+        pooled.scatter_add_(0, index, tokens)
+        pooled /= counts.clamp(min=1).unsqueeze(1)
+    else:
+        pooled.scatter_reduce_(0, index, tokens, reduce="amax", include_self=False)
+
+    if normalize:
+        pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+
+    return cast("list[Vector]", pooled.tolist())
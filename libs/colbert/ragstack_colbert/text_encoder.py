@@ -21,6 +21,8 @@ from .objects import Chunk, Embedding
 if TYPE_CHECKING:
     from colbert.infra import ColBERTConfig
 
+_WARM_UP_TEXT = "This is a dummy text used to warm up the ColBERT model."
+
 
 def calculate_query_maxlen(tokens: list[list[str]]) -> int:
     """Calculates maximum query length.
@@ -55,9 +57,17 @@ class TextEncoder:
     Args:
         config (ColBERTConfig): The configuration for the Colbert model.
         verbose (int): The level of logging to use
+        weights_path (Optional[str]): Optional path to a safetensors file with the
+            model weights. On CPU, the weights are memory-mapped from the file, so
+            processes loading the same file share the memory pages.
     """
 
-    def __init__(self, config: ColBERTConfig, verbose: int | None = 3) -> None:
+    def __init__(
+        self,
+        config: ColBERTConfig,
+        verbose: int | None = 3,
+        weights_path: str | None = None,
+    ) -> None:
         logging.info("Cuda enabled GPU available: %s", torch.cuda.is_available())
 
         self._checkpoint = Checkpoint(
@@ -65,6 +75,49 @@ class TextEncoder:
         )
         self._use_cpu = config.total_visible_gpus == 0
 
+        if weights_path is not None:
+            self._load_weights(weights_path)
+
+    def _load_weights(self, weights_path: str) -> None:
+        """Loads the model weights from a safetensors file.
+
+        The file is memory-mapped. On CPU, the parameters are assigned the mapped
+        tensors instead of copies, so the (read-only) pages are shared with any
+        other process mapping the same file.
+        """
+        try:
+            from safetensors.torch import load_file
+        except ImportError as e:
+            raise ImportError(
+                "Could not import safetensors. "
+                "Please install it with `pip install safetensors`."
+            ) from e
+
+        logging.info("Loading memory-mapped weights from %s", weights_path)
+        state_dict = load_file(weights_path)
+        self._checkpoint.model.load_state_dict(state_dict, assign=self._use_cpu)
+
+    def warm_up(self, batch_size: int, query_maxlen: int = -1) -> None:
+        """Runs a dummy query and a batch of dummy chunks through the model.
+
+        This triggers the lazy initializations of the model and tokenizers, so
+        that the first real query does not pay for them.
+
+        Args:
+            batch_size (int): The number of dummy chunks to encode.
+            query_maxlen (int): The query_maxlen to use for the dummy query.
+                Defaults to -1 (dynamic).
+        """
+        logging.debug("#> Warming up with a batch of %s chunks..", batch_size)
+        self.encode_query(text=_WARM_UP_TEXT, query_maxlen=query_maxlen)
+        self.encode_chunks(
+            chunks=[
+                Chunk(doc_id="warm_up", chunk_id=i, text=_WARM_UP_TEXT)
+                for i in range(batch_size)
+            ],
+            batch_size=batch_size,
+        )
+
     def encode_chunks(self, chunks: list[Chunk], batch_size: int = 640) -> list[Chunk]:
         """Encodes a list of chunks into embeddings.
 
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from typing import Any
+
+import pytest
+from ragstack_colbert import CassandraDatabase, Chunk
+from ragstack_colbert.cassandra_database import CassandraDatabaseError
+
+
+class FakeTable:
+    """Table recording the rows written, failing the body of chunk 1."""
+
+    def __init__(self) -> None:
+        self.rows: list[tuple[str, tuple[int, int]]] = []
+
+    def put_async(
+        self, partition_id: str, row_id: tuple[int, int], **_columns: Any
+    ) -> Future[None]:
+        future: Future[None] = Future()
+        if row_id == (1, -1):
+            future.set_exception(RuntimeError("insert failed"))
+        else:
+            self.rows.append((partition_id, row_id))
+            future.set_result(None)
+        return future
+
+
+def test_add_chunks_skips_embeddings_of_failed_bodies() -> None:
+    # Bypasses `from_session`, which creates the table.
+    database = object.__new__(CassandraDatabase)
+    table = FakeTable()
+    database._table = table  # type: ignore[assignment]  # noqa: SLF001
+
+    chunks = [
+        Chunk(doc_id="d", chunk_id=i, text=f"t{i}", embedding=[[0.1], [0.2]])
+        for i in range(3)
+    ]
+    with pytest.raises(CassandraDatabaseError, match=r"\('d', 1\)"):
+        database.add_chunks(chunks, concurrent_inserts=2)
+
+    # No vectors are written for chunk 1, whose body failed.
+    assert sorted(table.rows) == [
+        ("d", (0, -1)),
+        ("d", (0, 0)),
+        ("d", (0, 1)),
+        ("d", (2, -1)),
+        ("d", (2, 0)),
+        ("d", (2, 1)),
+    ]
@@ -43,3 +43,20 @@ def test_colbert_query_embeddings() -> None:
     query_maxlen = 512
     embedding = colbert.embed_query("test-query", query_maxlen=query_maxlen)
     assert len(embedding) == query_maxlen
+
+
+def test_colbert_background_load() -> None:
+    colbert = ColbertEmbeddingModel(background_load=True, warm_up_batch_size=2)
+
+    colbert.wait_until_ready()
+    assert colbert.is_ready()
+
+    embeddings = colbert.embed_texts(texts=["test1"])
+    assert len(embeddings[0][0]) == DEFAULT_COLBERT_DIM
+
+
+async def test_colbert_await_ready() -> None:
+    colbert = ColbertEmbeddingModel(background_load=True)
+
+    await colbert.await_ready()
+    assert colbert.is_ready()
@@ -1,7 +1,23 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, cast
+
+import pytest
 import torch
-from ragstack_colbert.colbert_retriever import max_similarity_torch
+from ragstack_colbert import Chunk
+from ragstack_colbert.base_retriever import BaseRetriever
+from ragstack_colbert.colbert_retriever import (
+    ColbertRetriever,
+    chunks_max_similarity,
+    max_similarity_torch,
+    pad_chunk_embeddings,
+)
 from ragstack_colbert.text_encoder import calculate_query_maxlen
 
+if TYPE_CHECKING:
+    from ragstack_colbert.base_database import BaseDatabase
+    from ragstack_colbert.base_embedding_model import BaseEmbeddingModel
+
 
 def test_max_similarity_torch() -> None:
     # Example query vector and embedding list
@@ -36,3 +52,81 @@ def test_query_maxlen_calculation() -> None:
 
     tokens = [["word1", "word2", "word3"], ["word1", "word2"]]
     assert calculate_query_maxlen(tokens) == 6  # noqa: PLR2004
+
+
+def test_chunks_max_similarity() -> None:
+    padded, mask = pad_chunk_embeddings(
+        [
+            [[1.0, 0.0], [0.0, 1.0]],
+            [[0.0, 1.0]],
+        ]
+    )
+    assert padded.shape == (2, 2, 2)
+    assert mask.tolist() == [[True, True], [True, False]]
+
+    other = torch.tensor([[1.0, 0.0]])
+    similarity = chunks_max_similarity(padded, mask, other)
+    # The first chunk has one matching token out of two, the second none.
+    assert similarity.tolist() == [0.5, 0.0]
+
+
+def test_select_mmr_chunks() -> None:
+    retriever = ColbertRetriever(
+        database=cast("BaseDatabase", None),
+        embedding_model=cast("BaseEmbeddingModel", None),
+    )
+
+    query_embedding = [[1.0, 0.0]]
+    close = Chunk(doc_id="a", chunk_id=0, embedding=[[1.0, 0.0]])
+    duplicate = Chunk(doc_id="a", chunk_id=1, embedding=[[1.0, 0.0]])
+    diverse = Chunk(doc_id="b", chunk_id=0, embedding=[[0.0, 1.0]])
+    chunk_scores = {close: 1.0, duplicate: 1.0, diverse: 0.3}
+
+    selected = retriever._select_mmr_chunks(  # noqa: SLF001
+        query_embedding=query_embedding,
+        candidates=[close, duplicate, diverse],
+        chunk_scores=chunk_scores,
+        k=2,
+        lambda_mult=0.5,
+    )
+    assert selected == [close, diverse]
+
+    selected = retriever._select_mmr_chunks(  # noqa: SLF001
+        query_embedding=query_embedding,
+        candidates=[close, duplicate, diverse],
+        chunk_scores=chunk_scores,
+        k=2,
+        lambda_mult=1.0,
+    )
+    assert selected == [close, duplicate]
+
+
+class EmbeddingOnlyRetriever(BaseRetriever):
+    """Retriever implementing only the abstract methods."""
+
+    def embedding_search(
+        self, *_args: Any, **_kwargs: Any
+    ) -> list[tuple[Chunk, float]]:
+        return []
+
+    async def aembedding_search(
+        self, *_args: Any, **_kwargs: Any
+    ) -> list[tuple[Chunk, float]]:
+        return []
+
+    def text_search(self, *_args: Any, **_kwargs: Any) -> list[tuple[Chunk, float]]:
+        return []
+
+    async def atext_search(
+        self, *_args: Any, **_kwargs: Any
+    ) -> list[tuple[Chunk, float]]:
+        return []
+
+
+async def test_mmr_search_not_implemented() -> None:
+    # Retrievers written before the MMR searches can still be instantiated.
+    retriever = EmbeddingOnlyRetriever()
+    with pytest.raises(NotImplementedError):
+        retriever.mmr_text_search("query")
+    with pytest.raises(NotImplementedError):
+        await retriever.ammr_embedding_search(torch.zeros(1, 2))
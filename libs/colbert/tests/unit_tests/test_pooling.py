@@ -0,0 +1,39 @@
+import pytest
+import torch
+from ragstack_colbert.pooling import pool_embeddings
+
+
+def test_mean_pooling() -> None:
+    embeddings = [
+        [[1.0, 2.0], [3.0, 4.0]],
+        [[5.0, 6.0]],
+    ]
+
+    pooled = pool_embeddings(embeddings, pooling="mean", normalize=False)
+
+    assert pooled == [[2.0, 3.0], [5.0, 6.0]]
+
+
+def test_max_pooling() -> None:
+    embeddings = [
+        [[1.0, -2.0], [-3.0, 4.0]],
+        [[-5.0, -6.0], [-1.0, -7.0]],
+    ]
+
+    pooled = pool_embeddings(embeddings, pooling="max", normalize=False)
+
+    assert pooled == [[1.0, 4.0], [-1.0, -6.0]]
+
+
+def test_normalized_pooling() -> None:
+    embeddings = [[[3.0, 0.0], [3.0, 8.0]], []]
+
+    pooled = pool_embeddings(embeddings)
+
+    assert torch.allclose(torch.tensor(pooled[0]), torch.tensor([0.6, 0.8]))
+    assert pooled[1] == [0.0, 0.0]
+
+
+def test_unsupported_pooling() -> None:
+    with pytest.raises(ValueError, match="Unsupported pooling"):
+        pool_embeddings([[[1.0]]], pooling="sum")  # type: ignore[arg-type]
@@ -1,11 +1,19 @@
+from .embedding_cache import CachedEmbeddingModel
 from .embedding_model import EmbeddingModel
-from .graph_store import GraphStore, Node, SetupMode
+from .graph_store import GraphStore, Node, NodePage, ScanPage, SetupMode
 from .knowledge_store import KnowledgeStore
+from .memory_store import InMemoryGraphStore
+from .migration import EmbeddingMigration
 
 __all__ = [
+    "CachedEmbeddingModel",
+    "EmbeddingMigration",
     "EmbeddingModel",
     "GraphStore",
+    "InMemoryGraphStore",
     "KnowledgeStore",
     "Node",
+    "NodePage",
+    "ScanPage",
     "SetupMode",
 ]
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """Statistics of a cache."""
+
+    hits: int
+    """Number of lookups which found an entry."""
+    misses: int
+    """Number of lookups which found no (unexpired) entry."""
+    size: int
+    """Current number of entries."""
+    max_size: int
+    """Maximum number of entries."""
+
+
+class LruCache(Generic[K, V]):
+    """Thread-safe LRU cache with optional expiration of the entries.
+
+    Args:
+        max_size: Maximum number of entries. The least recently used entries are
+            evicted beyond that.
+        ttl: Time (in seconds) after which an entry expires. If `None`, entries
+            don't expire.
+    """
+
+    def __init__(self, max_size: int, ttl: float | None = None) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # Values are stored along with their expiration time.
+        self._entries: OrderedDict[K, tuple[V, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> CacheStats:
+        """Return the statistics of the cache."""
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                size=len(self._entries),
+                max_size=self._max_size,
+            )
+
+    def get(self, key: K) -> V | None:
+        """Return the value for the key, or `None` if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: K, value: V) -> None:
+        """Store the value for the key, evicting the least recently used entry."""
+        expires = float("inf") if self._ttl is None else time.monotonic() + self._ttl
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def discard_if(self, predicate: Callable[[K], bool]) -> None:
+        """Remove the entries whose key matches the predicate."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Remove all the entries."""
+        with self._lock:
+            self._entries.clear()
@@ -1,45 +1,30 @@
 from __future__ import annotations
 
-import dataclasses
-from typing import TYPE_CHECKING, Iterable
+import math
+from typing import TYPE_CHECKING, Any, Iterable
 
 import numpy as np
 
-from ragstack_knowledge_store.math import cosine_similarity
+from ragstack_knowledge_store.math import dot_similarity, normalize_rows
 
 if TYPE_CHECKING:
-    from numpy.typing import NDArray
-
-
-def _emb_to_ndarray(embedding: list[float]) -> NDArray[np.float32]:
-    emb_array = np.array(embedding, dtype=np.float32)
-    if emb_array.ndim == 1:
-        emb_array = np.expand_dims(emb_array, axis=0)
-    return emb_array
+    from numpy.typing import DTypeLike, NDArray
 
 
 NEG_INF = float("-inf")
 
-
-@dataclasses.dataclass
-class _Candidate:
-    id: str
-    weighted_similarity: float
-    weighted_redundancy: float
-    score: float = dataclasses.field(init=False)
-
-    def __post_init__(self) -> None:
-        self.score = self.weighted_similarity - self.weighted_redundancy
-
-    def update_redundancy(self, new_weighted_redundancy: float) -> None:
-        if new_weighted_redundancy > self.weighted_redundancy:
-            self.weighted_redundancy = new_weighted_redundancy
-            self.score = self.weighted_similarity - self.weighted_redundancy
+_INITIAL_CAPACITY = 16
 
 
 class MmrHelper:
     """Helper for executing an MMR traversal query.
 
+    Candidates are stored in preallocated arrays (grown by doubling their
+    capacity), with their similarity to the query and their redundancy with the
+    selected nodes. The embeddings are normalized once when added, so that
+    similarities are plain dot products, and each selection is a vectorized
+    update of the redundancies followed by an argmax over the scores.
+
     Args:
         query_embedding: The embedding of the query to use for scoring.
         lambda_mult: Number between 0 and 1 that determines the degree
@@ -47,13 +32,18 @@ class MmrHelper:
             diversity and 1 to minimum diversity. Defaults to 0.5.
         score_threshold: Only documents with a score greater than or equal
             this threshold will be chosen. Defaults to -infinity.
+        normalized: Whether the candidate embeddings are already L2-normalized, in
+            which case they are used as is. Defaults to False.
+        dtype: Data type of the stored embeddings. Use `np.float16` to halve
+            their memory (similarities are computed with simsimd, if
+            installed). Defaults to `np.float32`.
     """
 
     dimensions: int
     """Dimensions of the embedding."""
 
     query_embedding: NDArray[np.float32]
-    """Embedding of the query as a (1,dim) ndarray."""
+    """Normalized embedding of the query as a (dim,) ndarray."""
 
     lambda_mult: float
     """Number between 0 and 1.
@@ -70,20 +60,12 @@ class MmrHelper:
     selected_ids: list[str]
     """List of selected IDs (in selection order)."""
     selected_embeddings: NDArray[np.float32]
-    """(N, dim) ndarray with a row for each selected node."""
+    """(k, dim) ndarray with a row for each selected node (in selection order)."""
+    selected_similarities: list[float]
+    """Similarity to the query of each selected node (in selection order)."""
 
     candidate_id_to_index: dict[str, int]
-    """Dictionary of candidate IDs to indices in candidates and candidate_embeddings."""
-    candidates: list[_Candidate]
-    """List containing information about candidates.
-
-    Same order as rows in `candidate_embeddings`.
-    """
-    candidate_embeddings: NDArray[np.float32]
-    """(N, dim) ndarray with a row for each candidate."""
-
-    best_score: float
-    best_id: str | None
+    """Dictionary of unselected candidate IDs to their row in the arrays."""
 
     def __init__(
         self,
@@ -91,72 +73,105 @@ class MmrHelper:
         query_embedding: list[float],
         lambda_mult: float = 0.5,
         score_threshold: float = NEG_INF,
+        normalized: bool = False,
+        dtype: DTypeLike = np.float32,
     ) -> None:
-        self.query_embedding = _emb_to_ndarray(query_embedding)
-        self.dimensions = self.query_embedding.shape[1]
+        self._normalized = normalized
+        self._dtype = np.dtype(dtype)
+        query = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+        self.query_embedding = normalize_rows(query)[0].astype(self._dtype)
+        self.dimensions = self.query_embedding.shape[0]
 
         self.lambda_mult = lambda_mult
         self.lambda_mult_complement = 1 - lambda_mult
         self.score_threshold = score_threshold
 
         self.selected_ids = []
-
-        # List of selected embeddings (in selection order).
-        self.selected_embeddings = np.ndarray((k, self.dimensions), dtype=np.float32)
+        self.selected_similarities = []
+        self.selected_embeddings = np.zeros((k, self.dimensions), dtype=self._dtype)
 
         self.candidate_id_to_index = {}
 
-        # List of the candidates.
-        self.candidates = []
-        # ND array of the candidate embeddings.
-        self.candidate_embeddings = np.ndarray((0, self.dimensions), dtype=np.float32)
-
-        self.best_score = NEG_INF
-        self.best_id = None
+        # Rows of the candidate arrays. Selected candidates keep their row, but
+        # are no longer available and their score is set to -infinity.
+        self._size = 0
+        self._ids: list[str] = []
+        self._embeddings = np.zeros(
+            (_INITIAL_CAPACITY, self.dimensions), dtype=self._dtype
+        )
+        # Weighted similarity to the query, and weighted redundancy with the
+        # selected nodes.
+        self._similarity = np.zeros(_INITIAL_CAPACITY, dtype=np.float32)
+        self._redundancy = np.zeros(_INITIAL_CAPACITY, dtype=np.float32)
+        self._scores = np.full(_INITIAL_CAPACITY, NEG_INF, dtype=np.float32)
+        self._available = np.zeros(_INITIAL_CAPACITY, dtype=bool)
 
     def candidate_ids(self) -> Iterable[str]:
         """Return the IDs of the candidates."""
         return self.candidate_id_to_index.keys()
 
-    def _already_selected_embeddings(self) -> NDArray[np.float32]:
-        """Return the selected embeddings sliced to the already assigned values."""
-        selected = len(self.selected_ids)
-        return np.vsplit(self.selected_embeddings, [selected])[0]
-
-    def _pop_candidate(self, candidate_id: str) -> NDArray[np.float32]:
-        """Pop the candidate with the given ID.
+    def _best_index(self) -> int | None:
+        if not self.candidate_id_to_index:
+            return None
+        return int(np.argmax(self._scores[: self._size]))
+
+    @property
+    def best_id(self) -> str | None:
+        """ID of the best candidate, or `None` if there are no candidates."""
+        index = self._best_index()
+        return None if index is None else self._ids[index]
+
+    @property
+    def best_score(self) -> float:
+        """Score of the best candidate, or -infinity if there are no candidates."""
+        index = self._best_index()
+        return NEG_INF if index is None else float(self._scores[index])
+
+    def adjacent_score_bound(
+        self, query_similarity: float, min_adjacent_similarity: float
+    ) -> float:
+        """Upper bound of the score of the candidates adjacent to a selected node.
+
+        A candidate `c` linked to from a selected node `s`, with a similarity of
+        at least `min_adjacent_similarity` to it, is at least that redundant, and
+        further selections only increase its redundancy. The angle between the
+        query `q` and `c` is at least the angle between `q` and `s` minus the
+        angle between `s` and `c`, which bounds the similarity of `c` to the
+        query.
+
+        Args:
+            query_similarity: Similarity of the selected node to the query.
+            min_adjacent_similarity: Lower bound of the similarity of the
+                adjacent nodes to the selected node.
 
         Returns:
-            The embedding of the candidate.
+            The upper bound of the scores.
         """
-        # Get the embedding for the id.
-        index = self.candidate_id_to_index.pop(candidate_id)
-        if not self.candidates[index].id == candidate_id:
-            raise ValueError(
-                "ID in self.candidate_id_to_index doesn't match the ID of the "
-                "corresponding index in self.candidates"
-            )
-        embedding: NDArray[np.float32] = self.candidate_embeddings[index].copy()
-
-        # Swap that index with the last index in the candidates and
-        # candidate_embeddings.
-        last_index = self.candidate_embeddings.shape[0] - 1
-
-        if index == last_index:
-            # Already the last item. We don't need to swap.
-            self.candidates.pop()
-        else:
-            self.candidate_embeddings[index] = self.candidate_embeddings[last_index]
+        query_angle = math.acos(min(max(query_similarity, -1.0), 1.0))
+        adjacent_angle = math.acos(min(max(min_adjacent_similarity, -1.0), 1.0))
+        relevance = math.cos(max(query_angle - adjacent_angle, 0.0))
+        return (
+            self.lambda_mult * relevance
+            - self.lambda_mult_complement * min_adjacent_similarity
+        )
 
-            old_last = self.candidates.pop()
-            self.candidates[index] = old_last
-            self.candidate_id_to_index[old_last.id] = index
+    def _ensure_capacity(self, capacity: int) -> None:
+        current = self._embeddings.shape[0]
+        if capacity <= current:
+            return
+        new_capacity = max(capacity, 2 * current)
 
-        self.candidate_embeddings = np.vsplit(self.candidate_embeddings, [last_index])[
-            0
-        ]
+        def grow(array: NDArray[Any], fill: Any) -> NDArray[Any]:
+            shape = (new_capacity, *array.shape[1:])
+            grown = np.full(shape, fill, dtype=array.dtype)
+            grown[: self._size] = array[: self._size]
+            return grown
 
-        return embedding
+        self._embeddings = grow(self._embeddings, 0.0)
+        self._similarity = grow(self._similarity, 0.0)
+        self._redundancy = grow(self._redundancy, 0.0)
+        self._scores = grow(self._scores, NEG_INF)
+        self._available = grow(self._available, False)
 
     def pop_best(self) -> str | None:
         """Select and pop the best item being considered.
@@ -166,81 +181,80 @@ class MmrHelper:
         Returns:
             A tuple containing the ID of the best item.
         """
-        if self.best_id is None or self.best_score < self.score_threshold:
+        index = self._best_index()
+        if index is None or self._scores[index] < self.score_threshold:
             return None
 
         # Get the selection and remove from candidates.
-        selected_id = self.best_id
-        selected_embedding = self._pop_candidate(selected_id)
+        selected_id = self._ids[index]
+        del self.candidate_id_to_index[selected_id]
+        self._scores[index] = NEG_INF
+        self._available[index] = False
+        selected_embedding = self._embeddings[index : index + 1]
 
         # Add the ID and embedding to the selected information.
-        selection_index = len(self.selected_ids)
+        self.selected_embeddings[len(self.selected_ids)] = selected_embedding
         self.selected_ids.append(selected_id)
-        self.selected_embeddings[selection_index] = selected_embedding
-
-        # Reset the best score / best ID.
-        self.best_score = NEG_INF
-        self.best_id = None
-
-        # Update the candidates redundancy, tracking the best node.
-        if self.candidate_embeddings.shape[0] > 0:
-            similarity = cosine_similarity(
-                self.candidate_embeddings, np.expand_dims(selected_embedding, axis=0)
+        query_similarity = dot_similarity(
+            selected_embedding, self.query_embedding[None, :]
+        )
+        self.selected_similarities.append(float(query_similarity[0, 0]))
+
+        # Update the redundancy and score of the remaining candidates.
+        if self.candidate_id_to_index:
+            size = self._size
+            embeddings = self._embeddings[:size]
+            similarity = dot_similarity(embeddings, selected_embedding)[:, 0]
+            np.maximum(self._redundancy[:size], similarity, out=self._redundancy[:size])
+            self._scores[:size] = np.where(
+                self._available[:size],
+                self._similarity[:size] - self._redundancy[:size],
+                NEG_INF,
             )
-            for index, candidate in enumerate(self.candidates):
-                candidate.update_redundancy(similarity[index][0])
-                if candidate.score > self.best_score:
-                    self.best_score = candidate.score
-                    self.best_id = candidate.id
 
         return selected_id
 
     def add_candidates(self, candidates: dict[str, list[float]]) -> None:
         """Add candidates to the consideration set."""
-        # Determine the keys to actually include.
-        # These are the candidates that aren't already selected
-        # or under consideration.
-        include_ids_set = set(candidates.keys())
-        include_ids_set.difference_update(self.selected_ids)
-        include_ids_set.difference_update(self.candidate_id_to_index.keys())
-        include_ids = list(include_ids_set)
-
-        # Now, build up a matrix of the remaining candidate embeddings.
-        # And add them to the
-        new_embeddings: NDArray[np.float32] = np.ndarray(
-            (len(include_ids), self.dimensions)
-        )
-        offset = self.candidate_embeddings.shape[0]
-        for index, candidate_id in enumerate(include_ids):
-            if candidate_id in include_ids:
-                self.candidate_id_to_index[candidate_id] = offset + index
-                embedding = candidates[candidate_id]
-                new_embeddings[index] = embedding
-
-        # Compute the similarity to the query.
-        similarity = cosine_similarity(new_embeddings, self.query_embedding)
-
-        # Compute the distance metrics of all of pairs in the selected set with
-        # the new candidates.
-        redundancy = cosine_similarity(
-            new_embeddings, self._already_selected_embeddings()
-        )
-        for index, candidate_id in enumerate(include_ids):
-            max_redundancy = 0.0
-            if redundancy.shape[0] > 0:
-                max_redundancy = redundancy[index].max()
-            candidate = _Candidate(
-                id=candidate_id,
-                weighted_similarity=self.lambda_mult * similarity[index][0],
-                weighted_redundancy=self.lambda_mult_complement * max_redundancy,
-            )
-            self.candidates.append(candidate)
-
-            if candidate.score >= self.best_score:
-                self.best_score = candidate.score
-                self.best_id = candidate.id
-
-        # Add the new embeddings to the candidate set.
-        self.candidate_embeddings = np.vstack(
-            (self.candidate_embeddings, new_embeddings)
+        # Only include the candidates that aren't already selected or under
+        # consideration.
+        selected = set(self.selected_ids)
+        include_ids = [
+            candidate_id
+            for candidate_id in candidates
+            if candidate_id not in selected
+            and candidate_id not in self.candidate_id_to_index
+        ]
+        if not include_ids:
+            return
+
+        new_embeddings = np.array(
+            [candidates[candidate_id] for candidate_id in include_ids],
+            dtype=np.float32,
+        ).reshape(len(include_ids), self.dimensions)
+        if not self._normalized:
+            new_embeddings = normalize_rows(new_embeddings)
+        new_embeddings = new_embeddings.astype(self._dtype, copy=False)
+
+        # Similarity to the query, and redundancy with the selected nodes.
+        similarity = dot_similarity(new_embeddings, self.query_embedding[None, :])[:, 0]
+        if self.selected_ids:
+            selected_embeddings = self.selected_embeddings[: len(self.selected_ids)]
+            redundancy = dot_similarity(new_embeddings, selected_embeddings).max(axis=1)
+        else:
+            redundancy = np.zeros(len(include_ids), dtype=np.float32)
+
+        start = self._size
+        end = start + len(include_ids)
+        self._ensure_capacity(end)
+        self._embeddings[start:end] = new_embeddings
+        self._similarity[start:end] = self.lambda_mult * similarity
+        self._redundancy[start:end] = self.lambda_mult_complement * redundancy
+        self._scores[start:end] = (
+            self._similarity[start:end] - self._redundancy[start:end]
         )
+        self._available[start:end] = True
+        for offset, candidate_id in enumerate(include_ids):
+            self.candidate_id_to_index[candidate_id] = start + offset
+        self._ids.extend(include_ids)
+        self._size = end
@@ -0,0 +1,403 @@
+"""Nodes and helpers shared by the graph stores."""
+
+from __future__ import annotations
+
+import itertools
+import json
+import secrets
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Union, cast
+
+from .codec import Codec, default_codec
+from .links import Link
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+@dataclass
+class Node:
+    """Node in the GraphStore."""
+
+    text: str
+    """Text contained by the node."""
+    id: str | None = None
+    """Unique ID for the node. Will be generated by the GraphStore if not set."""
+    metadata: dict[str, Any] = field(default_factory=dict)
+    """Metadata for the node."""
+    links: set[Link] = field(default_factory=set)
+    """Links for the node."""
+
+
+@dataclass
+class BatchProgress:
+    """Progress of adding nodes, reported after each batch."""
+
+    batch: int
+    """Index of the batch, starting at 0."""
+    node_ids: list[str]
+    """IDs of the nodes of the batch."""
+    nodes_added: int
+    """Number of nodes added so far, by the successful batches."""
+    error: Exception | None = None
+    """Error the batch failed with, if any."""
+
+
+class MetadataIndexingMode(Enum):
+    """Mode used to index metadata."""
+
+    DEFAULT_TO_UNSEARCHABLE = 1
+    DEFAULT_TO_SEARCHABLE = 2
+
+
+MetadataIndexingType = Union[tuple[str, Iterable[str]], str]
+MetadataIndexingPolicy = tuple[MetadataIndexingMode, set[str]]
+
+
+# Node IDs, texts, metadata and links of a batch of nodes.
+_NodeBatch = tuple[list[str], list[str], list[dict[str, Any]], list[set[Link]]]
+
+
+def _batched(nodes: Iterable[Node], batch_size: int) -> Iterator[list[Node]]:
+    iterator = iter(nodes)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+async def _abatched(
+    nodes: Iterable[Node] | AsyncIterable[Node], batch_size: int
+) -> AsyncIterator[list[Node]]:
+    if not isinstance(nodes, AsyncIterable):
+        for batch in _batched(nodes, batch_size):
+            yield batch
+        return
+
+    batch = []
+    async for node in nodes:
+        batch.append(node)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@dataclass
+class _AddedNodes:
+    """Number of nodes added so far, and their IDs if they are returned."""
+
+    ids: list[str] | None
+    count: int = 0
+
+    def result(self) -> list[str]:
+        return [] if self.ids is None else self.ids
+
+
+def _batch_added(
+    progress: BatchProgress,
+    added: _AddedNodes,
+    on_batch: Callable[[BatchProgress], None] | None,
+    fail_fast: bool,
+) -> None:
+    """Record the outcome of a batch, report it and raise its error if needed."""
+    if progress.error is None:
+        added.count += len(progress.node_ids)
+        if added.ids is not None:
+            added.ids.extend(progress.node_ids)
+    progress.nodes_added = added.count
+    if on_batch is not None:
+        on_batch(progress)
+    if progress.error is not None and fail_fast:
+        raise progress.error
+
+
+def _unpack_nodes(
+    nodes: Iterable[Node],
+) -> tuple[list[str], list[str], list[dict[str, Any]], list[set[Link]]]:
+    node_ids: list[str] = []
+    texts: list[str] = []
+    metadatas: list[dict[str, Any]] = []
+    nodes_links: list[set[Link]] = []
+    for node in nodes:
+        if not node.id:
+            node_ids.append(secrets.token_hex(8))
+        else:
+            node_ids.append(node.id)
+        texts.append(node.text)
+        metadatas.append(node.metadata)
+        nodes_links.append(node.links)
+    return node_ids, texts, metadatas, nodes_links
+
+
+def _normalize_metadata_indexing_policy(
+    metadata_indexing: tuple[str, Iterable[str]] | str,
+) -> MetadataIndexingPolicy:
+    mode: MetadataIndexingMode
+    fields: set[str]
+    # metadata indexing policy normalization:
+    if isinstance(metadata_indexing, str):
+        if metadata_indexing.lower() == "all":
+            mode, fields = (MetadataIndexingMode.DEFAULT_TO_SEARCHABLE, set())
+        elif metadata_indexing.lower() == "none":
+            mode, fields = (MetadataIndexingMode.DEFAULT_TO_UNSEARCHABLE, set())
+        else:
+            raise ValueError(
+                f"Unsupported metadata_indexing value '{metadata_indexing}'"
+            )
+    else:
+        if len(metadata_indexing) != 2:  # noqa: PLR2004
+            raise ValueError(
+                f"Unsupported metadata_indexing value '{metadata_indexing}'."
+            )
+        # it's a 2-tuple (mode, fields) still to normalize
+        _mode, _field_spec = metadata_indexing
+        fields = {_field_spec} if isinstance(_field_spec, str) else set(_field_spec)
+        if _mode.lower() in {
+            "default_to_unsearchable",
+            "allowlist",
+            "allow",
+            "allow_list",
+        }:
+            mode = MetadataIndexingMode.DEFAULT_TO_UNSEARCHABLE
+        elif _mode.lower() in {
+            "default_to_searchable",
+            "denylist",
+            "deny",
+            "deny_list",
+        }:
+            mode = MetadataIndexingMode.DEFAULT_TO_SEARCHABLE
+        else:
+            raise ValueError(
+                f"Unsupported metadata indexing mode specification '{_mode}'"
+            )
+    return (mode, fields)
+
+
+def _is_metadata_field_indexed(field_name: str, policy: MetadataIndexingPolicy) -> bool:
+    p_mode, p_fields = policy
+    if p_mode == MetadataIndexingMode.DEFAULT_TO_UNSEARCHABLE:
+        return field_name in p_fields
+    if p_mode == MetadataIndexingMode.DEFAULT_TO_SEARCHABLE:
+        return field_name not in p_fields
+    raise ValueError(f"Unexpected metadata indexing mode {p_mode}")
+
+
+def _coerce_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        # bool MUST come before int in this chain of ifs!
+        return json.dumps(value)
+    if isinstance(value, int):
+        # we don't want to store '1' and '1.0' differently
+        # for the sake of metadata-filtered retrieval:
+        return json.dumps(float(value))
+    if isinstance(value, float) or value is None:
+        return json.dumps(value)
+    # when all else fails ...
+    return str(value)
+
+
+# Marker prefixing the links blobs in the compact format, which stores each link
+# as a `[kind, direction, tag]` list. Blobs without it are in the original
+# format, a list of `{"kind": ..., "direction": ..., "tag": ...}` objects.
+_LINKS_FORMAT_V2 = "v2:"
+
+_DEFAULT_CODEC = default_codec()
+
+
+def _serialize_metadata(md: dict[str, Any], codec: Codec = _DEFAULT_CODEC) -> str:
+    if isinstance(md.get("links"), set):
+        md = md.copy()
+        md["links"] = list(md["links"])
+    return codec.dumps(md)
+
+
+def _serialize_links(links: set[Link], codec: Codec = _DEFAULT_CODEC) -> str:
+    compact = [[link.kind, link.direction, link.tag] for link in links]
+    return _LINKS_FORMAT_V2 + codec.dumps(compact)
+
+
+def _deserialize_metadata(
+    json_blob: str | None, codec: Codec = _DEFAULT_CODEC
+) -> dict[str, Any]:
+    # We don't need to convert the links list back to a set -- it will be
+    # converted when accessed, if needed.
+    return cast(dict[str, Any], codec.loads(json_blob or ""))
+
+
+def _deserialize_links(
+    json_blob: str | None, codec: Codec = _DEFAULT_CODEC
+) -> set[Link]:
+    json_blob = json_blob or ""
+    if json_blob.startswith(_LINKS_FORMAT_V2):
+        compact = codec.loads(json_blob[len(_LINKS_FORMAT_V2) :])
+        return {
+            Link(kind=kind, direction=direction, tag=tag)
+            for kind, direction, tag in compact
+        }
+    return {
+        Link(kind=link["kind"], direction=link["direction"], tag=link["tag"])
+        for link in cast(list[dict[str, Any]], codec.loads(json_blob))
+    }
+
+
+class _LazyNode(Node):
+    """Node read from a row, decoding its metadata and links when first accessed.
+
+    Created by `from_blobs`. It keeps the `__init__` of `Node`, so that
+    `dataclasses.replace` and copies work, and compares equal to a `Node` with
+    the same fields.
+    """
+
+    _metadata_blob: str | None = None
+    _links_blob: str | None = None
+    _codec: Codec = _DEFAULT_CODEC
+    _metadata: dict[str, Any] | None = None
+    _links: set[Link] | None = None
+
+    @classmethod
+    def from_blobs(
+        cls,
+        id: str,  # noqa: A002
+        text: str,
+        metadata_blob: str | None,
+        links_blob: str | None,
+        codec: Codec,
+    ) -> _LazyNode:
+        node = cls.__new__(cls)
+        node.__dict__.update(
+            id=id,
+            text=text,
+            _metadata_blob=metadata_blob,
+            _links_blob=links_blob,
+            _codec=codec,
+        )
+        return node
+
+    @property
+    def metadata(self) -> dict[str, Any]:
+        if self._metadata is None:
+            self._metadata = _deserialize_metadata(self._metadata_blob, self._codec)
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, metadata: dict[str, Any]) -> None:
+        self._metadata = metadata
+
+    @property
+    def links(self) -> set[Link]:
+        if self._links is None:
+            self._links = _deserialize_links(self._links_blob, self._codec)
+        return self._links
+
+    @links.setter
+    def links(self, links: set[Link]) -> None:
+        self._links = links
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Node):
+            return NotImplemented
+        return (self.text, self.id, self.metadata, self.links) == (
+            other.text,
+            other.id,
+            other.metadata,
+            other.links,
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return (
+            f"Node(text={self.text!r}, id={self.id!r}, metadata={self.metadata!r}, "
+            f"links={self.links!r})"
+        )
+
+
+@dataclass
+class _Edge:
+    target_content_id: str
+    target_text_embedding: list[float]
+    target_link_to_tags: set[tuple[str, str]]
+
+
+def _merge_edges(edge_lists: Iterable[list[_Edge]]) -> Iterable[_Edge]:
+    targets: dict[str, _Edge] = {}
+    for edges in edge_lists:
+        for edge in edges:
+            if edge.target_content_id not in targets:
+                targets[edge.target_content_id] = edge
+    return targets.values()
+
+
+class _TraversalState:
+    """State of a breadth-first traversal, visited one depth at a time.
+
+    As the depths are visited in order, the first visit of a node or tag is at
+    its lowest depth. The state is only updated by the traversing thread, between
+    the rounds of queries.
+
+    Args:
+        depth: The maximum depth of edges to traverse.
+        max_nodes: Maximum number of nodes to visit, if any.
+        time_budget: Time (in seconds) after which no further queries are issued,
+            if any.
+    """
+
+    def __init__(
+        self, depth: int, max_nodes: int | None, time_budget: float | None
+    ) -> None:
+        self.depth = depth
+        self.max_nodes = max_nodes
+        self.deadline = None if time_budget is None else time.monotonic() + time_budget
+        # Map from visited ID to depth.
+        self.visited_ids: dict[str, int] = {}
+        # Visited tags `(kind, tag)`, which don't need to be queried again.
+        self.visited_tags: set[tuple[str, str]] = set()
+
+    def remaining(self) -> int | None:
+        """Number of nodes which can still be visited, if limited."""
+        if self.max_nodes is None:
+            return None
+        return max(self.max_nodes - len(self.visited_ids), 0)
+
+    def exhausted(self) -> bool:
+        """Whether a budget is exhausted, ending the traversal."""
+        return self.remaining() == 0 or (
+            self.deadline is not None and time.monotonic() >= self.deadline
+        )
+
+    def is_new(self, content_id: str) -> bool:
+        """Whether the node hasn't been visited yet."""
+        return content_id not in self.visited_ids
+
+    def new_ids(self, content_ids: Iterable[str]) -> list[str]:
+        """Return the unvisited IDs (without duplicates) within the budget."""
+        new_ids = [
+            content_id
+            for content_id in dict.fromkeys(content_ids)
+            if self.is_new(content_id)
+        ]
+        return new_ids[: self.remaining()]
+
+    def visit(self, d: int, nodes: Iterable[Any]) -> set[tuple[str, str]]:
+        """Visit nodes at depth `d`, returning the new outgoing tags.
+
+        Each node has `content_id` and `link_to_tags`.
+        """
+        outgoing_tags = set()
+        for node in nodes:
+            if self.remaining() == 0:
+                break
+            if not self.is_new(node.content_id):
+                continue
+            self.visited_ids[node.content_id] = d
+            if d < self.depth and node.link_to_tags:
+                for tag in node.link_to_tags:
+                    if tag not in self.visited_tags:
+                        self.visited_tags.add(tag)
+                        outgoing_tags.add(tag)
+        return outgoing_tags
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+from abc import ABC, abstractmethod
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+orjson: Any
+try:
+    import orjson
+except ImportError:
+    logger.debug(
+        "Unable to import orjson, defaulting to the json module. If you want "
+        "faster serialization please install with `pip install orjson`."
+    )
+    orjson = None
+
+
+class Codec(ABC):
+    """Codec used to serialize the metadata and links of the nodes.
+
+    The serialized values are stored in text columns, so they must be strings.
+    """
+
+    @abstractmethod
+    def dumps(self, value: Any) -> str:
+        """Serialize a value."""
+
+    @abstractmethod
+    def loads(self, data: str) -> Any:
+        """Deserialize a value."""
+
+
+class JsonCodec(Codec):
+    """Codec using the standard `json` module."""
+
+    def dumps(self, value: Any) -> str:
+        """Serialize a value to JSON."""
+        return json.dumps(value)
+
+    def loads(self, data: str) -> Any:
+        """Deserialize a value from JSON."""
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """Codec using `orjson`, producing the same JSON as `JsonCodec` but faster.
+
+    Values that `orjson` can't serialize (such as integers over 64 bits or
+    non-finite floats, which it writes as `null`) or deserialize (such as `NaN`)
+    fall back to the `json` module.
+    """
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ImportError(
+                "Could not import orjson. Please install it with `pip install orjson`."
+            )
+
+    def dumps(self, value: Any) -> str:
+        """Serialize a value to JSON."""
+        try:
+            serialized: bytes = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return json.dumps(value)
+        # Non-finite floats are serialized as null: only check for them if there
+        # is one.
+        if b"null" in serialized and _has_non_finite_float(value):
+            return json.dumps(value)
+        return serialized.decode()
+
+    def loads(self, data: str) -> Any:
+        """Deserialize a value from JSON."""
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
+
+
+def _has_non_finite_float(value: Any) -> bool:
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(
+            _has_non_finite_float(k) or _has_non_finite_float(v)
+            for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite_float(v) for v in value)
+    return False
+
+
+def default_codec() -> Codec:
+    """Return the fastest codec available."""
+    return JsonCodec() if orjson is None else OrjsonCodec()
@@ -1,66 +1,367 @@
 from __future__ import annotations
 
+import asyncio
 import contextlib
 import logging
+import math
+import random
 import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import (
     TYPE_CHECKING,
     Any,
+    Awaitable,
     Callable,
+    Iterable,
     Literal,
     NamedTuple,
     Protocol,
     Sequence,
+    TypeVar,
 )
 
+from cassandra import OperationTimedOut, ReadTimeout, Unavailable, WriteTimeout
+from cassandra.protocol import OverloadedErrorMessage
+
 if TYPE_CHECKING:
     from types import TracebackType
 
     from cassandra.cluster import ResponseFuture, Session
-    from cassandra.query import PreparedStatement
+    from cassandra.query import PreparedStatement, Statement
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 class _Callback(Protocol):
     def __call__(self, rows: Sequence[Any], /) -> None: ...
 
 
+# Errors indicating the cluster is overloaded or slow, rather than a problem
+# with the query itself. These are retried (if enabled) and reduce the adaptive
+# concurrency limit.
+_RETRYABLE_ERRORS = (
+    OperationTimedOut,
+    ReadTimeout,
+    WriteTimeout,
+    Unavailable,
+    OverloadedErrorMessage,
+)
+
+
+@dataclass
+class _Query:
+    query: PreparedStatement
+    parameters: tuple[Any, ...] | None
+    callback: _Callback | None
+    timeout: float | None
+    attempts: int = 0
+    """Number of times the query has been started."""
+    started: float = 0.0
+    """Monotonic time at which the last attempt was started."""
+    has_results: bool = False
+    """Whether a page of results has been passed to the callback."""
+
+
 class ConcurrentQueries(contextlib.AbstractContextManager["ConcurrentQueries"]):
-    """Context manager for concurrent queries."""
+    """Context manager for concurrent queries.
+
+    Queries beyond the in-flight limit are queued, and started as earlier queries
+    complete. With `adaptive` concurrency, the limit is adjusted with an AIMD
+    (additive increase, multiplicative decrease) policy: it grows by one per
+    window of successful queries, and halves on timeouts, overload errors and
+    (if `target_latency` is set) slow queries.
+
+    By default, the first failing query cancels the others: no new queries are
+    started, queued queries and pending retries are dropped, and the results of
+    the queries still in flight are ignored (so their callbacks don't issue
+    further queries). The error is raised when exiting the context. Without
+    `fail_fast`, the remaining queries run to completion and the errors are
+    available in `errors`, alongside whatever partial results the callbacks
+    collected.
+
+    Args:
+        session: The session to execute the queries with.
+        max_in_flight: The maximum number of queries in flight. If `None`, all the
+            queries are started immediately.
+        adaptive: Whether to adapt the in-flight limit to the cluster latency and
+            errors, between 1 and `max_in_flight`. Requires `max_in_flight`.
+        target_latency: With `adaptive`, queries slower than this (in seconds)
+            reduce the in-flight limit. Defaults to `None` (only errors do).
+        max_retries: Number of times a query failing with a retryable error
+            (timeout, unavailable or overloaded) is retried. Defaults to 0.
+        retry_delay: Base delay (in seconds) of the exponential backoff between
+            retries. The actual delay is drawn uniformly up to the backoff.
+        max_retry_delay: Maximum delay (in seconds) between retries.
+        fail_fast: Whether to cancel the remaining queries on the first error,
+            and raise it on exit. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        *,
+        max_in_flight: int | None = None,
+        adaptive: bool = False,
+        target_latency: float | None = None,
+        max_retries: int = 0,
+        retry_delay: float = 0.1,
+        max_retry_delay: float = 5.0,
+        fail_fast: bool = True,
+    ) -> None:
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        if adaptive and max_in_flight is None:
+            raise ValueError("Adaptive concurrency requires max_in_flight")
 
-    def __init__(self, session: Session) -> None:
         self._session = session
         self._completion = threading.Condition()
         self._pending = 0
-        self._error: BaseException | None = None
+        self._errors: list[BaseException] = []
+        self._fail_fast = fail_fast
+        self._cancelled = False
+
+        self._max_in_flight = float("inf") if max_in_flight is None else max_in_flight
+        self._limit = self._max_in_flight
+        self._adaptive = adaptive
+        self._target_latency = target_latency
+        self._last_decrease = 0.0
+
+        self._max_retries = max_retries
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+
+        self._queue: deque[_Query] = deque()
+        self._retry_timers: dict[threading.Timer, _Query] = {}
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._retried = 0
+        self._cancelled_queries = 0
+
+    @property
+    def queued(self) -> int:
+        """Number of queries waiting for an in-flight slot."""
+        return len(self._queue)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of queries currently executing (or waiting to be retried)."""
+        return self._in_flight
+
+    @property
+    def completed(self) -> int:
+        """Number of queries which completed successfully."""
+        return self._completed
+
+    @property
+    def failed(self) -> int:
+        """Number of queries which failed (after any retries)."""
+        return self._failed
+
+    @property
+    def retried(self) -> int:
+        """Number of query retries."""
+        return self._retried
+
+    @property
+    def cancelled(self) -> int:
+        """Number of queries dropped (not started or not retried) by cancellation."""
+        return self._cancelled_queries
+
+    @property
+    def errors(self) -> list[BaseException]:
+        """Errors of the failed queries, in the order they failed."""
+        return list(self._errors)
+
+    @property
+    def concurrency_limit(self) -> float:
+        """Current in-flight limit (`inf` if unbounded)."""
+        return math.floor(self._limit) if self._adaptive else self._limit
+
+    def _start(self, query: _Query) -> None:
+        query.attempts += 1
+        query.started = time.monotonic()
+
+        execute_kwargs = {}
+        if query.timeout is not None:
+            execute_kwargs["timeout"] = query.timeout
+        future: ResponseFuture = self._session.execute_async(
+            query.query,
+            query.parameters,
+            **execute_kwargs,
+        )
+        future.add_callbacks(
+            self._handle_result,
+            self._handle_error,
+            callback_kwargs={
+                "future": future,
+                "query": query,
+            },
+            errback_kwargs={
+                "future": future,
+                "query": query,
+            },
+        )
+
+    def _dequeue(self) -> list[_Query]:
+        # Must be called with `self._completion` held.
+        to_start = []
+        while self._queue and not self._cancelled and self._in_flight < self._limit:
+            self._in_flight += 1
+            to_start.append(self._queue.popleft())
+        return to_start
+
+    def _adapt(self, query: _Query, congested: bool) -> None:
+        # Must be called with `self._completion` held.
+        if not self._adaptive:
+            return
+        if not congested and self._target_latency is not None:
+            congested = time.monotonic() - query.started > self._target_latency
+        if congested:
+            # Only decrease once per window: queries started before the last
+            # decrease were issued under the previous limit.
+            if query.started >= self._last_decrease:
+                self._limit = max(1.0, self._limit / 2)
+                self._last_decrease = time.monotonic()
+        else:
+            self._limit = min(self._max_in_flight, self._limit + 1 / self._limit)
 
     def _handle_result(
         self,
         result: Sequence[NamedTuple],
         future: ResponseFuture,
-        callback: Callable[[Sequence[NamedTuple]], Any] | None,
+        query: _Query,
     ) -> None:
-        if callback is not None:
-            callback(result)
+        if self._cancelled:
+            # Ignore the results, so the callback doesn't issue more queries.
+            self._release()
+            return
+
+        query.has_results = True
+        if query.callback is not None:
+            try:
+                query.callback(result)
+            except Exception as e:  # noqa: BLE001
+                # The error would otherwise be swallowed by the driver, and the
+                # query never completed.
+                self._fail(e, future)
+                return
 
         if future.has_more_pages:
             future.start_fetching_next_page()
-        else:
-            with self._completion:
-                self._pending -= 1
-                if self._pending == 0:
-                    self._completion.notify()
+            return
+
+        with self._completion:
+            self._in_flight -= 1
+            self._pending -= 1
+            self._completed += 1
+            self._adapt(query, congested=False)
+            to_start = self._dequeue()
+            if self._pending == 0:
+                self._completion.notify()
+        for next_query in to_start:
+            self._start(next_query)
+
+    def _handle_error(
+        self, error: BaseException, future: ResponseFuture, query: _Query
+    ) -> None:
+        if self._cancelled:
+            self._release()
+            return
+
+        retryable = isinstance(error, _RETRYABLE_ERRORS)
+        with self._completion:
+            self._adapt(query, congested=retryable)
+            # A query is only retried if no results were passed to the callback,
+            # otherwise the callback would see the first pages twice.
+            retry = (
+                retryable
+                and query.attempts <= self._max_retries
+                and not query.has_results
+                and not self._cancelled
+            )
+            if retry:
+                # The query keeps its in-flight slot while waiting to be retried.
+                self._retried += 1
+                backoff = self._retry_delay * 2 ** (query.attempts - 1)
+                delay = random.uniform(0, min(self._max_retry_delay, backoff))  # noqa: S311
+                timer = threading.Timer(delay, self._retry)
+                timer.args = (timer,)
+                timer.daemon = True
+                self._retry_timers[timer] = query
+
+        if retry:
+            logger.debug("Retrying query in %.3fs after error: %s", delay, future.query)
+            timer.start()
+            return
 
-    def _handle_error(self, error: BaseException, future: ResponseFuture) -> None:
+        self._fail(error, future)
+
+    def _retry(self, timer: threading.Timer) -> None:
+        with self._completion:
+            # If the timer was cancelled, `cancel` released the query.
+            query = self._retry_timers.pop(timer, None)
+        if query is not None:
+            self._start(query)
+
+    def _release(self) -> None:
+        # Release the slot of a query whose results are ignored after cancelling.
+        with self._completion:
+            self._in_flight -= 1
+            self._pending -= 1
+            self._cancelled_queries += 1
+            self._completion.notify()
+
+    def _fail(self, error: BaseException, future: ResponseFuture) -> None:
         logger.error(
             "Error executing query: %s",
             future.query,
             exc_info=error,
         )
         with self._completion:
-            self._error = error
+            self._in_flight -= 1
+            self._pending -= 1
+            self._failed += 1
+            self._errors.append(error)
+            to_start = [] if self._fail_fast else self._dequeue()
             self._completion.notify()
+        if self._fail_fast:
+            self.cancel()
+        for next_query in to_start:
+            self._start(next_query)
+
+    def cancel(self) -> None:
+        """Cancel the remaining queries.
+
+        No new queries are started, queued queries and pending retries are
+        dropped, and the results of the queries still in flight are ignored. The
+        driver doesn't support interrupting queries already sent to the cluster.
+        """
+        with self._completion:
+            if self._cancelled:
+                return
+            self._cancelled = True
+
+            dropped = len(self._queue)
+            self._queue.clear()
+            self._pending -= dropped
+
+            timers = list(self._retry_timers)
+            self._retry_timers.clear()
+            self._in_flight -= len(timers)
+            self._pending -= len(timers)
+
+            self._cancelled_queries += dropped + len(timers)
+            self._completion.notify()
+
+        for timer in timers:
+            timer.cancel()
 
     def execute(
         self,
@@ -72,7 +373,8 @@ class ConcurrentQueries(contextlib.AbstractContextManager["ConcurrentQueries"]):
         """Execute a query concurrently.
 
         Because this is done concurrently, it expects a callback if you need
-        to inspect the results.
+        to inspect the results. If the in-flight limit is reached, the query is
+        queued and started once a slot frees up.
 
         Args:
             query: The query to execute.
@@ -80,48 +382,240 @@ class ConcurrentQueries(contextlib.AbstractContextManager["ConcurrentQueries"]):
             callback: Callback to apply to the results. Defaults to `None`.
             timeout: Timeout to use (if not the session default).
         """
-        # TODO: We could have some form of throttling, where we track the number
-        # of pending calls and queue things if it exceed some threshold.
-
+        pending_query = _Query(
+            query=query, parameters=parameters, callback=callback, timeout=timeout
+        )
         with self._completion:
+            if self._cancelled:
+                self._cancelled_queries += 1
+                return
             self._pending += 1
-            if self._error is not None:
+            if self._in_flight >= self._limit:
+                self._queue.append(pending_query)
                 return
+            self._in_flight += 1
 
-        execute_kwargs = {}
-        if timeout is not None:
-            execute_kwargs["timeout"] = timeout
-        future: ResponseFuture = self._session.execute_async(
-            query,
-            parameters,
-            **execute_kwargs,
-        )
-        future.add_callbacks(
-            self._handle_result,
-            self._handle_error,
-            callback_kwargs={
-                "future": future,
-                "callback": callback,
-            },
-            errback_kwargs={
-                "future": future,
-            },
-        )
+        self._start(pending_query)
 
     def __exit__(
         self,
-        _exc_type: type[BaseException] | None,
+        exc_type: type[BaseException] | None,
         _exc_inst: BaseException | None,
         _exc_traceback: TracebackType | None,
     ) -> Literal[False]:
+        if exc_type is not None:
+            # Don't wait for queries whose results won't be used.
+            self.cancel()
+            return False
+
         with self._completion:
-            while self._error is None and self._pending > 0:
+            while not self._cancelled and self._pending > 0:
                 self._completion.wait()
 
-        if self._error is not None:
-            raise self._error
+        if self._fail_fast and self._errors:
+            raise self._errors[0]
 
         # Don't swallow the exception.
         # We don't need to do anything with the exception (`_exc_*` parameters)
         # since returning false here will automatically re-raise it.
         return False
+
+
+async def aexecute(
+    session: Session,
+    query: PreparedStatement,
+    parameters: tuple[Any, ...] | None = None,
+    timeout: float | None = None,
+) -> list[Any]:
+    """Execute a query and await all of its rows.
+
+    The driver `ResponseFuture` is bridged to an asyncio future, so awaiting the
+    query does not tie up a thread. All the result pages are fetched.
+
+    Args:
+        session: The session to execute the query with.
+        query: The query to execute.
+        parameters: Parameter tuple for the query. Defaults to `None`.
+        timeout: Timeout to use (if not the session default).
+
+    Returns:
+        The rows of all the result pages.
+    """
+    loop = asyncio.get_running_loop()
+    result: asyncio.Future[list[Any]] = loop.create_future()
+    rows: list[Any] = []
+
+    def set_result() -> None:
+        if not result.done():
+            result.set_result(rows)
+
+    def set_exception(error: BaseException) -> None:
+        if not result.done():
+            result.set_exception(error)
+
+    execute_kwargs = {}
+    if timeout is not None:
+        execute_kwargs["timeout"] = timeout
+    future: ResponseFuture = session.execute_async(
+        query,
+        parameters,
+        **execute_kwargs,
+    )
+
+    def handle_result(page: Sequence[Any]) -> None:
+        if result.done():
+            # Cancelled while waiting: don't fetch the remaining pages.
+            return
+        rows.extend(page)
+        if future.has_more_pages:
+            future.start_fetching_next_page()
+        else:
+            loop.call_soon_threadsafe(set_result)
+
+    def handle_error(error: BaseException) -> None:
+        loop.call_soon_threadsafe(set_exception, error)
+
+    future.add_callbacks(handle_result, handle_error)
+    return await result
+
+
+async def aexecute_page(
+    session: Session,
+    statement: Statement,
+    paging_state: bytes | None = None,
+    timeout: float | None = None,
+) -> tuple[list[Any], bytes | None]:
+    """Execute a statement and await a single page of its rows.
+
+    The size of the page is the `fetch_size` of the statement.
+
+    Args:
+        session: The session to execute the statement with.
+        statement: The statement to execute.
+        paging_state: Paging state of the page to fetch, as returned for the
+            previous page. Defaults to `None` (the first page).
+        timeout: Timeout to use (if not the session default).
+
+    Returns:
+        The rows of the page, and the paging state of the next page (`None` if
+        this is the last page).
+    """
+    loop = asyncio.get_running_loop()
+    result: asyncio.Future[tuple[list[Any], bytes | None]] = loop.create_future()
+
+    def set_result(page: tuple[list[Any], bytes | None]) -> None:
+        if not result.done():
+            result.set_result(page)
+
+    def set_exception(error: BaseException) -> None:
+        if not result.done():
+            result.set_exception(error)
+
+    execute_kwargs = {}
+    if timeout is not None:
+        execute_kwargs["timeout"] = timeout
+    future: ResponseFuture = session.execute_async(
+        statement,
+        paging_state=paging_state,
+        **execute_kwargs,
+    )
+
+    def handle_result(rows: Sequence[Any]) -> None:
+        # The result is available once the callbacks are called.
+        next_paging_state = future.result().paging_state
+        loop.call_soon_threadsafe(set_result, (list(rows), next_paging_state))
+
+    def handle_error(error: BaseException) -> None:
+        loop.call_soon_threadsafe(set_exception, error)
+
+    future.add_callbacks(handle_result, handle_error)
+    return await result
+
+
+async def gather_fail_fast(*aws: Awaitable[T]) -> list[T]:
+    """Run awaitables concurrently, cancelling the others on the first error.
+
+    Like `asyncio.gather`, but the remaining awaitables are cancelled as soon as
+    one of them fails, so queries waiting for a concurrency slot are never
+    started.
+
+    Args:
+        aws: The awaitables to run.
+
+    Returns:
+        The results, in the order of the awaitables.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def map_fail_fast(
+    fn: Callable[[T], R], items: Iterable[T], max_workers: int
+) -> list[R]:
+    """Apply a function to the items from a pool of threads.
+
+    Once a call fails, the calls not yet started are cancelled, and the error is
+    raised when the running ones complete.
+
+    Args:
+        fn: The function to apply.
+        items: The items to apply it to.
+        max_workers: The maximum number of calls running at once.
+
+    Returns:
+        The results, in the order of the items.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fn, item) for item in items]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+class AsyncConcurrentQueries:
+    """Bounded concurrent execution of queries from asyncio code.
+
+    Unlike `ConcurrentQueries`, no thread waits for the queries to complete:
+    each query is awaited through `aexecute`. A semaphore bounds the number of
+    queries in flight, so fanning out over many queries (eg., with
+    `asyncio.gather`) does not flood the driver. It can be shared by concurrent
+    operations, to bound their queries together, but only within the event loop
+    it is first used in.
+
+    Args:
+        session: The session to execute the queries with.
+        max_concurrency: The maximum number of queries in flight.
+    """
+
+    def __init__(self, session: Session, max_concurrency: int) -> None:
+        self._session = session
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def execute(
+        self,
+        query: PreparedStatement,
+        parameters: tuple[Any, ...] | None = None,
+        timeout: float | None = None,
+    ) -> list[Any]:
+        """Execute a query once a concurrency slot is available.
+
+        Args:
+            query: The query to execute.
+            parameters: Parameter tuple for the query. Defaults to `None`.
+            timeout: Timeout to use (if not the session default).
+
+        Returns:
+            The rows of all the result pages.
+        """
+        async with self._semaphore:
+            return await aexecute(
+                self._session, query, parameters=parameters, timeout=timeout
+            )
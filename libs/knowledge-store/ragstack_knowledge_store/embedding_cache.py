@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Literal
+
+import numpy as np
+
+from ._cache import LruCache
+from .embedding_model import EmbeddingModel
+
+if TYPE_CHECKING:
+    from os import PathLike
+
+# Rows looked up per query in the SQLite database.
+_SQLITE_BATCH_SIZE = 500
+
+# Documents and queries may be embedded differently, so they are keyed apart.
+_Kind = Literal["document", "query"]
+
+
+class CachedEmbeddingModel(EmbeddingModel):
+    """Embedding model caching the embeddings of another model.
+
+    Embeddings are keyed by a hash of their text. They are looked up in memory,
+    then in an optional SQLite database, and only the missing texts are embedded
+    by the model. Texts repeated within a call are embedded once.
+
+    The database persists the embeddings across processes. It is memory-mapped,
+    so lookups of recently used embeddings are served from the page cache. It
+    stores the embeddings as float32, like the vector columns of the store. The
+    async methods access it from a worker thread, so they don't block the event
+    loop.
+
+    The returned embeddings are copies, which callers may modify.
+
+    Args:
+        model: The embedding model whose embeddings are cached.
+        max_size: Maximum number of embeddings kept in memory (the least recently
+            used are evicted). If 0, only the database is used. Defaults to
+            10000.
+        path: Optional path of the SQLite database. It is created if needed.
+        namespace: Namespace of the keys, allowing several models to share a
+            database. Defaults to "".
+        mmap_size: Number of bytes of the database to memory-map. Defaults to
+            256 MiB.
+    """
+
+    def __init__(
+        self,
+        model: EmbeddingModel,
+        *,
+        max_size: int = 10000,
+        path: str | PathLike[str] | None = None,
+        namespace: str = "",
+        mmap_size: int = 256 * 1024 * 1024,
+    ) -> None:
+        self._model = model
+        self._namespace = namespace
+        self._memory: LruCache[bytes, list[float]] | None = (
+            LruCache(max_size=max_size) if max_size > 0 else None
+        )
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            # The connection is shared by the threads embedding texts, and guarded
+            # by the lock.
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key BLOB PRIMARY KEY, embedding BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+        self.hits = 0
+        """Number of texts whose embedding was found in the cache."""
+        self.misses = 0
+        """Number of texts embedded by the model."""
+
+    def close(self) -> None:
+        """Close the database, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _key(self, kind: _Kind, text: str) -> bytes:
+        return hashlib.sha256(f"{self._namespace}\0{kind}\0{text}".encode()).digest()
+
+    def _lookup(self, keys: list[bytes]) -> dict[bytes, list[float]]:
+        found: dict[bytes, list[float]] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            embedding = self._memory.get(key) if self._memory is not None else None
+            if embedding is None:
+                missing.append(key)
+            else:
+                found[key] = embedding
+
+        if missing and self._db is not None:
+            with self._lock:
+                rows: list[tuple[bytes, bytes]] = []
+                for start in range(0, len(missing), _SQLITE_BATCH_SIZE):
+                    batch = missing[start : start + _SQLITE_BATCH_SIZE]
+                    placeholders = ", ".join("?" * len(batch))
+                    rows.extend(
+                        self._db.execute(
+                            "SELECT key, embedding FROM embeddings "  # noqa: S608
+                            f"WHERE key IN ({placeholders})",
+                            batch,
+                        )
+                    )
+            for key, blob in rows:
+                embedding = np.frombuffer(blob, dtype=np.float32).tolist()
+                found[key] = embedding
+                if self._memory is not None:
+                    self._memory.put(key, embedding)
+
+        return found
+
+    def _store(self, embeddings: dict[bytes, list[float]]) -> None:
+        if self._memory is not None:
+            for key, embedding in embeddings.items():
+                self._memory.put(key, embedding)
+        if self._db is not None:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)",
+                    [
+                        (key, np.asarray(embedding, dtype=np.float32).tobytes())
+                        for key, embedding in embeddings.items()
+                    ],
+                )
+                self._db.commit()
+
+    def _prepare(
+        self, kind: _Kind, texts: list[str]
+    ) -> tuple[list[bytes], dict[bytes, list[float]], dict[bytes, str]]:
+        """Return the keys, the cached embeddings and the (unique) missing texts."""
+        keys = [self._key(kind, text) for text in texts]
+        cached = self._lookup(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return keys, cached, missing
+
+    def _complete(
+        self,
+        keys: list[bytes],
+        cached: dict[bytes, list[float]],
+        missing: dict[bytes, str],
+        embeddings: list[list[float]],
+    ) -> list[list[float]]:
+        """Cache the embeddings of the missing texts and return all of them."""
+        new = dict(zip(missing, embeddings))
+        if new:
+            self._store(new)
+        cached.update(new)
+        # Copies, so that callers can't modify the cached embeddings.
+        return [list(cached[key]) for key in keys]
+
+    async def _aprepare(
+        self, kind: _Kind, texts: list[str]
+    ) -> tuple[list[bytes], dict[bytes, list[float]], dict[bytes, str]]:
+        if self._db is None:
+            return self._prepare(kind, texts)
+        return await asyncio.to_thread(self._prepare, kind, texts)
+
+    async def _acomplete(
+        self,
+        keys: list[bytes],
+        cached: dict[bytes, list[float]],
+        missing: dict[bytes, str],
+        embeddings: list[list[float]],
+    ) -> list[list[float]]:
+        if self._db is None or not missing:
+            return self._complete(keys, cached, missing, embeddings)
+        return await asyncio.to_thread(
+            self._complete, keys, cached, missing, embeddings
+        )
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts, using the cached embeddings."""
+        keys, cached, missing = self._prepare("document", texts)
+        embeddings = self._model.embed_texts(list(missing.values())) if missing else []
+        return self._complete(keys, cached, missing, embeddings)
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed query text, using the cached embedding."""
+        keys, cached, missing = self._prepare("query", [text])
+        embeddings = [self._model.embed_query(text)] if missing else []
+        return self._complete(keys, cached, missing, embeddings)[0]
+
+    async def aembed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts, using the cached embeddings."""
+        keys, cached, missing = await self._aprepare("document", texts)
+        embeddings = (
+            await self._model.aembed_texts(list(missing.values())) if missing else []
+        )
+        return await self._acomplete(keys, cached, missing, embeddings)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Embed query text, using the cached embedding."""
+        keys, cached, missing = await self._aprepare("query", [text])
+        embeddings = [await self._model.aembed_query(text)] if missing else []
+        return (await self._acomplete(keys, cached, missing, embeddings))[0]
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import heapq
 import logging
+import queue
 import re
-import secrets
-from collections.abc import Iterable
-from dataclasses import asdict, dataclass, field, is_dataclass
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from enum import Enum
 from typing import (
     TYPE_CHECKING,
@@ -15,16 +18,78 @@ from typing import (
     cast,
 )
 
+import numpy as np
 from cassandra.cluster import ConsistencyLevel, PreparedStatement, Session
 from cassio.config import check_resolve_keyspace, check_resolve_session
 
+from ._cache import CacheStats, LruCache
 from ._mmr_helper import MmrHelper
-from .concurrency import ConcurrentQueries
+from ._node_utils import (
+    _DEFAULT_CODEC,
+    BatchProgress,
+    MetadataIndexingMode,
+    MetadataIndexingPolicy,
+    MetadataIndexingType,
+    Node,
+    _abatched,
+    _AddedNodes,
+    _batch_added,
+    _batched,
+    _coerce_string,
+    _Edge,
+    _is_metadata_field_indexed,
+    _LazyNode,
+    _merge_edges,
+    _NodeBatch,
+    _normalize_metadata_indexing_policy,
+    _serialize_links,
+    _serialize_metadata,
+    _TraversalState,
+    _unpack_nodes,
+)
+from .concurrency import (
+    AsyncConcurrentQueries,
+    ConcurrentQueries,
+    aexecute,
+    aexecute_page,
+    gather_fail_fast,
+    map_fail_fast,
+)
 from .content import Kind
-from .links import Link
+from .math import cosine_similarity, normalize_rows
 
 if TYPE_CHECKING:
+    from collections.abc import (
+        AsyncIterable,
+        AsyncIterator,
+        Callable,
+        Generator,
+        Iterable,
+        Iterator,
+    )
+
+    from .codec import Codec
     from .embedding_model import EmbeddingModel
+    from .links import Link
+
+__all__ = [
+    "ADJACENT_COLUMNS",
+    "CONTENT_COLUMNS",
+    "CONTENT_ID",
+    "EDGE_COLUMNS",
+    "NODE_COLUMNS",
+    "SELECT_CQL_TEMPLATE",
+    "BatchProgress",
+    "GraphStore",
+    "MetadataIndexingMode",
+    "MetadataIndexingPolicy",
+    "MetadataIndexingType",
+    "Node",
+    "NodePage",
+    "ScanPage",
+    "SetupMode",
+    "token_ranges",
+]
 
 logger = logging.getLogger(__name__)
 
@@ -32,23 +97,60 @@ CONTENT_ID = "content_id"
 
 CONTENT_COLUMNS = "content_id, kind, text_content, links_blob, metadata_blob"
 
+ADJACENT_COLUMNS = "content_id, text_embedding, link_to_tags"
+
+# Columns of the edge table, aliased like the adjacent columns of the node table.
+EDGE_COLUMNS = (
+    "target_content_id AS content_id, target_text_embedding AS text_embedding, "
+    "target_link_to_tags AS link_to_tags, target_metadata_s AS metadata_s"
+)
+
+# Columns of the node table which can be projected by a scan.
+NODE_COLUMNS = (
+    "content_id",
+    "kind",
+    "text_content",
+    "text_embedding",
+    "link_to_tags",
+    "link_from_tags",
+    "links_blob",
+    "metadata_blob",
+    "metadata_s",
+)
+
+# Range of the tokens of the Murmur3 partitioner. The minimum token is never the
+# token of a partition key.
+_MIN_TOKEN = -(2**63)
+_MAX_TOKEN = 2**63 - 1
+
 SELECT_CQL_TEMPLATE = (
     "SELECT {columns} FROM {table_name}{where_clause}{order_clause}{limit_clause};"
 )
 
 
 @dataclass
-class Node:
-    """Node in the GraphStore."""
+class NodePage:
+    """Page of nodes returned by a paged search."""
+
+    nodes: list[Node]
+    """Nodes of the page."""
+    paging_state: bytes | None
+    """Paging state resuming the search after this page, or `None` if this is the
+    last page."""
+
+
+@dataclass
+class ScanPage:
+    """Page of nodes returned by a token range scan."""
 
-    text: str
-    """Text contained by the node."""
-    id: str | None = None
-    """Unique ID for the node. Will be generated by the GraphStore if not set."""
-    metadata: dict[str, Any] = field(default_factory=dict)
-    """Metadata for the node."""
-    links: set[Link] = field(default_factory=set)
-    """Links for the node."""
+    rows: list[Any]
+    """Rows of the page, each with the scanned columns and the `token` of the
+    node."""
+    nodes: list[Node]
+    """Nodes of the rows, if the scan converts them (empty otherwise)."""
+    token: int
+    """Token of the last node of the page. Scanning the range from this token
+    resumes the scan after this page."""
 
 
 class SetupMode(Enum):
@@ -59,80 +161,52 @@ class SetupMode(Enum):
     OFF = 3
 
 
-class MetadataIndexingMode(Enum):
-    """Mode used to index metadata."""
-
-    DEFAULT_TO_UNSEARCHABLE = 1
-    DEFAULT_TO_SEARCHABLE = 2
-
+def token_ranges(splits: int) -> list[tuple[int, int]]:
+    """Split the token ring into `splits` ranges `(start, end]` of equal width."""
+    if splits < 1:
+        raise ValueError("splits must be at least 1")
+    width = (_MAX_TOKEN - _MIN_TOKEN) // splits
+    bounds = [_MIN_TOKEN + i * width for i in range(splits)] + [_MAX_TOKEN]
+    return list(zip(bounds[:-1], bounds[1:]))
 
-MetadataIndexingType = Union[tuple[str, Iterable[str]], str]
-MetadataIndexingPolicy = tuple[MetadataIndexingMode, set[str]]
 
-
-def _is_metadata_field_indexed(field_name: str, policy: MetadataIndexingPolicy) -> bool:
-    p_mode, p_fields = policy
-    if p_mode == MetadataIndexingMode.DEFAULT_TO_UNSEARCHABLE:
-        return field_name in p_fields
-    if p_mode == MetadataIndexingMode.DEFAULT_TO_SEARCHABLE:
-        return field_name not in p_fields
-    raise ValueError(f"Unexpected metadata indexing mode {p_mode}")
-
-
-def _serialize_metadata(md: dict[str, Any]) -> str:
-    if isinstance(md.get("links"), set):
-        md = md.copy()
-        md["links"] = list(md["links"])
-    return json.dumps(md)
-
-
-def _serialize_links(links: set[Link]) -> str:
-    class SetAndLinkEncoder(json.JSONEncoder):
-        def default(self, obj: Any) -> Any:
-            if not isinstance(obj, type) and is_dataclass(obj):
-                return asdict(obj)
-
-            if isinstance(obj, Iterable):
-                return list(obj)
-
-            # Let the base class default method raise the TypeError
-            return super().default(obj)
-
-    return json.dumps(list(links), cls=SetAndLinkEncoder)
-
-
-def _deserialize_metadata(json_blob: str | None) -> dict[str, Any]:
-    # We don't need to convert the links list back to a set -- it will be
-    # converted when accessed, if needed.
-    return cast(dict[str, Any], json.loads(json_blob or ""))
-
-
-def _deserialize_links(json_blob: str | None) -> set[Link]:
-    return {
-        Link(kind=link["kind"], direction=link["direction"], tag=link["tag"])
-        for link in cast(list[dict[str, Any]], json.loads(json_blob or ""))
-    }
-
-
-def _row_to_node(row: Any) -> Node:
-    metadata = _deserialize_metadata(row.metadata_blob)
-    links = _deserialize_links(row.links_blob)
-    return Node(
+def _row_to_node(row: Any, codec: Codec = _DEFAULT_CODEC) -> Node:
+    return _LazyNode.from_blobs(
         id=row.content_id,
         text=row.text_content,
-        metadata=metadata,
-        links=links,
+        metadata_blob=row.metadata_blob,
+        links_blob=row.links_blob,
+        codec=codec,
     )
 
 
 _CQL_IDENTIFIER_PATTERN = re.compile(r"[a-zA-Z][a-zA-Z0-9_]*")
 
+# Shape of a prepared search statement: columns, metadata keys, whether there is
+# a limit, an ID and an embedding, and number of tags (0 if none).
+_StatementKey = tuple[Union[str, None], tuple[str, ...], bool, bool, bool, int]
+
+# Key of the adjacency cache: tags, metadata filter, limit and query embedding.
+# The limit and query embedding are `None` for the edge table, whose entries
+# hold all the targets of a tag.
+_AdjacencyKey = tuple[
+    tuple[tuple[str, str], ...],
+    tuple[tuple[str, str], ...],
+    Union[int, None],
+    Union[tuple[float, ...], None],
+]
+
+
+def _row_to_edge(row: Any) -> _Edge:
+    return _Edge(
+        target_content_id=row.content_id,
+        target_text_embedding=row.text_embedding,
+        target_link_to_tags=set(row.link_to_tags or []),
+    )
 
-@dataclass
-class _Edge:
-    target_content_id: str
-    target_text_embedding: list[float]
-    target_link_to_tags: set[tuple[str, str]]
+
+class _ScanStoppedError(Exception):
+    """Raised to stop a scan whose rows are no longer iterated."""
 
 
 class GraphStore:
@@ -144,7 +218,68 @@ class GraphStore:
     Args:
         embedding: The embeddings to use for the document content.
         setup_mode: Mode used to create the Cassandra table (SYNC,
-            ASYNC or OFF).
+            ASYNC or OFF). With ASYNC, the schema is created in the background
+            and the data operations wait for it to be ready.
+        max_concurrent_queries: Maximum number of queries in flight at once.
+            Further queries are queued. The limit is shared by all the async
+            operations (per event loop), while each sync operation has its own.
+            Defaults to 100.
+        adaptive_concurrency: Whether to adapt the number of queries in flight
+            (up to `max_concurrent_queries`) to timeouts and overload errors
+            from the cluster. Only applies to the sync methods. Defaults to
+            False.
+        max_query_retries: Number of times a query failing with a timeout,
+            unavailable or overloaded error is retried, with jittered backoff.
+            Only applies to the sync methods. Defaults to 0.
+        adjacency_cache_size: Maximum number of adjacency results cached across
+            MMR traversals. The cache is disabled if 0 (the default). With an
+            edge table, all the targets of a `(tag, metadata_filter)` are cached
+            and ranked for each query. Otherwise, the targets are ranked by the
+            ANN query, so the entries also depend on `k_per_tag` and the query
+            embedding, and are only reused by repetitions of the same query.
+        adjacency_cache_ttl: Time (in seconds) after which cached adjacency
+            results expire. Nodes added through this store invalidate the
+            affected entries immediately, while writes from other clients are
+            only seen after expiration. Defaults to 60 seconds.
+        normalize_embeddings: Whether to L2-normalize the embeddings when writing
+            nodes (and the query embeddings when searching). The vector index of
+            new tables then uses the dot product similarity, and MMR uses the
+            stored embeddings without normalizing them again. All the nodes of
+            the table must have been written with this enabled. Defaults to
+            False.
+        mmr_float16: Whether MMR traversals keep the candidate embeddings in
+            float16, halving their memory. Scores are then approximate, so
+            near-ties may be broken differently. Defaults to False.
+        adjacency_tags_per_query: Maximum number of tags whose adjacent nodes are
+            fetched by a single query in MMR traversals, using a disjunction of
+            `link_from_tags CONTAINS` restrictions. The adjacent nodes are then
+            ranked by similarity across all the tags of the query (fetching
+            `adjacent_k` nodes per tag in total), rather than per tag. This
+            requires a server supporting `OR` in SAI queries. Defaults to 1 (a
+            query per tag).
+        edge_table: Name of an optional table materializing the edges. It is
+            partitioned by `(kind, tag)`, with a row for each node having an
+            incoming link from the tag, storing the node's embedding, outgoing
+            tags and metadata. When set, the table is maintained by `add_nodes`
+            and traversals read the adjacent nodes with partition scans, rather
+            than secondary index queries on the node table. Metadata filters
+            are then applied by the client. Edges aren't removed when a node is
+            re-added with different links. Tables of existing stores can be
+            filled with `backfill_edge_table`. Defaults to None.
+        read_batch_size: Maximum number of nodes read by a single `IN` query when
+            fetching nodes by ID. The IDs are grouped by replica (when the token
+            map of the cluster is known) before being split into batches, so
+            that each batch is served by the same replicas. Defaults to 20.
+        codec: Codec used to serialize the metadata and links of the nodes.
+            Defaults to `orjson` if installed, else the `json` module. Both
+            produce JSON, so stores can switch between them. The metadata and
+            links of the nodes read from the store are decoded when accessed.
+        embedding_dimension: Dimension of the embeddings, used when creating the
+            tables. If not set, it is determined by embedding a test query.
+        prepared_statement_cache_size: Maximum number of prepared search
+            statements kept (the least recently used are evicted). Each
+            combination of metadata filter keys needs its own statement.
+            Defaults to 1000.
     """
 
     def __init__(
@@ -158,8 +293,42 @@ class GraphStore:
         setup_mode: SetupMode = SetupMode.SYNC,
         metadata_indexing: MetadataIndexingType = "all",
         insert_timeout: float = 30.0,
+        max_concurrent_queries: int = 100,
+        adaptive_concurrency: bool = False,
+        max_query_retries: int = 0,
+        adjacency_cache_size: int = 0,
+        adjacency_cache_ttl: float = 60.0,
+        normalize_embeddings: bool = False,
+        mmr_float16: bool = False,
+        adjacency_tags_per_query: int = 1,
+        edge_table: str | None = None,
+        read_batch_size: int = 20,
+        codec: Codec | None = None,
+        embedding_dimension: int | None = None,
+        prepared_statement_cache_size: int = 1000,
     ):
+        if adjacency_tags_per_query < 1:
+            raise ValueError("adjacency_tags_per_query must be at least 1")
+        self._adjacency_tags_per_query = adjacency_tags_per_query
+        if read_batch_size < 1:
+            raise ValueError("read_batch_size must be at least 1")
+        self._read_batch_size = read_batch_size
+        self._codec = codec or _DEFAULT_CODEC
+        self._embedding_dimension = embedding_dimension
         self._insert_timeout = insert_timeout
+        self._max_concurrent_queries = max_concurrent_queries
+        self._async_queries: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, AsyncConcurrentQueries
+        ] = weakref.WeakKeyDictionary()
+        self._adaptive_concurrency = adaptive_concurrency
+        self._max_query_retries = max_query_retries
+        self._normalize_embeddings = normalize_embeddings
+        self._mmr_float16 = mmr_float16
+        self._adjacency_cache: LruCache[_AdjacencyKey, list[_Edge]] | None = (
+            LruCache(max_size=adjacency_cache_size, ttl=adjacency_cache_ttl)
+            if adjacency_cache_size > 0
+            else None
+        )
         if targets_table:
             logger.warning(
                 "The 'targets_table' parameter is deprecated "
@@ -175,58 +344,150 @@ class GraphStore:
         if not _CQL_IDENTIFIER_PATTERN.fullmatch(node_table):
             raise ValueError(f"Invalid node table name: {node_table}")
 
+        if edge_table is not None and not _CQL_IDENTIFIER_PATTERN.fullmatch(edge_table):
+            raise ValueError(f"Invalid edge table name: {edge_table}")
+
         self._embedding = embedding
         self._node_table = node_table
+        self._edge_table = edge_table
         self._session = session
         self._keyspace = keyspace
-        self._prepared_query_cache: dict[str, PreparedStatement] = {}
+        self._prepared_query_cache: LruCache[_StatementKey, PreparedStatement] = (
+            LruCache(max_size=prepared_statement_cache_size)
+        )
+        # Prepared scan queries, by scanned columns.
+        self._scan_queries: dict[str, PreparedStatement] = {}
 
         self._metadata_indexing_policy = self._normalize_metadata_indexing_policy(
             metadata_indexing=metadata_indexing,
         )
 
+        self._setup_future: Future[None] | None = None
         if setup_mode == SetupMode.SYNC:
             self._apply_schema()
-        elif setup_mode != SetupMode.OFF:
-            raise ValueError(
-                f"Invalid setup mode {setup_mode.name}. "
-                "Only SYNC and OFF are supported at the moment"
-            )
+            self._prepare_statements()
+        elif setup_mode == SetupMode.ASYNC:
+            # The schema is applied (and the statements prepared) in the
+            # background. Data operations wait for it to complete.
+            self._setup_future = Future()
+            threading.Thread(
+                target=self._run_setup,
+                args=(self._setup_future,),
+                name="graph-store-setup",
+                daemon=True,
+            ).start()
+        else:
+            self._prepare_statements()
+
+    def table_name(self) -> str:
+        """Returns the fully qualified table name."""
+        return f"{self._keyspace}.{self._node_table}"
 
+    def edge_table_name(self) -> str | None:
+        """Returns the fully qualified edge table name, if there is one."""
+        if self._edge_table is None:
+            return None
+        return f"{self._keyspace}.{self._edge_table}"
+
+    def _prepare_statements(self) -> None:
+        """Prepare the statements used by the data operations."""
         # TODO: Parent ID / source ID / etc.
-        self._insert_passage = session.prepare(
+        self._insert_passage = self._session.prepare(
             f"""
-            INSERT INTO {keyspace}.{node_table} (
+            INSERT INTO {self.table_name()} (
                 content_id, kind, text_content, text_embedding, link_to_tags,
                 link_from_tags, links_blob, metadata_blob, metadata_s
             ) VALUES (?, '{Kind.passage}', ?, ?, ?, ?, ?, ?, ?)
             """  # noqa: S608
         )
 
-        self._query_by_id = session.prepare(
+        self._query_by_ids = self._session.prepare(
             f"""
             SELECT {CONTENT_COLUMNS}
-            FROM {keyspace}.{node_table}
-            WHERE content_id = ?
+            FROM {self.table_name()}
+            WHERE content_id IN ?
             """  # noqa: S608
         )
 
-        self._query_ids_and_link_to_tags_by_id = session.prepare(
+        self._query_ids_and_link_to_tags_by_ids = self._session.prepare(
             f"""
             SELECT content_id, link_to_tags
-            FROM {keyspace}.{node_table}
-            WHERE content_id = ?
+            FROM {self.table_name()}
+            WHERE content_id IN ?
             """  # noqa: S608
         )
 
-    def table_name(self) -> str:
-        """Returns the fully qualified table name."""
-        return f"{self._keyspace}.{self._node_table}"
+        if self._edge_table is not None:
+            self._insert_edge = self._session.prepare(
+                f"""
+                INSERT INTO {self.edge_table_name()} (
+                    kind, tag, target_content_id, target_text_embedding,
+                    target_link_to_tags, target_metadata_s
+                ) VALUES (?, ?, ?, ?, ?, ?)
+                """  # noqa: S608
+            )
+
+            self._query_edges_by_tag = self._session.prepare(
+                f"""
+                SELECT {EDGE_COLUMNS}
+                FROM {self.edge_table_name()}
+                WHERE kind = ? AND tag = ?
+                """  # noqa: S608
+            )
+
+        # The search statements without metadata filter, used by the similarity
+        # and traversal searches.
+        self._get_search_cql(has_limit=True, has_embedding=True)
+        self._get_search_cql(
+            has_limit=True, columns=ADJACENT_COLUMNS, has_embedding=True
+        )
+        self._get_search_cql(
+            has_limit=True,
+            columns=ADJACENT_COLUMNS,
+            has_embedding=True,
+            has_link_from_tags=True,
+        )
+        self._get_search_cql(
+            has_limit=True, columns="content_id, link_to_tags", has_embedding=True
+        )
+        self._get_search_cql(
+            columns="content_id AS target_content_id", has_link_from_tags=True
+        )
+
+    def prepared_statement_cache_stats(self) -> CacheStats:
+        """Returns the statistics of the prepared search statement cache."""
+        return self._prepared_query_cache.stats()
+
+    def _run_setup(self, future: Future[None]) -> None:
+        try:
+            self._apply_schema()
+            self._prepare_statements()
+        except Exception as error:  # noqa: BLE001
+            future.set_exception(error)
+        else:
+            future.set_result(None)
+
+    def _ensure_setup(self) -> None:
+        """Wait for the setup to complete, raising its error if it failed."""
+        if self._setup_future is not None:
+            self._setup_future.result()
+
+    async def _aensure_setup(self) -> None:
+        """Wait for the setup to complete, raising its error if it failed."""
+        if self._setup_future is not None:
+            await asyncio.wrap_future(self._setup_future)
 
     def _apply_schema(self) -> None:
-        """Apply the schema to the database."""
-        embedding_dim = len(self._embedding.embed_query("Test Query"))
-        self._session.execute(f"""
+        """Apply the schema to the database.
+
+        The tables are created first, then their indexes, the statements of each
+        step being executed concurrently.
+        """
+        embedding_dim = self._embedding_dimension or len(
+            self._embedding.embed_query("Test Query")
+        )
+        tables = [
+            f"""
             CREATE TABLE IF NOT EXISTS {self.table_name()} (
                 content_id TEXT,
                 kind TEXT,
@@ -241,115 +502,625 @@ class GraphStore:
 
                 PRIMARY KEY (content_id)
             )
-        """)
-
-        # Index on text_embedding (for similarity search)
-        self._session.execute(f"""
+            """
+        ]
+        if self._edge_table is not None:
+            tables.append(f"""
+                CREATE TABLE IF NOT EXISTS {self.edge_table_name()} (
+                    kind TEXT,
+                    tag TEXT,
+                    target_content_id TEXT,
+                    target_text_embedding VECTOR<FLOAT, {embedding_dim}>,
+                    target_link_to_tags SET<TUPLE<TEXT, TEXT>>,
+                    target_metadata_s MAP<TEXT,TEXT>,
+
+                    PRIMARY KEY ((kind, tag), target_content_id)
+                )
+            """)
+
+        # Index on text_embedding (for similarity search). With normalized
+        # embeddings, the dot product is the cosine similarity, but cheaper.
+        index_options = (
+            " WITH OPTIONS = {'similarity_function': 'dot_product'}"
+            if self._normalize_embeddings
+            else ""
+        )
+        indexes = [
+            f"""
             CREATE CUSTOM INDEX IF NOT EXISTS {self._node_table}_text_embedding_index
             ON {self.table_name()}(text_embedding)
-            USING 'StorageAttachedIndex';
-        """)
-
-        self._session.execute(f"""
+            USING 'StorageAttachedIndex'{index_options};
+            """,
+            f"""
             CREATE CUSTOM INDEX IF NOT EXISTS {self._node_table}_link_from_tags
             ON {self.table_name()}(link_from_tags)
             USING 'StorageAttachedIndex';
-        """)
-
-        self._session.execute(f"""
+            """,
+            f"""
             CREATE CUSTOM INDEX IF NOT EXISTS {self._node_table}_metadata_s_index
             ON {self.table_name()}(ENTRIES(metadata_s))
             USING 'StorageAttachedIndex';
-        """)
+            """,
+        ]
+
+        for statements in (tables, indexes):
+            with self._concurrent_queries() as cq:
+                for statement in statements:
+                    cq.execute(statement)
 
     def _concurrent_queries(self) -> ConcurrentQueries:
-        return ConcurrentQueries(self._session)
+        return ConcurrentQueries(
+            self._session,
+            max_in_flight=self._max_concurrent_queries,
+            adaptive=self._adaptive_concurrency,
+            max_retries=self._max_query_retries,
+        )
+
+    def _async_concurrent_queries(self) -> AsyncConcurrentQueries:
+        # The async operations share their semaphore, so that the limit applies
+        # to the whole store. Semaphores are bound to an event loop, so there is
+        # one per loop. A loop only runs in one thread, so this doesn't race.
+        loop = asyncio.get_running_loop()
+        cq = self._async_queries.get(loop)
+        if cq is None:
+            cq = AsyncConcurrentQueries(
+                self._session, max_concurrency=self._max_concurrent_queries
+            )
+            self._async_queries[loop] = cq
+        return cq
+
+    def _normalize(self, embeddings: list[list[float]]) -> list[list[float]]:
+        if not self._normalize_embeddings or not embeddings:
+            return embeddings
+        normalized: list[list[float]] = normalize_rows(
+            np.asarray(embeddings, dtype=np.float32)
+        ).tolist()
+        return normalized
+
+    def _normalize_query(self, embedding: list[float]) -> list[float]:
+        if not self._normalize_embeddings:
+            return embedding
+        return self._normalize([embedding])[0]
+
+    def _mmr_helper(
+        self,
+        k: int,
+        query_embedding: list[float],
+        lambda_mult: float,
+        score_threshold: float,
+    ) -> MmrHelper:
+        return MmrHelper(
+            k=k,
+            query_embedding=query_embedding,
+            lambda_mult=lambda_mult,
+            score_threshold=score_threshold,
+            normalized=self._normalize_embeddings,
+            dtype=np.float16 if self._mmr_float16 else np.float32,
+        )
+
+    def _insert_params(
+        self,
+        node_id: str,
+        text: str,
+        text_embedding: list[float],
+        metadata: dict[str, Any],
+        links: set[Link],
+    ) -> tuple[Any, ...]:
+        link_to_tags = set()  # link to these tags
+        link_from_tags = set()  # link from these tags
+
+        for tag in links:
+            if tag.direction in {"in", "bidir"}:
+                # An incoming link should be linked *from* nodes with the given
+                # tag.
+                link_from_tags.add((tag.kind, tag.tag))
+            if tag.direction in {"out", "bidir"}:
+                link_to_tags.add((tag.kind, tag.tag))
+
+        metadata_s = {
+            k: self._coerce_string(v)
+            for k, v in metadata.items()
+            if _is_metadata_field_indexed(k, self._metadata_indexing_policy)
+        }
+
+        metadata_blob = _serialize_metadata(metadata, self._codec)
+        links_blob = _serialize_links(links, self._codec)
+        return (
+            node_id,
+            text,
+            text_embedding,
+            link_to_tags,
+            link_from_tags,
+            links_blob,
+            metadata_blob,
+            metadata_s,
+        )
+
+    def _edge_params(self, insert_params: tuple[Any, ...]) -> list[tuple[Any, ...]]:
+        """Return the parameters of the edges to a node, from its insert parameters."""
+        if self._edge_table is None:
+            return []
+        (
+            node_id,
+            _text,
+            text_embedding,
+            link_to_tags,
+            link_from_tags,
+            _links_blob,
+            _metadata_blob,
+            metadata_s,
+        ) = insert_params
+        return [
+            (kind, tag, node_id, text_embedding, link_to_tags, metadata_s)
+            for kind, tag in link_from_tags
+        ]
+
+    def _write_params(
+        self, batch: _NodeBatch, text_embeddings: list[list[float]]
+    ) -> Iterator[tuple[PreparedStatement, tuple[Any, ...]]]:
+        """Yield the queries writing the nodes (and their edges) of a batch."""
+        node_ids, texts, metadatas, nodes_links = batch
+        tuples = zip(node_ids, texts, text_embeddings, metadatas, nodes_links)
+        for node_id, text, text_embedding, metadata, links in tuples:
+            params = self._insert_params(node_id, text, text_embedding, metadata, links)
+            yield self._insert_passage, params
+            for edge_params in self._edge_params(params):
+                yield self._insert_edge, edge_params
 
-    # TODO: Async (aadd_nodes)
     def add_nodes(
         self,
         nodes: Iterable[Node],
+        *,
+        batch_size: int = 1000,
+        on_batch: Callable[[BatchProgress], None] | None = None,
+        fail_fast: bool = True,
+        return_ids: bool = True,
     ) -> Iterable[str]:
-        """Add nodes to the graph store."""
-        node_ids: list[str] = []
-        texts: list[str] = []
-        metadatas: list[dict[str, Any]] = []
-        nodes_links: list[set[Link]] = []
-        for node in nodes:
-            if not node.id:
-                node_ids.append(secrets.token_hex(8))
-            else:
-                node_ids.append(node.id)
-            texts.append(node.text)
-            metadatas.append(node.metadata)
-            nodes_links.append(node.links)
+        """Add nodes to the graph store.
 
-        text_embeddings = self._embedding.embed_texts(texts)
+        The nodes are consumed in batches, so memory doesn't grow with their
+        number, apart from the returned IDs (see `return_ids`). Each batch is
+        embedded (in a background thread) while the previous one is written.
 
-        with self._concurrent_queries() as cq:
-            tuples = zip(node_ids, texts, text_embeddings, metadatas, nodes_links)
-            for node_id, text, text_embedding, metadata, links in tuples:
-                link_to_tags = set()  # link to these tags
-                link_from_tags = set()  # link from these tags
-
-                for tag in links:
-                    if tag.direction in {"in", "bidir"}:
-                        # An incoming link should be linked *from* nodes with the given
-                        # tag.
-                        link_from_tags.add((tag.kind, tag.tag))
-                    if tag.direction in {"out", "bidir"}:
-                        link_to_tags.add((tag.kind, tag.tag))
-
-                metadata_s = {
-                    k: self._coerce_string(v)
-                    for k, v in metadata.items()
-                    if _is_metadata_field_indexed(k, self._metadata_indexing_policy)
-                }
-
-                metadata_blob = _serialize_metadata(metadata)
-                links_blob = _serialize_links(links)
-                cq.execute(
-                    self._insert_passage,
-                    parameters=(
-                        node_id,
-                        text,
-                        text_embedding,
-                        link_to_tags,
-                        link_from_tags,
-                        links_blob,
-                        metadata_blob,
-                        metadata_s,
-                    ),
-                    timeout=self._insert_timeout,
+        Args:
+            nodes: The nodes to add. They are only iterated once, so this can be a
+                generator.
+            batch_size: Number of nodes embedded and written at once. Defaults to
+                1000.
+            on_batch: Optional callback, called with the progress after each
+                batch.
+            fail_fast: Whether to stop at the first failed batch, raising its
+                error. Otherwise, the failures are reported to `on_batch` and
+                the next batches are still added. Defaults to True.
+            return_ids: Whether to return the IDs of the added nodes. They are
+                kept in memory until all the nodes are added, so disable this
+                when adding a large number of nodes, and get the IDs of each
+                batch from `on_batch` instead. Defaults to True.
+
+        Returns:
+            The IDs of the added nodes, or an empty list if `return_ids` is False.
+        """
+        self._ensure_setup()
+        added = _AddedNodes(ids=[] if return_ids else None)
+
+        def embed(texts: list[str]) -> list[list[float]]:
+            return self._normalize(self._embedding.embed_texts(texts))
+
+        def add_batch(
+            index: int, batch: _NodeBatch, embedding: Future[list[list[float]]]
+        ) -> None:
+            progress = BatchProgress(batch=index, node_ids=batch[0], nodes_added=0)
+            try:
+                with self._concurrent_queries() as cq:
+                    for query, params in self._write_params(batch, embedding.result()):
+                        cq.execute(query, params, timeout=self._insert_timeout)
+            except Exception as error:  # noqa: BLE001
+                # Raised by `_batch_added` if failing fast.
+                progress.error = error
+            self._invalidate_adjacency_cache(batch[3])
+            _batch_added(progress, added, on_batch, fail_fast)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending: tuple[_NodeBatch, Future[list[list[float]]]] | None = None
+            index = -1
+            try:
+                for nodes_batch in _batched(nodes, batch_size):
+                    index += 1
+                    batch = self._unpack_nodes(nodes_batch)
+                    future = executor.submit(embed, batch[1])
+                    previous, pending = pending, (batch, future)
+                    if previous is not None:
+                        add_batch(index - 1, *previous)
+                if pending is not None:
+                    previous, pending = pending, None
+                    add_batch(index, *previous)
+            finally:
+                if pending is not None:
+                    pending[1].cancel()
+
+        return added.result()
+
+    async def aadd_nodes(
+        self,
+        nodes: Iterable[Node] | AsyncIterable[Node],
+        *,
+        batch_size: int = 1000,
+        on_batch: Callable[[BatchProgress], None] | None = None,
+        fail_fast: bool = True,
+        return_ids: bool = True,
+    ) -> Iterable[str]:
+        """Add nodes to the graph store asynchronously.
+
+        Async version of `add_nodes`, also accepting an async iterable of nodes.
+        Each batch is embedded while the previous one is written.
+
+        Args:
+            nodes: The nodes to add. They are only iterated once, so this can be a
+                generator.
+            batch_size: Number of nodes embedded and written at once. Defaults to
+                1000.
+            on_batch: Optional callback, called with the progress after each
+                batch.
+            fail_fast: Whether to stop at the first failed batch, raising its
+                error. Otherwise, the failures are reported to `on_batch` and
+                the next batches are still added. Defaults to True.
+            return_ids: Whether to return the IDs of the added nodes. They are
+                kept in memory until all the nodes are added, so disable this
+                when adding a large number of nodes, and get the IDs of each
+                batch from `on_batch` instead. Defaults to True.
+
+        Returns:
+            The IDs of the added nodes, or an empty list if `return_ids` is False.
+        """
+        await self._aensure_setup()
+        added = _AddedNodes(ids=[] if return_ids else None)
+        cq = self._async_concurrent_queries()
+
+        async def embed(texts: list[str]) -> list[list[float]]:
+            return self._normalize(await self._embedding.aembed_texts(texts))
+
+        async def add_batch(
+            index: int, batch: _NodeBatch, embedding: asyncio.Task[list[list[float]]]
+        ) -> None:
+            progress = BatchProgress(batch=index, node_ids=batch[0], nodes_added=0)
+            try:
+                text_embeddings = await embedding
+                await gather_fail_fast(
+                    *(
+                        cq.execute(query, params, timeout=self._insert_timeout)
+                        for query, params in self._write_params(batch, text_embeddings)
+                    )
+                )
+            except Exception as error:  # noqa: BLE001
+                # Raised by `_batch_added` if failing fast.
+                progress.error = error
+            self._invalidate_adjacency_cache(batch[3])
+            _batch_added(progress, added, on_batch, fail_fast)
+
+        pending: tuple[_NodeBatch, asyncio.Task[list[list[float]]]] | None = None
+        index = -1
+        try:
+            async for nodes_batch in _abatched(nodes, batch_size):
+                index += 1
+                batch = self._unpack_nodes(nodes_batch)
+                task = asyncio.create_task(embed(batch[1]))
+                previous, pending = pending, (batch, task)
+                if previous is not None:
+                    await add_batch(index - 1, *previous)
+            if pending is not None:
+                previous, pending = pending, None
+                await add_batch(index, *previous)
+        finally:
+            if pending is not None:
+                pending[1].cancel()
+
+        return added.result()
+
+    def backfill_edge_table(self) -> int:
+        """Write the edges of the nodes already in the node table to the edge table.
+
+        This is needed when enabling the edge table on an existing store, as only
+        the nodes added with it enabled have their edges written. The node table
+        is scanned in parallel, and the edges of each page of nodes are written
+        concurrently. The edges are upserted, so this can be run again after a
+        failure.
+
+        Returns:
+            The number of edges written.
+        """
+        self._ensure_setup()
+        if self._edge_table is None:
+            raise ValueError("The graph store doesn't have an edge table")
+
+        lock = threading.Lock()
+        count = 0
+
+        def write_edges(rows: Sequence[Any]) -> None:
+            nonlocal count
+            written = 0
+            with self._concurrent_queries() as cq:
+                for row in rows:
+                    for kind, tag in row.link_from_tags or []:
+                        cq.execute(
+                            self._insert_edge,
+                            parameters=(
+                                kind,
+                                tag,
+                                row.content_id,
+                                row.text_embedding,
+                                row.link_to_tags,
+                                row.metadata_s,
+                            ),
+                            timeout=self._insert_timeout,
+                        )
+                        written += 1
+            with lock:
+                count += written
+
+        # Reading the incoming tags, rather than the links blob, avoids decoding it.
+        self.scan(
+            write_edges,
+            columns=[
+                "content_id",
+                "text_embedding",
+                "link_to_tags",
+                "link_from_tags",
+                "metadata_s",
+            ],
+        )
+
+        self._invalidate_adjacency_cache(None)
+        return count
+
+    def scan(
+        self,
+        callback: Callable[[Sequence[Any]], None],
+        *,
+        columns: Sequence[str] | None = None,
+        splits: int = 16,
+        max_concurrent_splits: int = 4,
+        fetch_size: int = 1000,
+    ) -> int:
+        """Scan all the nodes of the node table, passing each page of rows to the callback.
+
+        The token ring is split into ranges (see `token_ranges`), each scanned by
+        `scan_token_range`, concurrently. The callback is called from the
+        scanning threads, so it must be thread-safe.
+
+        Args:
+            callback: Function called with each page of rows. Each row has the
+                scanned columns, and the `token` of the node.
+            columns: The columns to scan, among `NODE_COLUMNS`. Defaults to the
+                columns of the nodes, without the embedding.
+            splits: Number of token ranges the ring is split into. Defaults to 16.
+            max_concurrent_splits: Maximum number of token ranges scanned at once.
+                Defaults to 4.
+            fetch_size: Number of rows per page. Defaults to 1000.
+
+        Returns:
+            The number of rows scanned.
+        """  # noqa: E501
+        self._ensure_setup()
+        # Fail before starting the scan.
+        self._scan_columns(columns)
+
+        def scan_range(token_range: tuple[int, int]) -> int:
+            count = 0
+            for page in self.scan_token_range(
+                *token_range, columns=columns, fetch_size=fetch_size
+            ):
+                callback(page.rows)
+                count += len(page.rows)
+            return count
+
+        return sum(
+            map_fail_fast(
+                scan_range, token_ranges(splits), max_workers=max_concurrent_splits
+            )
+        )
+
+    def scan_token_range(
+        self,
+        start: int,
+        end: int,
+        *,
+        columns: Sequence[str] | None = None,
+        to_nodes: bool = False,
+        fetch_size: int = 1000,
+    ) -> Iterator[ScanPage]:
+        """Scan the nodes whose token is in `(start, end]`, a page at a time.
+
+        The nodes are scanned in token order, so an interrupted scan is resumed by
+        scanning from the `token` of the last page (or row) processed. The ranges
+        of `token_ranges` cover the token ring.
+
+        Args:
+            start: The token after which the scan starts.
+            end: The token of the end of the range (included).
+            columns: The columns to scan, among `NODE_COLUMNS`. Defaults to the
+                columns of the nodes, without the embedding.
+            to_nodes: Whether to convert the rows to nodes. Requires the default
+                columns. Defaults to False.
+            fetch_size: Number of rows per page. Defaults to 1000.
+
+        Returns:
+            The pages of the scan.
+        """
+        if to_nodes and columns is not None:
+            raise ValueError("Nodes can only be scanned with the default columns")
+        self._ensure_setup()
+        statement = self._bind(
+            self._prepare_scan(self._scan_columns(columns)), (start, end), fetch_size
+        )
+        for rows, _ in self._execute_pages(statement):
+            if not rows:
+                continue
+            nodes = [_row_to_node(row, self._codec) for row in rows] if to_nodes else []
+            yield ScanPage(rows=rows, nodes=nodes, token=rows[-1].token)
+
+    def scan_rows(
+        self,
+        columns: Sequence[str] | None = None,
+        *,
+        splits: int = 16,
+        max_concurrent_splits: int = 4,
+        fetch_size: int = 1000,
+    ) -> Generator[Any, None, None]:
+        """Scan all the nodes of the node table, yielding their rows.
+
+        Iterator version of `scan`. The scan runs in the background, a bounded
+        number of pages ahead of the iteration, so memory doesn't grow with the
+        number of nodes. Closing the iterator stops the scan.
+
+        Args:
+            columns: The columns to scan, among `NODE_COLUMNS`. Defaults to the
+                columns of the nodes, without the embedding.
+            splits: Number of token ranges the ring is split into. Defaults to 16.
+            max_concurrent_splits: Maximum number of token ranges scanned at once.
+                Defaults to 4.
+            fetch_size: Number of rows per page. Defaults to 1000.
+
+        Returns:
+            The rows, each with the scanned columns and the `token` of the node.
+        """
+        # Pages of rows, ending with `None` or the error of the scan.
+        pages: queue.Queue[Sequence[Any] | BaseException | None] = queue.Queue(
+            maxsize=max_concurrent_splits
+        )
+        stopped = threading.Event()
+
+        def put(item: Sequence[Any] | BaseException | None) -> bool:
+            # Returns False (without waiting further) once the iteration stopped.
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                except queue.Full:
+                    continue
+                return True
+            return False
+
+        def on_page(rows: Sequence[Any]) -> None:
+            if not put(rows):
+                raise _ScanStoppedError
+
+        def run_scan() -> None:
+            try:
+                self.scan(
+                    on_page,
+                    columns=columns,
+                    splits=splits,
+                    max_concurrent_splits=max_concurrent_splits,
+                    fetch_size=fetch_size,
                 )
+            except _ScanStoppedError:
+                return
+            except Exception as error:  # noqa: BLE001
+                put(error)
+            else:
+                put(None)
+
+        threading.Thread(target=run_scan, name="graph-store-scan", daemon=True).start()
+        try:
+            while (page := pages.get()) is not None:
+                if isinstance(page, BaseException):
+                    raise page
+                yield from page
+        finally:
+            stopped.set()
+
+    def scan_nodes(
+        self,
+        *,
+        splits: int = 16,
+        max_concurrent_splits: int = 4,
+        fetch_size: int = 1000,
+    ) -> Iterator[Node]:
+        """Scan all the nodes of the node table.
+
+        The nodes are scanned by `scan_rows`, without their embeddings.
+
+        Args:
+            splits: Number of token ranges the ring is split into. Defaults to 16.
+            max_concurrent_splits: Maximum number of token ranges scanned at once.
+                Defaults to 4.
+            fetch_size: Number of rows per page. Defaults to 1000.
 
-        return node_ids
+        Returns:
+            The nodes.
+        """
+        for row in self.scan_rows(
+            splits=splits,
+            max_concurrent_splits=max_concurrent_splits,
+            fetch_size=fetch_size,
+        ):
+            yield _row_to_node(row, self._codec)
+
+    def _id_batches(self, ids: Iterable[str]) -> list[list[str]]:
+        """Split the (unique) IDs into batches for `IN` queries.
+
+        The IDs are grouped by their first replica, when the token map is known,
+        so that the partitions of a batch are on the same nodes.
+        """
+        metadata = self._session.cluster.metadata
+        groups: dict[Any, list[str]] = {}
+        for node_id in dict.fromkeys(ids):
+            replicas = metadata.get_replicas(self._keyspace, node_id.encode())
+            groups.setdefault(replicas[0] if replicas else None, []).append(node_id)
+
+        size = self._read_batch_size
+        return [
+            group[start : start + size]
+            for group in groups.values()
+            for start in range(0, len(group), size)
+        ]
 
     def _nodes_with_ids(
         self,
         ids: Iterable[str],
     ) -> list[Node]:
-        results: dict[str, Node | None] = {}
+        ids = list(ids)
+        results: dict[str, Node] = {}
         with self._concurrent_queries() as cq:
 
             def node_callback(rows: Iterable[Any]) -> None:
-                # Should always be exactly one row here. We don't need to check
-                #   1. The query is for a `ID == ?` query on the primary key.
-                #   2. If it doesn't exist, the `get_result` method below will
-                #      raise an exception indicating the ID doesn't exist.
+                # There is a row for each existing ID of the batch. We don't need
+                # to check that all were found: the `get_result` method below will
+                # raise an exception indicating the ID doesn't exist.
                 for row in rows:
-                    results[row.content_id] = _row_to_node(row)
+                    results[row.content_id] = _row_to_node(row, self._codec)
 
-            for node_id in ids:
-                if node_id not in results:
-                    # Mark this node ID as being fetched.
-                    results[node_id] = None
-                    cq.execute(
-                        self._query_by_id, parameters=(node_id,), callback=node_callback
-                    )
+            for batch in self._id_batches(ids):
+                cq.execute(
+                    self._query_by_ids, parameters=(batch,), callback=node_callback
+                )
+
+        def get_result(node_id: str) -> Node:
+            if (result := results.get(node_id)) is None:
+                raise ValueError(f"No node with ID '{node_id}'")
+            return result
+
+        return [get_result(node_id) for node_id in ids]
+
+    async def _anodes_with_ids(
+        self,
+        ids: Iterable[str],
+    ) -> list[Node]:
+        ids = list(ids)
+        cq = self._async_concurrent_queries()
+        results = await gather_fail_fast(
+            *(
+                cq.execute(self._query_by_ids, parameters=(batch,))
+                for batch in self._id_batches(ids)
+            )
+        )
+        nodes = {
+            row.content_id: _row_to_node(row, self._codec)
+            for rows in results
+            for row in rows
+        }
 
         def get_result(node_id: str) -> Node:
-            if (result := results[node_id]) is None:
+            if (result := nodes.get(node_id)) is None:
                 raise ValueError(f"No node with ID '{node_id}'")
             return result
 
@@ -364,9 +1135,11 @@ class GraphStore:
         depth: int = 2,
         fetch_k: int = 100,
         adjacent_k: int = 10,
+        adjacent_limit: int | None = None,
         lambda_mult: float = 0.5,
         score_threshold: float = float("-inf"),
         metadata_filter: dict[str, Any] = {},  # noqa: B006
+        min_adjacent_similarity: float | None = None,
     ) -> Iterable[Node]:
         """Retrieve documents from this graph store using MMR-traversal.
 
@@ -390,6 +1163,10 @@ class GraphStore:
                 Defaults to 100.
             adjacent_k: Number of adjacent Documents to fetch.
                 Defaults to 10.
+            adjacent_limit: Maximum number of adjacent Documents to fetch from
+                all the tags linked to by a node, in addition to the `adjacent_k`
+                per tag. The Documents most similar to the query are kept. If
+                `None` (the default), there is no combined limit.
             depth: Maximum depth of a node (number of edges) from a node
                 retrieved via similarity. Defaults to 2.
             lambda_mult: Number between 0 and 1 that determines the degree
@@ -398,9 +1175,17 @@ class GraphStore:
             score_threshold: Only documents with a score greater than or equal
                 this threshold will be chosen. Defaults to -infinity.
             metadata_filter: Optional metadata to filter the results.
+            min_adjacent_similarity: Lower bound of the similarity between a node
+                and the nodes it links to, if the graph guarantees one (e.g. links
+                are only created between similar content). If set, the adjacent
+                nodes of a selected node are only fetched once their score could
+                be as high as the best candidate's (their redundancy being at least
+                this similarity), skipping the queries of the nodes whose adjacent
+                nodes can't be selected. Defaults to `None` (no pruning).
         """
-        query_embedding = self._embedding.embed_query(query)
-        helper = MmrHelper(
+        self._ensure_setup()
+        query_embedding = self._normalize_query(self._embedding.embed_query(query))
+        helper = self._mmr_helper(
             k=k,
             query_embedding=query_embedding,
             lambda_mult=lambda_mult,
@@ -412,15 +1197,16 @@ class GraphStore:
 
         # Fetch the initial candidates and add them to the helper and
         # outgoing_tags.
-        columns = "content_id, text_embedding, link_to_tags"
         adjacent_query = self._get_search_cql(
             has_limit=True,
-            columns=columns,
+            columns=ADJACENT_COLUMNS,
             metadata_keys=list(metadata_filter.keys()),
             has_embedding=True,
             has_link_from_tags=True,
         )
 
+        # Tags whose adjacent nodes have already been incorporated into the
+        # candidates. Adjacent queries are only issued for new tags.
         visited_tags: set[tuple[str, str]] = set()
 
         def fetch_neighborhood(neighborhood: Sequence[str]) -> None:
@@ -428,23 +1214,25 @@ class GraphStore:
             # to the candidate set in the future.
             outgoing_tags.update({content_id: set() for content_id in neighborhood})
 
-            # Initialize the visited_tags with the set of outgoing from the
-            # neighborhood. This prevents re-visiting them.
-            visited_tags = self._get_outgoing_tags(neighborhood)
+            # Mark the tags outgoing from the neighborhood as visited. This
+            # prevents re-visiting them.
+            neighborhood_tags = self._get_outgoing_tags(neighborhood)
+            visited_tags.update(neighborhood_tags)
 
             # Call `self._get_adjacent` to fetch the candidates.
             adjacents = self._get_adjacent(
-                visited_tags,
+                neighborhood_tags,
                 adjacent_query=adjacent_query,
                 query_embedding=query_embedding,
                 k_per_tag=adjacent_k,
+                limit=adjacent_limit,
                 metadata_filter=metadata_filter,
             )
 
             new_candidates = {}
             for adjacent in adjacents:
                 if adjacent.target_content_id not in outgoing_tags:
-                    outgoing_tags[adjacent.target_content_id] = (
+                    outgoing_tags[adjacent.target_content_id] = set(
                         adjacent.target_link_to_tags
                     )
 
@@ -456,7 +1244,7 @@ class GraphStore:
         def fetch_initial_candidates() -> None:
             initial_candidates_query = self._get_search_cql(
                 has_limit=True,
-                columns=columns,
+                columns=ADJACENT_COLUMNS,
                 metadata_keys=list(metadata_filter.keys()),
                 has_embedding=True,
             )
@@ -485,103 +1273,337 @@ class GraphStore:
         # Tracks the depth of each candidate.
         depths = {candidate_id: 0 for candidate_id in helper.candidate_ids()}
 
-        # Select the best item, K times.
-        for _ in range(k):
-            selected_id = helper.pop_best()
+        def fetch_adjacent(selected_id: str) -> None:
+            next_depth = depths[selected_id] + 1
 
-            if selected_id is None:
-                break
+            # Find the tags linked to from the selected ID.
+            link_to_tags = outgoing_tags.pop(selected_id)
+
+            # Don't re-visit already visited tags.
+            link_to_tags.difference_update(visited_tags)
+
+            # Find the nodes with incoming links from those tags.
+            adjacents = self._get_adjacent(
+                link_to_tags,
+                adjacent_query=adjacent_query,
+                query_embedding=query_embedding,
+                k_per_tag=adjacent_k,
+                limit=adjacent_limit,
+                metadata_filter=metadata_filter,
+            )
+
+            # Record the link_to_tags as visited.
+            visited_tags.update(link_to_tags)
+
+            new_candidates = {}
+            for adjacent in adjacents:
+                if adjacent.target_content_id not in outgoing_tags:
+                    outgoing_tags[adjacent.target_content_id] = set(
+                        adjacent.target_link_to_tags
+                    )
+                    new_candidates[adjacent.target_content_id] = (
+                        adjacent.target_text_embedding
+                    )
+                    if next_depth < depths.get(adjacent.target_content_id, depth + 1):
+                        # If this is a new shortest depth, or there was no
+                        # previous depth, update the depths. This ensures that
+                        # when we discover a node we will have the shortest
+                        # depth available.
+                        #
+                        # NOTE: No effort is made to traverse from nodes that
+                        # were previously selected if they become reachable via
+                        # a shorter path via nodes selected later. This is
+                        # currently "intended", but may be worth experimenting
+                        # with.
+                        depths[adjacent.target_content_id] = next_depth
+            helper.add_candidates(new_candidates)
+
+        if min_adjacent_similarity is None:
+            # Select the best item, K times.
+            for _ in range(k):
+                selected_id = helper.pop_best()
+
+                if selected_id is None:
+                    break
 
-            next_depth = depths[selected_id] + 1
-            if next_depth < depth:
                 # If the next nodes would not exceed the depth limit, find the
-                # adjacent nodes.
-                #
-                # TODO: For a big performance win, we should track which tags we've
-                # already incorporated. We don't need to issue adjacent queries for
-                # those.
-
-                # Find the tags linked to from the selected ID.
-                link_to_tags = outgoing_tags.pop(selected_id)
-
-                # Don't re-visit already visited tags.
-                link_to_tags.difference_update(visited_tags)
-
-                # Find the nodes with incoming links from those tags.
-                adjacents = self._get_adjacent(
-                    link_to_tags,
-                    adjacent_query=adjacent_query,
-                    query_embedding=query_embedding,
-                    k_per_tag=adjacent_k,
-                    metadata_filter=metadata_filter,
-                )
+                # adjacent nodes. The adjacent nodes of the last selected node
+                # can't be selected.
+                if depths[selected_id] + 1 < depth and len(helper.selected_ids) < k:
+                    fetch_adjacent(selected_id)
+
+            return self._nodes_with_ids(helper.selected_ids)
+
+        # Selected nodes whose adjacent nodes haven't been fetched yet, by
+        # decreasing upper bound of the score of their adjacent nodes.
+        pending: list[tuple[float, int, str]] = []
+        while len(helper.selected_ids) < k:
+            # Only fetch the adjacent nodes which could score at least as high
+            # as the best candidate.
+            while pending and -pending[0][0] >= helper.best_score:
+                fetch_adjacent(heapq.heappop(pending)[2])
 
-                # Record the link_to_tags as visited.
-                visited_tags.update(link_to_tags)
+            selected_id = helper.pop_best()
+            if selected_id is None:
+                break
 
-                new_candidates = {}
-                for adjacent in adjacents:
-                    if adjacent.target_content_id not in outgoing_tags:
-                        outgoing_tags[adjacent.target_content_id] = (
-                            adjacent.target_link_to_tags
-                        )
-                        new_candidates[adjacent.target_content_id] = (
-                            adjacent.target_text_embedding
-                        )
-                        if next_depth < depths.get(
-                            adjacent.target_content_id, depth + 1
-                        ):
-                            # If this is a new shortest depth, or there was no
-                            # previous depth, update the depths. This ensures that
-                            # when we discover a node we will have the shortest
-                            # depth available.
-                            #
-                            # NOTE: No effort is made to traverse from nodes that
-                            # were previously selected if they become reachable via
-                            # a shorter path via nodes selected later. This is
-                            # currently "intended", but may be worth experimenting
-                            # with.
-                            depths[adjacent.target_content_id] = next_depth
-                helper.add_candidates(new_candidates)
+            if depths[selected_id] + 1 < depth:
+                bound = helper.adjacent_score_bound(
+                    helper.selected_similarities[-1], min_adjacent_similarity
+                )
+                heapq.heappush(pending, (-bound, len(helper.selected_ids), selected_id))
 
         return self._nodes_with_ids(helper.selected_ids)
 
-    def traversal_search(
+    async def ammr_traversal_search(
         self,
         query: str,
         *,
+        initial_roots: Sequence[str] = (),
         k: int = 4,
-        depth: int = 1,
+        depth: int = 2,
+        fetch_k: int = 100,
+        adjacent_k: int = 10,
+        adjacent_limit: int | None = None,
+        lambda_mult: float = 0.5,
+        score_threshold: float = float("-inf"),
         metadata_filter: dict[str, Any] = {},  # noqa: B006
+        min_adjacent_similarity: float | None = None,
     ) -> Iterable[Node]:
-        """Retrieve documents from this knowledge store.
+        """Retrieve documents from this graph store using MMR-traversal.
 
-        First, `k` nodes are retrieved using a vector search for the `query` string.
-        Then, additional nodes are discovered up to the given `depth` from those
-        starting nodes.
+        Async version of `mmr_traversal_search`. The adjacent nodes of each
+        selected node are fetched concurrently, without blocking a thread.
 
         Args:
-            query: The query string.
-            k: The number of Documents to return from the initial vector search.
-                Defaults to 4.
-            depth: The maximum depth of edges to traverse. Defaults to 1.
+            query: The query string to search for.
+            initial_roots: Optional list of document IDs to use for initializing search.
+                The top `adjacent_k` nodes adjacent to each initial root will be
+                included in the set of initial candidates. To fetch only in the
+                neighborhood of these nodes, set `ftech_k = 0`.
+            k: Number of Documents to return. Defaults to 4.
+            fetch_k: Number of initial Documents to fetch via similarity.
+                Will be added to the nodes adjacent to `initial_roots`.
+                Defaults to 100.
+            adjacent_k: Number of adjacent Documents to fetch.
+                Defaults to 10.
+            adjacent_limit: Maximum number of adjacent Documents to fetch from
+                all the tags linked to by a node, in addition to the `adjacent_k`
+                per tag. The Documents most similar to the query are kept. If
+                `None` (the default), there is no combined limit.
+            depth: Maximum depth of a node (number of edges) from a node
+                retrieved via similarity. Defaults to 2.
+            lambda_mult: Number between 0 and 1 that determines the degree
+                of diversity among the results with 0 corresponding to maximum
+                diversity and 1 to minimum diversity. Defaults to 0.5.
+            score_threshold: Only documents with a score greater than or equal
+                this threshold will be chosen. Defaults to -infinity.
             metadata_filter: Optional metadata to filter the results.
-
-        Returns:
-            Collection of retrieved documents.
+            min_adjacent_similarity: Lower bound of the similarity between a node
+                and the nodes it links to, if the graph guarantees one (e.g. links
+                are only created between similar content). If set, the adjacent
+                nodes of a selected node are only fetched once their score could
+                be as high as the best candidate's (their redundancy being at least
+                this similarity), skipping the queries of the nodes whose adjacent
+                nodes can't be selected. Defaults to `None` (no pruning).
         """
-        # Depth 0:
-        #   Query for `k` nodes similar to the question.
-        #   Retrieve `content_id` and `link_to_tags`.
-        #
-        # Depth 1:
-        #   Query for nodes that have an incoming tag in the `link_to_tags` set.
-        #   Combine node IDs.
-        #   Query for `link_to_tags` of those "new" node IDs.
-        #
-        # ...
-
-        traversal_query = self._get_search_cql(
+        await self._aensure_setup()
+        query_embedding = self._normalize_query(
+            await self._embedding.aembed_query(query)
+        )
+        helper = self._mmr_helper(
+            k=k,
+            query_embedding=query_embedding,
+            lambda_mult=lambda_mult,
+            score_threshold=score_threshold,
+        )
+
+        # For each unselected node, stores the outgoing tags.
+        outgoing_tags: dict[str, set[tuple[str, str]]] = {}
+
+        adjacent_query = self._get_search_cql(
+            has_limit=True,
+            columns=ADJACENT_COLUMNS,
+            metadata_keys=list(metadata_filter.keys()),
+            has_embedding=True,
+            has_link_from_tags=True,
+        )
+
+        # Tags whose adjacent nodes have already been incorporated into the
+        # candidates. Adjacent queries are only issued for new tags.
+        visited_tags: set[tuple[str, str]] = set()
+
+        async def fetch_neighborhood(neighborhood: Sequence[str]) -> None:
+            # Put the neighborhood into the outgoing tags, to avoid adding it
+            # to the candidate set in the future.
+            outgoing_tags.update({content_id: set() for content_id in neighborhood})
+
+            # Initialize the visited_tags with the set of outgoing from the
+            # neighborhood. This prevents re-visiting them.
+            neighborhood_tags = await self._aget_outgoing_tags(neighborhood)
+            visited_tags.update(neighborhood_tags)
+
+            adjacents = await self._aget_adjacent(
+                neighborhood_tags,
+                adjacent_query=adjacent_query,
+                query_embedding=query_embedding,
+                k_per_tag=adjacent_k,
+                limit=adjacent_limit,
+                metadata_filter=metadata_filter,
+            )
+
+            new_candidates = {}
+            for adjacent in adjacents:
+                if adjacent.target_content_id not in outgoing_tags:
+                    outgoing_tags[adjacent.target_content_id] = set(
+                        adjacent.target_link_to_tags
+                    )
+
+                    new_candidates[adjacent.target_content_id] = (
+                        adjacent.target_text_embedding
+                    )
+            helper.add_candidates(new_candidates)
+
+        async def fetch_initial_candidates() -> None:
+            initial_candidates_query = self._get_search_cql(
+                has_limit=True,
+                columns=ADJACENT_COLUMNS,
+                metadata_keys=list(metadata_filter.keys()),
+                has_embedding=True,
+            )
+
+            params = self._get_search_params(
+                limit=fetch_k,
+                metadata=metadata_filter,
+                embedding=query_embedding,
+            )
+
+            fetched = await aexecute(
+                self._session, initial_candidates_query, parameters=params
+            )
+            candidates = {}
+            for row in fetched:
+                if row.content_id not in outgoing_tags:
+                    candidates[row.content_id] = row.text_embedding
+                    outgoing_tags[row.content_id] = set(row.link_to_tags or [])
+            helper.add_candidates(candidates)
+
+        if initial_roots:
+            await fetch_neighborhood(initial_roots)
+        if fetch_k > 0:
+            await fetch_initial_candidates()
+
+        # Tracks the depth of each candidate.
+        depths = {candidate_id: 0 for candidate_id in helper.candidate_ids()}
+
+        async def fetch_adjacent(selected_id: str) -> None:
+            next_depth = depths[selected_id] + 1
+
+            # Find the tags linked to from the selected ID, without
+            # re-visiting already visited tags.
+            link_to_tags = outgoing_tags.pop(selected_id)
+            link_to_tags.difference_update(visited_tags)
+
+            # Find the nodes with incoming links from those tags.
+            adjacents = await self._aget_adjacent(
+                link_to_tags,
+                adjacent_query=adjacent_query,
+                query_embedding=query_embedding,
+                k_per_tag=adjacent_k,
+                limit=adjacent_limit,
+                metadata_filter=metadata_filter,
+            )
+
+            # Record the link_to_tags as visited.
+            visited_tags.update(link_to_tags)
+
+            new_candidates = {}
+            for adjacent in adjacents:
+                if adjacent.target_content_id not in outgoing_tags:
+                    outgoing_tags[adjacent.target_content_id] = set(
+                        adjacent.target_link_to_tags
+                    )
+                    new_candidates[adjacent.target_content_id] = (
+                        adjacent.target_text_embedding
+                    )
+                    if next_depth < depths.get(adjacent.target_content_id, depth + 1):
+                        depths[adjacent.target_content_id] = next_depth
+            helper.add_candidates(new_candidates)
+
+        if min_adjacent_similarity is None:
+            # Select the best item, K times.
+            for _ in range(k):
+                selected_id = helper.pop_best()
+
+                if selected_id is None:
+                    break
+
+                # The adjacent nodes of the last selected node can't be selected.
+                if depths[selected_id] + 1 < depth and len(helper.selected_ids) < k:
+                    await fetch_adjacent(selected_id)
+
+            return await self._anodes_with_ids(helper.selected_ids)
+
+        # Selected nodes whose adjacent nodes haven't been fetched yet, by
+        # decreasing upper bound of the score of their adjacent nodes.
+        pending: list[tuple[float, int, str]] = []
+        while len(helper.selected_ids) < k:
+            # Only fetch the adjacent nodes which could score at least as high
+            # as the best candidate.
+            while pending and -pending[0][0] >= helper.best_score:
+                await fetch_adjacent(heapq.heappop(pending)[2])
+
+            selected_id = helper.pop_best()
+            if selected_id is None:
+                break
+
+            if depths[selected_id] + 1 < depth:
+                bound = helper.adjacent_score_bound(
+                    helper.selected_similarities[-1], min_adjacent_similarity
+                )
+                heapq.heappush(pending, (-bound, len(helper.selected_ids), selected_id))
+
+        return await self._anodes_with_ids(helper.selected_ids)
+
+    def traversal_search(
+        self,
+        query: str,
+        *,
+        k: int = 4,
+        depth: int = 1,
+        metadata_filter: dict[str, Any] = {},  # noqa: B006
+        max_nodes: int | None = None,
+        time_budget: float | None = None,
+    ) -> Iterable[Node]:
+        """Retrieve documents from this knowledge store.
+
+        First, `k` nodes are retrieved using a vector search for the `query` string.
+        Then, additional nodes are discovered up to the given `depth` from those
+        starting nodes.
+
+        The graph is traversed one depth at a time: the targets of all the new
+        tags of a depth are queried at once, then all the new nodes.
+
+        Args:
+            query: The query string.
+            k: The number of Documents to return from the initial vector search.
+                Defaults to 4.
+            depth: The maximum depth of edges to traverse. Defaults to 1.
+            metadata_filter: Optional metadata to filter the results.
+            max_nodes: Optional maximum number of nodes to retrieve. The traversal
+                stops once reached.
+            time_budget: Optional time (in seconds) after which the traversal
+                stops, returning the nodes visited so far.
+
+        Returns:
+            Collection of retrieved documents.
+        """
+        self._ensure_setup()
+        state = _TraversalState(
+            depth=depth, max_nodes=max_nodes, time_budget=time_budget
+        )
+
+        traversal_query = self._get_search_cql(
             columns="content_id, link_to_tags",
             has_limit=True,
             metadata_keys=list(metadata_filter.keys()),
@@ -594,119 +1616,428 @@ class GraphStore:
             metadata_keys=list(metadata_filter.keys()),
         )
 
+        query_embedding = self._normalize_query(self._embedding.embed_query(query))
+        params = self._get_search_params(
+            limit=k,
+            metadata=metadata_filter,
+            embedding=query_embedding,
+        )
+        nodes = self._execute_round([(traversal_query, params)])
+
+        d = 0
+        while nodes:
+            outgoing_tags = state.visit(d, nodes)
+            if not outgoing_tags or state.exhausted():
+                break
+
+            if self._edge_table is not None:
+                # The edges have the `content_id` and `link_to_tags` of their
+                # targets, so these are visited without querying the nodes.
+                edges = self._execute_round(
+                    (self._query_edges_by_tag, tag) for tag in outgoing_tags
+                )
+                nodes = [
+                    edge
+                    for edge in self._filter_edge_rows(edges, metadata_filter)
+                    if state.is_new(edge.content_id)
+                ]
+                d += 1
+                continue
+
+            # Query for the targets of the outgoing tags.
+            targets = self._execute_round(
+                (
+                    visit_nodes_query,
+                    self._get_search_params(
+                        link_from_tags=tag, metadata=metadata_filter
+                    ),
+                )
+                for tag in outgoing_tags
+            )
+            new_ids = state.new_ids(target.target_content_id for target in targets)
+            if state.exhausted():
+                break
+
+            # Fetch the outgoing tags of the new nodes, to visit them next.
+            nodes = self._execute_round(
+                (self._query_ids_and_link_to_tags_by_ids, (batch,))
+                for batch in self._id_batches(new_ids)
+            )
+            d += 1
+
+        return self._nodes_with_ids(state.visited_ids.keys())
+
+    def _execute_round(
+        self, queries: Iterable[tuple[PreparedStatement, tuple[Any, ...]]]
+    ) -> list[Any]:
+        """Execute the queries concurrently, returning the rows of all of them."""
+        lock = threading.Lock()
+        rows: list[Any] = []
+
+        def collect(result: Iterable[Any]) -> None:
+            with lock:
+                rows.extend(result)
+
         with self._concurrent_queries() as cq:
-            # Map from visited ID to depth
-            visited_ids: dict[str, int] = {}
-
-            # Map from visited tag `(kind, tag)` to depth. Allows skipping queries
-            # for tags that we've already traversed.
-            visited_tags: dict[tuple[str, str], int] = {}
-
-            def visit_nodes(d: int, nodes: Sequence[Any]) -> None:
-                nonlocal visited_ids
-                nonlocal visited_tags
-
-                # Visit nodes at the given depth.
-                # Each node has `content_id` and `link_to_tags`.
-
-                # Iterate over nodes, tracking the *new* outgoing kind tags for this
-                # depth. This is tags that are either new, or newly discovered at a
-                # lower depth.
-                outgoing_tags = set()
-                for node in nodes:
-                    content_id = node.content_id
-
-                    # Add visited ID. If it is closer it is a new node at this depth:
-                    if d <= visited_ids.get(content_id, depth):
-                        visited_ids[content_id] = d
-
-                        # If we can continue traversing from this node,
-                        if d < depth and node.link_to_tags:
-                            # Record any new (or newly discovered at a lower depth)
-                            # tags to the set to traverse.
-                            for kind, value in node.link_to_tags:
-                                if d <= visited_tags.get((kind, value), depth):
-                                    # Record that we'll query this tag at the
-                                    # given depth, so we don't fetch it again
-                                    # (unless we find it an earlier depth)
-                                    visited_tags[(kind, value)] = d
-                                    outgoing_tags.add((kind, value))
-
-                if outgoing_tags:
-                    # If there are new tags to visit at the next depth, query for the
-                    # node IDs.
-                    for kind, value in outgoing_tags:
-                        params = self._get_search_params(
-                            link_from_tags=(kind, value), metadata=metadata_filter
-                        )
-                        cq.execute(
-                            query=visit_nodes_query,
-                            parameters=params,
-                            callback=lambda rows, d=d: visit_targets(d, rows),
-                        )
+            for query, params in queries:
+                cq.execute(query, parameters=params, callback=collect)
+        return rows
 
-            def visit_targets(d: int, targets: Sequence[Any]) -> None:
-                nonlocal visited_ids
+    async def atraversal_search(
+        self,
+        query: str,
+        *,
+        k: int = 4,
+        depth: int = 1,
+        metadata_filter: dict[str, Any] = {},  # noqa: B006
+        max_nodes: int | None = None,
+        time_budget: float | None = None,
+    ) -> Iterable[Node]:
+        """Retrieve documents from this knowledge store asynchronously.
 
-                # target_content_id, tag=(kind,value)
-                new_nodes_at_next_depth = set()
-                for target in targets:
-                    content_id = target.target_content_id
-                    if d < visited_ids.get(content_id, depth):
-                        new_nodes_at_next_depth.add(content_id)
+        Async version of `traversal_search`. The graph is traversed one depth at
+        a time, issuing the queries of each depth concurrently.
 
-                if new_nodes_at_next_depth:
-                    for node_id in new_nodes_at_next_depth:
-                        cq.execute(
-                            self._query_ids_and_link_to_tags_by_id,
-                            parameters=(node_id,),
-                            callback=lambda rows, d=d: visit_nodes(d + 1, rows),
-                        )
+        Args:
+            query: The query string.
+            k: The number of Documents to return from the initial vector search.
+                Defaults to 4.
+            depth: The maximum depth of edges to traverse. Defaults to 1.
+            metadata_filter: Optional metadata to filter the results.
+            max_nodes: Optional maximum number of nodes to retrieve. The traversal
+                stops once reached.
+            time_budget: Optional time (in seconds) after which the traversal
+                stops, returning the nodes visited so far.
 
-            query_embedding = self._embedding.embed_query(query)
-            params = self._get_search_params(
-                limit=k,
-                metadata=metadata_filter,
-                embedding=query_embedding,
+        Returns:
+            Collection of retrieved documents.
+        """
+        await self._aensure_setup()
+        state = _TraversalState(
+            depth=depth, max_nodes=max_nodes, time_budget=time_budget
+        )
+
+        traversal_query = self._get_search_cql(
+            columns="content_id, link_to_tags",
+            has_limit=True,
+            metadata_keys=list(metadata_filter.keys()),
+            has_embedding=True,
+        )
+
+        visit_nodes_query = self._get_search_cql(
+            columns="content_id AS target_content_id",
+            has_link_from_tags=True,
+            metadata_keys=list(metadata_filter.keys()),
+        )
+
+        cq = self._async_concurrent_queries()
+
+        query_embedding = self._normalize_query(
+            await self._embedding.aembed_query(query)
+        )
+        params = self._get_search_params(
+            limit=k,
+            metadata=metadata_filter,
+            embedding=query_embedding,
+        )
+        nodes: Sequence[Any] = await cq.execute(traversal_query, parameters=params)
+
+        d = 0
+        while nodes:
+            outgoing_tags = state.visit(d, nodes)
+            if not outgoing_tags or state.exhausted():
+                break
+
+            if self._edge_table is not None:
+                # The edges have the `content_id` and `link_to_tags` of their
+                # targets, so these are visited without querying the nodes.
+                edges = await gather_fail_fast(
+                    *(
+                        cq.execute(self._query_edges_by_tag, parameters=tag)
+                        for tag in outgoing_tags
+                    )
+                )
+                nodes = [
+                    edge
+                    for rows in edges
+                    for edge in self._filter_edge_rows(rows, metadata_filter)
+                    if state.is_new(edge.content_id)
+                ]
+                d += 1
+                continue
+
+            # Query for the targets of the outgoing tags.
+            targets = await gather_fail_fast(
+                *(
+                    cq.execute(
+                        visit_nodes_query,
+                        parameters=self._get_search_params(
+                            link_from_tags=tag, metadata=metadata_filter
+                        ),
+                    )
+                    for tag in outgoing_tags
+                )
             )
+            new_ids = state.new_ids(
+                target.target_content_id for rows in targets for target in rows
+            )
+            if state.exhausted():
+                break
 
-            cq.execute(
-                traversal_query,
-                parameters=params,
-                callback=lambda nodes: visit_nodes(0, nodes),
+            # Fetch the outgoing tags of the new nodes, to visit them next.
+            fetched = await gather_fail_fast(
+                *(
+                    cq.execute(
+                        self._query_ids_and_link_to_tags_by_ids, parameters=(batch,)
+                    )
+                    for batch in self._id_batches(new_ids)
+                )
             )
+            nodes = [row for rows in fetched for row in rows]
+            d += 1
 
-        return self._nodes_with_ids(visited_ids.keys())
+        return await self._anodes_with_ids(state.visited_ids.keys())
 
     def similarity_search(
         self,
         embedding: list[float],
         k: int = 4,
         metadata_filter: dict[str, Any] = {},  # noqa: B006
+        *,
+        fetch_size: int | None = None,
     ) -> Iterable[Node]:
-        """Retrieve nodes similar to the given embedding, optionally filtered by metadata."""  # noqa: E501
+        """Retrieve nodes similar to the given embedding, optionally filtered by metadata.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of nodes to return. Defaults to 4.
+            metadata_filter: Optional metadata to filter the results.
+            fetch_size: Number of rows fetched per page, if not the session
+                default. The pages are fetched as the nodes are iterated.
+        """  # noqa: E501
+        self._ensure_setup()
+        query, params = self._get_search_cql_and_params(
+            embedding=self._normalize_query(embedding),
+            limit=k,
+            metadata=metadata_filter,
+        )
+
+        for page in self._search_pages(query, params, fetch_size=fetch_size):
+            yield from page.nodes
+
+    async def asimilarity_search(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        metadata_filter: dict[str, Any] = {},  # noqa: B006
+        *,
+        fetch_size: int | None = None,
+    ) -> AsyncIterable[Node]:
+        """Retrieve nodes similar to the given embedding, optionally filtered by metadata.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of nodes to return. Defaults to 4.
+            metadata_filter: Optional metadata to filter the results.
+            fetch_size: Number of rows fetched per page, if not the session
+                default. The pages are fetched as the nodes are iterated.
+        """  # noqa: E501
+        await self._aensure_setup()
         query, params = self._get_search_cql_and_params(
-            embedding=embedding, limit=k, metadata=metadata_filter
+            embedding=self._normalize_query(embedding),
+            limit=k,
+            metadata=metadata_filter,
         )
 
-        for row in self._session.execute(query, params):
-            yield _row_to_node(row)
+        async for page in self._asearch_pages(query, params, fetch_size=fetch_size):
+            for node in page.nodes:
+                yield node
 
     def metadata_search(
         self,
         metadata: dict[str, Any] = {},  # noqa: B006
         n: int = 5,
+        *,
+        fetch_size: int | None = None,
     ) -> Iterable[Node]:
-        """Retrieve nodes based on their metadata."""
+        """Retrieve nodes based on their metadata.
+
+        Args:
+            metadata: The metadata the nodes must have.
+            n: The maximum number of nodes to return. Defaults to 5.
+            fetch_size: Number of rows fetched per page, if not the session
+                default. The pages are fetched as the nodes are iterated.
+        """
+        self._ensure_setup()
         query, params = self._get_search_cql_and_params(metadata=metadata, limit=n)
 
-        for row in self._session.execute(query, params):
-            yield _row_to_node(row)
+        for page in self._search_pages(query, params, fetch_size=fetch_size):
+            yield from page.nodes
+
+    async def ametadata_search(
+        self,
+        metadata: dict[str, Any] = {},  # noqa: B006
+        n: int = 5,
+        *,
+        fetch_size: int | None = None,
+    ) -> AsyncIterable[Node]:
+        """Retrieve nodes based on their metadata.
+
+        Args:
+            metadata: The metadata the nodes must have.
+            n: The maximum number of nodes to return. Defaults to 5.
+            fetch_size: Number of rows fetched per page, if not the session
+                default. The pages are fetched as the nodes are iterated.
+        """
+        await self._aensure_setup()
+        query, params = self._get_search_cql_and_params(metadata=metadata, limit=n)
+
+        async for page in self._asearch_pages(query, params, fetch_size=fetch_size):
+            for node in page.nodes:
+                yield node
+
+    def metadata_search_pages(
+        self,
+        metadata: dict[str, Any] = {},  # noqa: B006
+        n: int | None = None,
+        *,
+        fetch_size: int = 1000,
+        paging_state: bytes | None = None,
+    ) -> Iterator[NodePage]:
+        """Retrieve nodes based on their metadata, page by page.
+
+        Only one page is held in memory at a time, so this can stream all the
+        nodes of the store. Recording the paging state of each page allows
+        resuming the search after a failure.
+
+        Args:
+            metadata: The metadata the nodes must have.
+            n: Optional maximum number of nodes to return.
+            fetch_size: Number of nodes per page. Defaults to 1000.
+            paging_state: Paging state of a previous search, to resume it after
+                the corresponding page. Defaults to `None` (the first page).
+
+        Returns:
+            The pages of nodes.
+        """
+        self._ensure_setup()
+        query, params = self._get_search_cql_and_params(metadata=metadata, limit=n)
+        return self._search_pages(
+            query, params, fetch_size=fetch_size, paging_state=paging_state
+        )
+
+    async def ametadata_search_pages(
+        self,
+        metadata: dict[str, Any] = {},  # noqa: B006
+        n: int | None = None,
+        *,
+        fetch_size: int = 1000,
+        paging_state: bytes | None = None,
+    ) -> AsyncIterator[NodePage]:
+        """Retrieve nodes based on their metadata, page by page.
+
+        Async version of `metadata_search_pages`.
+
+        Args:
+            metadata: The metadata the nodes must have.
+            n: Optional maximum number of nodes to return.
+            fetch_size: Number of nodes per page. Defaults to 1000.
+            paging_state: Paging state of a previous search, to resume it after
+                the corresponding page. Defaults to `None` (the first page).
+
+        Returns:
+            The pages of nodes.
+        """
+        await self._aensure_setup()
+        query, params = self._get_search_cql_and_params(metadata=metadata, limit=n)
+        async for page in self._asearch_pages(
+            query, params, fetch_size=fetch_size, paging_state=paging_state
+        ):
+            yield page
+
+    @staticmethod
+    def _bind(
+        query: PreparedStatement, params: tuple[Any, ...], fetch_size: int | None
+    ) -> Any:
+        statement = query.bind(params)
+        if fetch_size is not None:
+            statement.fetch_size = fetch_size
+        return statement
+
+    def _search_pages(
+        self,
+        query: PreparedStatement,
+        params: tuple[Any, ...],
+        fetch_size: int | None = None,
+        paging_state: bytes | None = None,
+    ) -> Iterator[NodePage]:
+        """Execute a search, yielding each page of nodes as it is fetched."""
+        statement = self._bind(query, params, fetch_size)
+        for rows, next_paging_state in self._execute_pages(statement, paging_state):
+            nodes = [_row_to_node(row, self._codec) for row in rows]
+            yield NodePage(nodes=nodes, paging_state=next_paging_state)
+
+    def _execute_pages(
+        self, statement: Any, paging_state: bytes | None = None
+    ) -> Iterator[tuple[list[Any], bytes | None]]:
+        """Execute a statement, yielding the rows and next paging state of each page."""
+        while True:
+            result = self._session.execute(statement, paging_state=paging_state)
+            paging_state = result.paging_state
+            yield list(result.current_rows), paging_state
+            if paging_state is None:
+                return
+
+    @staticmethod
+    def _scan_columns(columns: Sequence[str] | None) -> str:
+        if columns is None:
+            return CONTENT_COLUMNS
+        for column in columns:
+            if column not in NODE_COLUMNS:
+                raise ValueError(f"Invalid column: {column}")
+        return ", ".join(columns)
+
+    def _prepare_scan(self, columns: str) -> PreparedStatement:
+        """Prepare the query of the nodes of a token range, with their token."""
+        scan_query = self._scan_queries.get(columns)
+        if scan_query is None:
+            scan_query = self._scan_queries[columns] = self._session.prepare(
+                f"""
+                SELECT {columns}, token(content_id) AS token
+                FROM {self.table_name()}
+                WHERE token(content_id) > ? AND token(content_id) <= ?
+                """  # noqa: S608
+            )
+        return scan_query
+
+    async def _asearch_pages(
+        self,
+        query: PreparedStatement,
+        params: tuple[Any, ...],
+        fetch_size: int | None = None,
+        paging_state: bytes | None = None,
+    ) -> AsyncIterator[NodePage]:
+        """Execute a search, yielding each page of nodes as it is fetched."""
+        statement = self._bind(query, params, fetch_size)
+        while True:
+            rows, paging_state = await aexecute_page(
+                self._session, statement, paging_state=paging_state
+            )
+            nodes = [_row_to_node(row, self._codec) for row in rows]
+            yield NodePage(nodes=nodes, paging_state=paging_state)
+            if paging_state is None:
+                return
 
     def get_node(self, content_id: str) -> Node:
         """Get a node by its id."""
+        self._ensure_setup()
         return self._nodes_with_ids(ids=[content_id])[0]
 
+    async def aget_node(self, content_id: str) -> Node:
+        """Get a node by its id."""
+        await self._aensure_setup()
+        return (await self._anodes_with_ids(ids=[content_id]))[0]
+
     def _get_outgoing_tags(
         self,
         source_ids: Iterable[str],
@@ -724,134 +2055,311 @@ class GraphStore:
                     tags.update(row.link_to_tags)
 
         with self._concurrent_queries() as cq:
-            for source_id in source_ids:
+            for batch in self._id_batches(source_ids):
                 cq.execute(
-                    self._query_ids_and_link_to_tags_by_id,
-                    (source_id,),
+                    self._query_ids_and_link_to_tags_by_ids,
+                    (batch,),
                     callback=add_sources,
                 )
 
         return tags
 
+    async def _aget_outgoing_tags(
+        self,
+        source_ids: Iterable[str],
+    ) -> set[tuple[str, str]]:
+        cq = self._async_concurrent_queries()
+        results = await gather_fail_fast(
+            *(
+                cq.execute(self._query_ids_and_link_to_tags_by_ids, (batch,))
+                for batch in self._id_batches(source_ids)
+            )
+        )
+        tags = set()
+        for rows in results:
+            for row in rows:
+                if row.link_to_tags:
+                    tags.update(row.link_to_tags)
+        return tags
+
+    def _adjacency_cache_key(
+        self,
+        tags: tuple[tuple[str, str], ...],
+        query_embedding: list[float] | None,
+        limit: int | None,
+        metadata_filter: dict[str, Any] | None,
+    ) -> _AdjacencyKey:
+        metadata = tuple(
+            sorted(
+                (k, self._coerce_string(v)) for k, v in (metadata_filter or {}).items()
+            )
+        )
+        embedding = None if query_embedding is None else tuple(query_embedding)
+        return (tags, metadata, limit, embedding)
+
+    def _invalidate_adjacency_cache(
+        self, nodes_links: Iterable[set[Link]] | None
+    ) -> None:
+        if self._adjacency_cache is None:
+            return
+        if nodes_links is None:
+            self._adjacency_cache.clear()
+            return
+        # New nodes change the adjacency of the tags they have incoming links from.
+        tags = {
+            (link.kind, link.tag)
+            for links in nodes_links
+            for link in links
+            if link.direction in {"in", "bidir"}
+        }
+        if tags:
+            self._adjacency_cache.discard_if(lambda key: not tags.isdisjoint(key[0]))
+
+    def _adjacent_queries(
+        self,
+        tags: set[tuple[str, str]],
+        adjacent_query: PreparedStatement,
+        query_embedding: list[float],
+        k_per_tag: int,
+        limit: int | None,
+        metadata_filter: dict[str, Any] | None,
+    ) -> Iterable[tuple[_AdjacencyKey, PreparedStatement, tuple[Any, ...]]]:
+        """Group the tags and yield the cache key, query and parameters of each group.
+
+        Groups of several tags are fetched with a single query, ranking their
+        adjacent nodes by similarity across all the tags of the group.
+        """
+        sorted_tags = sorted(tags)
+        if self._edge_table is not None:
+            # Partitions of the edge table are read tag by tag, and the targets
+            # ranked by the client (see `_rank_edges`). The cached targets of a
+            # tag don't depend on the query, so they are shared by all of them.
+            for tag in sorted_tags:
+                key = self._adjacency_cache_key((tag,), None, None, metadata_filter)
+                yield key, self._query_edges_by_tag, tag
+            return
+
+        group_size = self._adjacency_tags_per_query
+        for start in range(0, len(sorted_tags), group_size):
+            group = tuple(sorted_tags[start : start + group_size])
+            group_limit = k_per_tag * len(group)
+            if limit is not None:
+                group_limit = min(group_limit, limit)
+
+            if len(group) == 1:
+                query = adjacent_query
+            else:
+                query = self._get_search_cql(
+                    has_limit=True,
+                    columns=ADJACENT_COLUMNS,
+                    metadata_keys=list((metadata_filter or {}).keys()),
+                    has_embedding=True,
+                    has_link_from_tags=True,
+                    num_link_from_tags=len(group),
+                )
+            params = self._get_search_params(
+                limit=group_limit,
+                metadata=metadata_filter,
+                embedding=query_embedding,
+                link_from_tags=group,
+            )
+            # The nodes are ranked by the ANN search, so only repetitions of the
+            # same query hit the cache.
+            key = self._adjacency_cache_key(
+                group, query_embedding, group_limit, metadata_filter
+            )
+            yield key, query, params
+
+    def _filter_edge_rows(
+        self, rows: Iterable[Any], metadata_filter: dict[str, Any] | None
+    ) -> list[Any]:
+        """Return the edge table rows whose target matches the metadata filter."""
+        keys = sorted((metadata_filter or {}).keys())
+        # Also checks that the fields are indexed, as the node table queries do.
+        values = self._extract_where_clause_params(metadata=metadata_filter or {})
+        return [
+            row
+            for row in rows
+            if all(
+                (row.metadata_s or {}).get(key) == value
+                for key, value in zip(keys, values)
+            )
+        ]
+
+    def _rows_to_edges(
+        self, rows: Iterable[Any], metadata_filter: dict[str, Any] | None
+    ) -> list[_Edge]:
+        """Convert the rows of an adjacency query to edges.
+
+        The rows of the edge table are all the targets of a tag: they are
+        filtered here, rather than by the query.
+        """
+        if self._edge_table is not None:
+            rows = self._filter_edge_rows(rows, metadata_filter)
+        return [_row_to_edge(row) for row in rows]
+
+    def _rank_edges(
+        self,
+        adjacent: Iterable[list[_Edge]],
+        query_embedding: list[float],
+        k_per_tag: int,
+    ) -> Iterable[list[_Edge]]:
+        """Keep the `k_per_tag` targets of each tag most similar to the query.
+
+        The adjacency queries of the node table already rank and limit them.
+        """
+        if self._edge_table is None:
+            return adjacent
+        return (
+            list(self._limit_edges(edges, query_embedding, k_per_tag))
+            for edges in adjacent
+        )
+
+    def _limit_edges(
+        self,
+        edges: Iterable[_Edge],
+        query_embedding: list[float],
+        limit: int | None,
+    ) -> Iterable[_Edge]:
+        """Keep the `limit` edges whose targets are the most similar to the query."""
+        edges = list(edges)
+        if limit is None or len(edges) <= limit:
+            return edges
+        similarity = cosine_similarity(
+            [query_embedding], [edge.target_text_embedding for edge in edges]
+        )[0]
+        # Stable, so that ties keep the order of the queries.
+        order = np.argsort(-similarity, kind="stable")[:limit]
+        return [edges[i] for i in order]
+
     def _get_adjacent(
         self,
         tags: set[tuple[str, str]],
         adjacent_query: PreparedStatement,
         query_embedding: list[float],
         k_per_tag: int | None = None,
+        limit: int | None = None,
         metadata_filter: dict[str, Any] | None = None,
     ) -> Iterable[_Edge]:
         """Return the target nodes with incoming links from any of the given tags.
 
+        The tags are fetched in groups of up to `adjacency_tags_per_query` tags.
+        If the adjacency cache is enabled, groups whose adjacent nodes are cached
+        are not queried.
+
         Args:
             tags: The tags to look for links *from*.
-            adjacent_query: Prepared query for adjacent nodes.
+            adjacent_query: Prepared query for the adjacent nodes of a single tag.
             query_embedding: The query embedding. Used to rank target nodes.
             k_per_tag: The number of target nodes to fetch for each outgoing tag.
+            limit: The maximum number of target nodes to return, across all the
+                tags. The nodes most similar to the query are kept.
             metadata_filter: Optional metadata to filter the results.
 
         Returns:
             List of adjacent edges.
         """
-        targets: dict[str, _Edge] = {}
-
-        def add_targets(rows: Iterable[Any]) -> None:
-            # TODO: Figure out how to use the "kind" on the edge.
-            # This is tricky, since we currently issue one query for anything
-            # adjacent via any kind, and we don't have enough information to
-            # determine which kind(s) a given target was reached from.
-            for row in rows:
-                if row.content_id not in targets:
-                    targets[row.content_id] = _Edge(
-                        target_content_id=row.content_id,
-                        target_text_embedding=row.text_embedding,
-                        target_link_to_tags=set(row.link_to_tags or []),
-                    )
-
+        k_per_tag = k_per_tag or 10
+        cache = self._adjacency_cache
+        # Edges for each query, in order, and the rows of the queries executed.
+        adjacent: dict[_AdjacencyKey, list[_Edge]] = {}
+        fetched: dict[_AdjacencyKey, list[Any]] = {}
+
+        # TODO: Figure out how to use the "kind" on the edge.
+        # This is tricky, since we currently issue one query for anything
+        # adjacent via any kind, and we don't have enough information to
+        # determine which kind(s) a given target was reached from.
         with self._concurrent_queries() as cq:
-            for kind, value in tags:
-                params = self._get_search_params(
-                    limit=k_per_tag or 10,
-                    metadata=metadata_filter,
-                    embedding=query_embedding,
-                    link_from_tags=(kind, value),
-                )
-
-                cq.execute(
-                    query=adjacent_query,
-                    parameters=params,
-                    callback=add_targets,
-                )
-
-        # TODO: Consider a combined limit based on the similarity and/or
-        # predicated MMR score?
-        return targets.values()
+            for key, query, params in self._adjacent_queries(
+                tags,
+                adjacent_query=adjacent_query,
+                query_embedding=query_embedding,
+                k_per_tag=k_per_tag,
+                limit=limit,
+                metadata_filter=metadata_filter,
+            ):
+                if cache is not None and (edges := cache.get(key)) is not None:
+                    adjacent[key] = edges
+                    continue
+
+                adjacent[key] = []
+                rows = fetched[key] = []
+                cq.execute(query=query, parameters=params, callback=rows.extend)
+
+        for key, rows in fetched.items():
+            edges = adjacent[key] = self._rows_to_edges(rows, metadata_filter)
+            if cache is not None:
+                cache.put(key, edges)
+
+        return self._limit_edges(
+            _merge_edges(
+                self._rank_edges(adjacent.values(), query_embedding, k_per_tag)
+            ),
+            query_embedding,
+            limit,
+        )
 
-    @staticmethod
-    def _normalize_metadata_indexing_policy(
-        metadata_indexing: tuple[str, Iterable[str]] | str,
-    ) -> MetadataIndexingPolicy:
-        mode: MetadataIndexingMode
-        fields: set[str]
-        # metadata indexing policy normalization:
-        if isinstance(metadata_indexing, str):
-            if metadata_indexing.lower() == "all":
-                mode, fields = (MetadataIndexingMode.DEFAULT_TO_SEARCHABLE, set())
-            elif metadata_indexing.lower() == "none":
-                mode, fields = (MetadataIndexingMode.DEFAULT_TO_UNSEARCHABLE, set())
-            else:
-                raise ValueError(
-                    f"Unsupported metadata_indexing value '{metadata_indexing}'"
-                )
-        else:
-            if len(metadata_indexing) != 2:  # noqa: PLR2004
-                raise ValueError(
-                    f"Unsupported metadata_indexing value '{metadata_indexing}'."
-                )
-            # it's a 2-tuple (mode, fields) still to normalize
-            _mode, _field_spec = metadata_indexing
-            fields = {_field_spec} if isinstance(_field_spec, str) else set(_field_spec)
-            if _mode.lower() in {
-                "default_to_unsearchable",
-                "allowlist",
-                "allow",
-                "allow_list",
-            }:
-                mode = MetadataIndexingMode.DEFAULT_TO_UNSEARCHABLE
-            elif _mode.lower() in {
-                "default_to_searchable",
-                "denylist",
-                "deny",
-                "deny_list",
-            }:
-                mode = MetadataIndexingMode.DEFAULT_TO_SEARCHABLE
+    async def _aget_adjacent(
+        self,
+        tags: set[tuple[str, str]],
+        adjacent_query: PreparedStatement,
+        query_embedding: list[float],
+        k_per_tag: int | None = None,
+        limit: int | None = None,
+        metadata_filter: dict[str, Any] | None = None,
+    ) -> Iterable[_Edge]:
+        k_per_tag = k_per_tag or 10
+        cache = self._adjacency_cache
+        adjacent: dict[_AdjacencyKey, list[_Edge]] = {}
+        to_fetch: dict[_AdjacencyKey, tuple[PreparedStatement, tuple[Any, ...]]] = {}
+        for key, query, params in self._adjacent_queries(
+            tags,
+            adjacent_query=adjacent_query,
+            query_embedding=query_embedding,
+            k_per_tag=k_per_tag,
+            limit=limit,
+            metadata_filter=metadata_filter,
+        ):
+            if cache is not None and (edges := cache.get(key)) is not None:
+                adjacent[key] = edges
             else:
-                raise ValueError(
-                    f"Unsupported metadata indexing mode specification '{_mode}'"
-                )
-        return (mode, fields)
+                adjacent[key] = []
+                to_fetch[key] = (query, params)
+
+        cq = self._async_concurrent_queries()
+        results = await gather_fail_fast(
+            *(
+                cq.execute(query, parameters=params)
+                for query, params in to_fetch.values()
+            )
+        )
 
-    @staticmethod
-    def _coerce_string(value: Any) -> str:
-        if isinstance(value, str):
-            return value
-        if isinstance(value, bool):
-            # bool MUST come before int in this chain of ifs!
-            return json.dumps(value)
-        if isinstance(value, int):
-            # we don't want to store '1' and '1.0' differently
-            # for the sake of metadata-filtered retrieval:
-            return json.dumps(float(value))
-        if isinstance(value, float) or value is None:
-            return json.dumps(value)
-        # when all else fails ...
-        return str(value)
+        for key, rows in zip(to_fetch, results):
+            edges = adjacent[key] = self._rows_to_edges(rows, metadata_filter)
+            if cache is not None:
+                cache.put(key, edges)
+
+        return self._limit_edges(
+            _merge_edges(
+                self._rank_edges(adjacent.values(), query_embedding, k_per_tag)
+            ),
+            query_embedding,
+            limit,
+        )
+
+    # The node helpers are shared with `InMemoryGraphStore`.
+    _unpack_nodes = staticmethod(_unpack_nodes)
+    _normalize_metadata_indexing_policy = staticmethod(
+        _normalize_metadata_indexing_policy
+    )
+    _coerce_string = staticmethod(_coerce_string)
 
     def _extract_where_clause_cql(
         self,
         has_id: bool = False,
         metadata_keys: Sequence[str] = (),
         has_link_from_tags: bool = False,
+        num_link_from_tags: int = 1,
     ) -> str:
         wc_blocks: list[str] = []
 
@@ -859,7 +2367,11 @@ class GraphStore:
             wc_blocks.append("content_id == ?")
 
         if has_link_from_tags:
-            wc_blocks.append("link_from_tags CONTAINS (?, ?)")
+            if num_link_from_tags == 1:
+                wc_blocks.append("link_from_tags CONTAINS (?, ?)")
+            else:
+                contains = ["link_from_tags CONTAINS (?, ?)"] * num_link_from_tags
+                wc_blocks.append("(" + " OR ".join(contains) + ")")
 
         for key in sorted(metadata_keys):
             if _is_metadata_field_indexed(key, self._metadata_indexing_policy):
@@ -877,13 +2389,21 @@ class GraphStore:
     def _extract_where_clause_params(
         self,
         metadata: dict[str, Any],
-        link_from_tags: tuple[str, str] | None = None,
+        link_from_tags: tuple[str, str] | Sequence[tuple[str, str]] | None = None,
     ) -> list[Any]:
         params: list[Any] = []
 
         if link_from_tags is not None:
-            params.append(link_from_tags[0])
-            params.append(link_from_tags[1])
+            # Either a single tag, or the tags of a disjunction.
+            tags = cast(
+                Sequence[tuple[str, str]],
+                [link_from_tags]
+                if isinstance(link_from_tags[0], str)
+                else link_from_tags,
+            )
+            for kind, tag in tags:
+                params.append(kind)
+                params.append(tag)
 
         for key, value in sorted(metadata.items()):
             if _is_metadata_field_indexed(key, self._metadata_indexing_policy):
@@ -903,11 +2423,28 @@ class GraphStore:
         has_id: bool = False,
         has_embedding: bool = False,
         has_link_from_tags: bool = False,
+        num_link_from_tags: int = 1,
     ) -> PreparedStatement:
+        # The key identifies the shape of the statement, so that it can be looked
+        # up without generating the CQL. Equivalent columns and metadata keys
+        # (differing in whitespace or order) share a statement.
+        key: _StatementKey = (
+            " ".join(columns.split()) if columns else columns,
+            tuple(sorted(metadata_keys)),
+            has_limit,
+            has_id,
+            has_embedding,
+            num_link_from_tags if has_link_from_tags else 0,
+        )
+        prepared_query = self._prepared_query_cache.get(key)
+        if prepared_query is not None:
+            return prepared_query
+
         where_clause = self._extract_where_clause_cql(
             has_id=has_id,
             metadata_keys=metadata_keys,
             has_link_from_tags=has_link_from_tags,
+            num_link_from_tags=num_link_from_tags,
         )
         limit_clause = " LIMIT ?" if has_limit else ""
         order_clause = " ORDER BY text_embedding ANN OF ?" if has_embedding else ""
@@ -920,12 +2457,9 @@ class GraphStore:
             limit_clause=limit_clause,
         )
 
-        if select_cql in self._prepared_query_cache:
-            return self._prepared_query_cache[select_cql]
-
         prepared_query = self._session.prepare(select_cql)
         prepared_query.consistency_level = ConsistencyLevel.ONE
-        self._prepared_query_cache[select_cql] = prepared_query
+        self._prepared_query_cache.put(key, prepared_query)
 
         return prepared_query
 
@@ -934,8 +2468,8 @@ class GraphStore:
         limit: int | None = None,
         metadata: dict[str, Any] | None = None,
         embedding: list[float] | None = None,
-        link_from_tags: tuple[str, str] | None = None,
-    ) -> tuple[PreparedStatement, tuple[Any, ...]]:
+        link_from_tags: tuple[str, str] | Sequence[tuple[str, str]] | None = None,
+    ) -> tuple[Any, ...]:
         where_params = self._extract_where_clause_params(
             metadata=metadata or {}, link_from_tags=link_from_tags
         )
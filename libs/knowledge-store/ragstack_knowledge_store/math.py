@@ -4,7 +4,7 @@ See https://github.com/langchain-ai/langchain/blob/langchain-community%3D%3D0.0.
 """  # noqa: E501
 
 import logging
-from typing import List, Union
+from typing import Any, List, Union
 
 import numpy as np
 from numpy.typing import NDArray
@@ -13,26 +13,31 @@ logger = logging.getLogger(__name__)
 
 Matrix = Union[List[List[float]], List[NDArray[np.float32]], NDArray[np.float32]]
 
+# The backend is resolved once, rather than on every call.
+simd: Any
+try:
+    import simsimd as simd
+except ImportError:
+    logger.debug(
+        "Unable to import simsimd, defaulting to NumPy implementation. If you want "
+        "to use simsimd please install with `pip install simsimd`."
+    )
+    simd = None
+
 
 def cosine_similarity(x: Matrix, y: Matrix) -> NDArray[np.float32]:
     """Row-wise cosine similarity between two equal-width matrices."""
     if len(x) == 0 or len(y) == 0:
         return np.array([])
 
-    x = np.array(x)
-    y = np.array(y)
+    x = np.asarray(x)
+    y = np.asarray(y)
     if x.shape[1] != y.shape[1]:
         raise ValueError(
             f"Number of columns in X and Y must be the same. X has shape {x.shape} "
             f"and Y has shape {y.shape}."
         )
-    try:
-        import simsimd as simd
-    except ImportError:
-        logger.debug(
-            "Unable to import simsimd, defaulting to NumPy implementation. If you want "
-            "to use simsimd please install with `pip install simsimd`."
-        )
+    if simd is None:
         x_norm = np.linalg.norm(x, axis=1)
         y_norm = np.linalg.norm(y, axis=1)
         # Ignore divide by zero errors run time warnings as those are handled below.
@@ -40,7 +45,33 @@ def cosine_similarity(x: Matrix, y: Matrix) -> NDArray[np.float32]:
             similarity: NDArray[np.float32] = np.dot(x, y.T) / np.outer(x_norm, y_norm)
         similarity[np.isnan(similarity) | np.isinf(similarity)] = 0.0
         return similarity
-    else:
-        x = np.array(x, dtype=np.float32)
-        y = np.array(y, dtype=np.float32)
-        return 1.0 - np.array(simd.cdist(x, y, metric="cosine"))
+
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    return np.asarray(1.0 - np.array(simd.cdist(x, y, metric="cosine")))
+
+
+def dot_similarity(x: NDArray[Any], y: NDArray[Any]) -> NDArray[np.float32]:
+    """Row-wise dot product between two equal-width matrices.
+
+    For L2-normalized rows, this is the cosine similarity without recomputing the
+    norms. Both float32 and float16 matrices are supported: float16 uses simsimd
+    (when installed), as NumPy has no fast float16 matrix product.
+    """
+    if x.dtype == np.float16 and simd is not None:
+        return np.asarray(simd.cdist(x, y, metric="dot"), dtype=np.float32)
+    similarity: NDArray[np.float32] = np.dot(
+        x.astype(np.float32, copy=False), y.astype(np.float32, copy=False).T
+    )
+    return similarity
+
+
+def normalize_rows(x: NDArray[np.float32]) -> NDArray[np.float32]:
+    """L2-normalize the rows of a matrix.
+
+    Zero rows are left as is (their similarity to anything is 0).
+    """
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    normalized: NDArray[np.float32] = x / norms
+    return normalized
@@ -0,0 +1,1276 @@
+from __future__ import annotations
+
+import functools
+import heapq
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, NamedTuple, Sequence
+
+import numpy as np
+
+from ._mmr_helper import MmrHelper
+from ._node_utils import (
+    _DEFAULT_CODEC,
+    BatchProgress,
+    MetadataIndexingType,
+    Node,
+    _abatched,
+    _AddedNodes,
+    _batch_added,
+    _batched,
+    _coerce_string,
+    _deserialize_links,
+    _deserialize_metadata,
+    _Edge,
+    _is_metadata_field_indexed,
+    _LazyNode,
+    _merge_edges,
+    _NodeBatch,
+    _normalize_metadata_indexing_policy,
+    _serialize_links,
+    _serialize_metadata,
+    _TraversalState,
+    _unpack_nodes,
+)
+from .content import Kind
+from .graph_store import (
+    CONTENT_COLUMNS,
+    NODE_COLUMNS,
+    NodePage,
+    ScanPage,
+    token_ranges,
+)
+from .math import normalize_rows
+
+if TYPE_CHECKING:
+    from collections.abc import (
+        AsyncIterable,
+        AsyncIterator,
+        Callable,
+        Generator,
+        Iterable,
+        Iterator,
+    )
+    from typing import IO
+
+    from numpy.typing import NDArray
+
+    from .codec import Codec
+    from .embedding_model import EmbeddingModel
+    from .links import Link
+
+_Tag = tuple[str, str]
+
+# Files of a saved store. The store file, in its directory, names the data
+# directory holding the other files.
+_STORE_FILE = "store.json"
+_DATA_DIRECTORY_PREFIX = "data-"
+_NODES_FILE = "nodes.jsonl"
+_EMBEDDINGS_FILE = "embeddings.npy"
+_NORMS_FILE = "norms.npy"
+_CENTROIDS_FILE = "centroids.npy"
+_ASSIGNMENTS_FILE = "assignments.npy"
+_FORMAT_VERSION = 1
+
+_INITIAL_CAPACITY = 1024
+
+# The IVF index is trained once there are this many nodes per list.
+_IVF_MIN_ROWS_PER_LIST = 39
+# Maximum number of nodes per list sampled to train the IVF index.
+_IVF_MAX_ROWS_PER_LIST = 256
+_IVF_TRAINING_ITERATIONS = 10
+
+
+class _TraversalNode(NamedTuple):
+    content_id: str
+    link_to_tags: frozenset[_Tag]
+
+
+def _link_tags(links: Iterable[Link]) -> tuple[frozenset[_Tag], frozenset[_Tag]]:
+    """Return the tags a node links to and the tags it is linked from."""
+    link_to_tags = set()
+    link_from_tags = set()
+    for link in links:
+        if link.direction in {"in", "bidir"}:
+            # An incoming link should be linked *from* nodes with the given tag.
+            link_from_tags.add((link.kind, link.tag))
+        if link.direction in {"out", "bidir"}:
+            link_to_tags.add((link.kind, link.tag))
+    return frozenset(link_to_tags), frozenset(link_from_tags)
+
+
+def _train_ivf(
+    vectors: NDArray[np.float32], n_lists: int, rng: np.random.Generator
+) -> NDArray[np.float32]:
+    """Train the centroids of the IVF lists with spherical k-means."""
+    vectors = normalize_rows(vectors)
+    centroids = vectors[rng.choice(len(vectors), size=n_lists, replace=False)]
+    for _ in range(_IVF_TRAINING_ITERATIONS):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        # Lists which lost all their nodes keep their centroid.
+        empty = np.bincount(assignments, minlength=n_lists) == 0
+        sums[empty] = centroids[empty]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def _write_file(path: Path, write: Callable[[IO[bytes]], Any]) -> None:
+    """Write a file, and flush it to disk."""
+    with path.open("wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _replace_file(path: Path, write: Callable[[IO[bytes]], Any]) -> None:
+    """Write a file through a temporary file, replacing it atomically."""
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    os.close(fd)
+    try:
+        _write_file(Path(temp_path), write)
+        Path(temp_path).replace(path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+class InMemoryGraphStore:
+    """A hybrid vector-and-graph store held in memory.
+
+    Implements the same API and link semantics as `GraphStore`, without a
+    Cassandra cluster: for tests, offline benchmarks of the traversals, and small
+    deployments.
+
+    The nodes are held in columns, with their embeddings in a single float32
+    matrix. Inverted indexes map each tag to the nodes with an incoming link from
+    it, and each indexed metadata entry to the nodes having it. Filtered searches
+    score the matching nodes exactly. Unfiltered searches score all the nodes,
+    unless the IVF index is enabled: the nodes are then clustered into
+    `ivf_lists` lists, and only the `ivf_probes` lists closest to the query are
+    scored. The index is trained once the store has enough nodes (39 per list),
+    and new nodes are added to the closest list.
+
+    The store can be saved to a directory, and loaded with the embeddings
+    memory-mapped, so they are only read from disk as they are used.
+
+    Scans (and so `EmbeddingMigration`) see the nodes as a single token range, in
+    the order they were first added. The store has no edge table.
+
+    Args:
+        embedding: The embeddings to use for the document content.
+        metadata_indexing: The metadata fields which can be searched, like for
+            `GraphStore`. Defaults to "all".
+        normalize_embeddings: Whether to L2-normalize the embeddings when writing
+            nodes. MMR then uses the stored embeddings without normalizing them
+            again. Defaults to False.
+        mmr_float16: Whether MMR traversals keep the candidate embeddings in
+            float16. Defaults to False.
+        ivf_lists: Number of lists of the IVF index, or 0 (the default) to score
+            all the nodes.
+        ivf_probes: Number of lists scored by the unfiltered searches, with the
+            IVF index. More probes find more of the exact results, but are
+            slower. Defaults to 8.
+        codec: Codec used to serialize the metadata and links of the nodes.
+            Defaults to `orjson` if installed, else the `json` module.
+    """
+
+    def __init__(
+        self,
+        embedding: EmbeddingModel,
+        *,
+        metadata_indexing: MetadataIndexingType = "all",
+        normalize_embeddings: bool = False,
+        mmr_float16: bool = False,
+        ivf_lists: int = 0,
+        ivf_probes: int = 8,
+        codec: Codec | None = None,
+    ):
+        if ivf_lists < 0:
+            raise ValueError("ivf_lists must be at least 0")
+        if ivf_probes < 1:
+            raise ValueError("ivf_probes must be at least 1")
+        self._embedding = embedding
+        self._metadata_indexing_policy = _normalize_metadata_indexing_policy(
+            metadata_indexing=metadata_indexing
+        )
+        self._normalize_embeddings = normalize_embeddings
+        self._mmr_float16 = mmr_float16
+        self._ivf_lists = ivf_lists
+        self._ivf_probes = ivf_probes
+        self._codec = codec or _DEFAULT_CODEC
+        # Guards the columns and the indexes.
+        self._lock = threading.RLock()
+
+        # Columns of the nodes, indexed by row.
+        self._ids: list[str] = []
+        self._texts: list[str] = []
+        self._links_blobs: list[str] = []
+        self._metadata_blobs: list[str] = []
+        self._link_to_tags: list[frozenset[_Tag]] = []
+        self._link_from_tags: list[frozenset[_Tag]] = []
+        self._metadata_s: list[dict[str, str]] = []
+        # The matrices have rows for the future nodes (their capacity is doubled
+        # when full). The dimension is set by the first node.
+        self._embeddings: NDArray[np.float32] = np.zeros((0, 0), dtype=np.float32)
+        self._norms: NDArray[np.float32] = np.zeros(0, dtype=np.float32)
+        self._assignments: NDArray[np.int32] = np.zeros(0, dtype=np.int32)
+        self._centroids: NDArray[np.float32] | None = None
+
+        # Map from ID to row, and inverted indexes from incoming tags and indexed
+        # metadata entries to rows.
+        self._rows: dict[str, int] = {}
+        self._tag_index: dict[_Tag, set[int]] = {}
+        self._metadata_index: dict[tuple[str, str], set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def table_name(self) -> str:
+        """Returns a name identifying the store, in place of a table name."""
+        return f"in_memory_{id(self):x}"
+
+    def edge_table_name(self) -> str | None:
+        """Returns `None`, as the store has no edge table."""
+        return None
+
+    def _reserve(self, count: int, dimension: int) -> None:
+        size = len(self)
+        if size and self._embeddings.shape[1] != dimension:
+            raise ValueError(
+                f"Expected embeddings of dimension {self._embeddings.shape[1]}, "
+                f"got {dimension}"
+            )
+        capacity = self._embeddings.shape[0]
+        if size + count <= capacity and self._embeddings.shape[1] == dimension:
+            return
+        capacity = max(size + count, 2 * capacity, _INITIAL_CAPACITY)
+
+        embeddings = np.zeros((capacity, dimension), dtype=np.float32)
+        norms = np.zeros(capacity, dtype=np.float32)
+        assignments = np.zeros(capacity, dtype=np.int32)
+        if size:
+            embeddings[:size] = self._embeddings[:size]
+            norms[:size] = self._norms[:size]
+            assignments[:size] = self._assignments[:size]
+        self._embeddings = embeddings
+        self._norms = norms
+        self._assignments = assignments
+
+    def _index_row(self, row: int) -> None:
+        for tag in self._link_from_tags[row]:
+            self._tag_index.setdefault(tag, set()).add(row)
+        for entry in self._metadata_s[row].items():
+            self._metadata_index.setdefault(entry, set()).add(row)
+
+    def _unindex_row(self, row: int) -> None:
+        for tag in self._link_from_tags[row]:
+            self._tag_index[tag].discard(row)
+        for entry in self._metadata_s[row].items():
+            self._metadata_index[entry].discard(row)
+
+    def _set_row(
+        self,
+        row: int,
+        text: str,
+        links_blob: str,
+        metadata_blob: str,
+        links: Iterable[Link],
+        metadata: dict[str, Any],
+    ) -> None:
+        link_to_tags, link_from_tags = _link_tags(links)
+        metadata_s = {
+            key: _coerce_string(value)
+            for key, value in metadata.items()
+            if _is_metadata_field_indexed(key, self._metadata_indexing_policy)
+        }
+        self._texts[row] = text
+        self._links_blobs[row] = links_blob
+        self._metadata_blobs[row] = metadata_blob
+        self._link_to_tags[row] = link_to_tags
+        self._link_from_tags[row] = link_from_tags
+        self._metadata_s[row] = metadata_s
+        self._index_row(row)
+
+    def _append_row(self, node_id: str) -> int:
+        row = len(self._ids)
+        self._rows[node_id] = row
+        self._ids.append(node_id)
+        self._texts.append("")
+        self._links_blobs.append("")
+        self._metadata_blobs.append("")
+        self._link_to_tags.append(frozenset())
+        self._link_from_tags.append(frozenset())
+        self._metadata_s.append({})
+        return row
+
+    def _write_batch(
+        self, batch: _NodeBatch, text_embeddings: list[list[float]]
+    ) -> None:
+        node_ids, texts, metadatas, nodes_links = batch
+        vectors = np.asarray(text_embeddings, dtype=np.float32).reshape(
+            len(node_ids), -1
+        )
+        if self._normalize_embeddings:
+            vectors = normalize_rows(vectors)
+        norms = np.linalg.norm(vectors, axis=1)
+
+        with self._lock:
+            self._reserve(len(node_ids), vectors.shape[1])
+            rows = []
+            for node_id, text, metadata, links in zip(
+                node_ids, texts, metadatas, nodes_links
+            ):
+                # Like Cassandra, adding a node with an existing ID replaces it.
+                row = self._rows.get(node_id)
+                if row is None:
+                    row = self._append_row(node_id)
+                else:
+                    self._unindex_row(row)
+                self._set_row(
+                    row,
+                    text=text,
+                    links_blob=_serialize_links(links, self._codec),
+                    metadata_blob=_serialize_metadata(metadata, self._codec),
+                    links=links,
+                    metadata=metadata,
+                )
+                rows.append(row)
+
+            self._embeddings[rows] = vectors
+            self._norms[rows] = norms
+            if self._centroids is not None:
+                self._assignments[rows] = self._closest_lists(vectors)
+            elif self._ivf_lists and len(self) >= (
+                self._ivf_lists * _IVF_MIN_ROWS_PER_LIST
+            ):
+                self.train_index()
+
+    def _closest_lists(
+        self, vectors: NDArray[np.float32], n: int = 1
+    ) -> NDArray[np.int32]:
+        """Return the `n` IVF lists whose centroids are the closest to each vector."""
+        assert self._centroids is not None  # noqa: S101
+        similarity = vectors @ self._centroids.T
+        closest: NDArray[np.intp]
+        if n == 1:
+            closest = np.argmax(similarity, axis=1)
+        else:
+            n = min(n, len(self._centroids))
+            closest = np.argpartition(-similarity, n - 1, axis=1)[:, :n]
+        return np.asarray(closest, dtype=np.int32)
+
+    def train_index(self) -> None:
+        """Train the IVF index on the nodes of the store.
+
+        The index is trained automatically once the store has enough nodes. As
+        the centroids of the lists are not updated by new nodes, this retrains
+        the index when the nodes have drifted from them.
+        """
+        if not self._ivf_lists:
+            raise ValueError("The IVF index is disabled (ivf_lists is 0)")
+        with self._lock:
+            size = len(self)
+            if size < self._ivf_lists:
+                raise ValueError(
+                    f"Training {self._ivf_lists} lists needs at least as many nodes"
+                )
+            rng = np.random.default_rng(0)
+            sample_size = min(size, self._ivf_lists * _IVF_MAX_ROWS_PER_LIST)
+            sample = np.sort(rng.choice(size, size=sample_size, replace=False))
+            self._centroids = _train_ivf(
+                np.asarray(self._embeddings[sample]), self._ivf_lists, rng
+            )
+            # The rows are assigned by chunks, bounding the similarity matrix.
+            chunk_size = 65536
+            for start in range(0, size, chunk_size):
+                end = min(start + chunk_size, size)
+                self._assignments[start:end] = self._closest_lists(
+                    np.asarray(self._embeddings[start:end])
+                )
+
+    def add_nodes(
+        self,
+        nodes: Iterable[Node],
+        *,
+        batch_size: int = 1000,
+        on_batch: Callable[[BatchProgress], None] | None = None,
+        fail_fast: bool = True,
+        return_ids: bool = True,
+    ) -> Iterable[str]:
+        """Add nodes to the graph store.
+
+        Args:
+            nodes: The nodes to add. They are only iterated once, so this can be a
+                generator.
+            batch_size: Number of nodes embedded and written at once. Defaults to
+                1000.
+            on_batch: Optional callback, called with the progress after each
+                batch.
+            fail_fast: Whether to stop at the first failed batch, raising its
+                error. Otherwise, the failures are reported to `on_batch` and
+                the next batches are still added. Defaults to True.
+            return_ids: Whether to return the IDs of the added nodes. They are
+                kept in memory until all the nodes are added, so disable this
+                when adding a large number of nodes, and get the IDs of each
+                batch from `on_batch` instead. Defaults to True.
+
+        Returns:
+            The IDs of the added nodes, or an empty list if `return_ids` is False.
+        """
+        added = _AddedNodes(ids=[] if return_ids else None)
+        for index, nodes_batch in enumerate(_batched(nodes, batch_size)):
+            batch = _unpack_nodes(nodes_batch)
+            progress = BatchProgress(batch=index, node_ids=batch[0], nodes_added=0)
+            try:
+                self._write_batch(batch, self._embedding.embed_texts(batch[1]))
+            except Exception as error:  # noqa: BLE001
+                progress.error = error
+            _batch_added(progress, added, on_batch, fail_fast)
+        return added.result()
+
+    async def aadd_nodes(
+        self,
+        nodes: Iterable[Node] | AsyncIterable[Node],
+        *,
+        batch_size: int = 1000,
+        on_batch: Callable[[BatchProgress], None] | None = None,
+        fail_fast: bool = True,
+        return_ids: bool = True,
+    ) -> Iterable[str]:
+        """Add nodes to the graph store asynchronously.
+
+        Async version of `add_nodes`, also accepting an async iterable of nodes.
+        """
+        added = _AddedNodes(ids=[] if return_ids else None)
+        index = -1
+        async for nodes_batch in _abatched(nodes, batch_size):
+            index += 1
+            batch = _unpack_nodes(nodes_batch)
+            progress = BatchProgress(batch=index, node_ids=batch[0], nodes_added=0)
+            try:
+                self._write_batch(batch, await self._embedding.aembed_texts(batch[1]))
+            except Exception as error:  # noqa: BLE001
+                progress.error = error
+            _batch_added(progress, added, on_batch, fail_fast)
+        return added.result()
+
+    def backfill_edge_table(self) -> int:
+        """Raises a `ValueError`, as the store has no edge table."""
+        raise ValueError("The graph store doesn't have an edge table")
+
+    def _scan_column(self, column: str) -> Callable[[int], Any]:
+        """Return the function reading a column of the node table from a row."""
+        if column not in NODE_COLUMNS:
+            raise ValueError(f"Invalid column: {column}")
+        columns: dict[str, Callable[[int], Any]] = {
+            "content_id": lambda row: self._ids[row],
+            "kind": lambda _: f"{Kind.passage}",
+            "text_content": lambda row: self._texts[row],
+            "text_embedding": lambda row: self._embeddings[row].tolist(),
+            "link_to_tags": lambda row: set(self._link_to_tags[row]),
+            "link_from_tags": lambda row: set(self._link_from_tags[row]),
+            "links_blob": lambda row: self._links_blobs[row],
+            "metadata_blob": lambda row: self._metadata_blobs[row],
+            "metadata_s": lambda row: dict(self._metadata_s[row]),
+        }
+        return columns[column]
+
+    def scan(
+        self,
+        callback: Callable[[Sequence[Any]], None],
+        *,
+        columns: Sequence[str] | None = None,
+        splits: int = 16,  # noqa: ARG002
+        max_concurrent_splits: int = 4,  # noqa: ARG002
+        fetch_size: int = 1000,
+    ) -> int:
+        """Scan all the nodes, passing each page of rows to the callback.
+
+        The nodes are scanned in the order they were first added, as a single
+        token range. See `GraphStore.scan` for the arguments.
+
+        Returns:
+            The number of rows scanned.
+        """
+        [(start, end)] = token_ranges(1)
+        count = 0
+        for page in self.scan_token_range(
+            start, end, columns=columns, fetch_size=fetch_size
+        ):
+            callback(page.rows)
+            count += len(page.rows)
+        return count
+
+    def scan_token_range(
+        self,
+        start: int,
+        end: int,
+        *,
+        columns: Sequence[str] | None = None,
+        to_nodes: bool = False,
+        fetch_size: int = 1000,
+    ) -> Iterator[ScanPage]:
+        """Scan the nodes whose token is in `(start, end]`, a page at a time.
+
+        The token of a node is its position in the order the nodes were first
+        added (from 0), so all the nodes are in one of the ranges of
+        `token_ranges`. See `GraphStore.scan_token_range` for the arguments.
+
+        Returns:
+            The pages of the scan.
+        """
+        if to_nodes and columns is not None:
+            raise ValueError("Nodes can only be scanned with the default columns")
+        if columns is None:
+            columns = [column.strip() for column in CONTENT_COLUMNS.split(",")]
+        readers = {column: self._scan_column(column) for column in columns}
+
+        start = max(start + 1, 0)
+        while True:
+            with self._lock:
+                stop = min(end + 1, len(self), start + fetch_size)
+                rows = [
+                    SimpleNamespace(
+                        **{column: read(row) for column, read in readers.items()},
+                        token=row,
+                    )
+                    for row in range(start, stop)
+                ]
+                nodes = [self._node(row) for row in range(start, stop) if to_nodes]
+            if not rows:
+                return
+            yield ScanPage(rows=rows, nodes=nodes, token=stop - 1)
+            start = stop
+
+    def scan_rows(
+        self,
+        columns: Sequence[str] | None = None,
+        *,
+        splits: int = 16,  # noqa: ARG002
+        max_concurrent_splits: int = 4,  # noqa: ARG002
+        fetch_size: int = 1000,
+    ) -> Generator[Any, None, None]:
+        """Scan all the nodes, yielding their rows.
+
+        Iterator version of `scan`.
+
+        Returns:
+            The rows, each with the scanned columns and the `token` of the node.
+        """
+        [(start, end)] = token_ranges(1)
+        for page in self.scan_token_range(
+            start, end, columns=columns, fetch_size=fetch_size
+        ):
+            yield from page.rows
+
+    def scan_nodes(
+        self,
+        *,
+        splits: int = 16,  # noqa: ARG002
+        max_concurrent_splits: int = 4,  # noqa: ARG002
+        fetch_size: int = 1000,
+    ) -> Iterator[Node]:
+        """Scan all the nodes, in the order they were first added."""
+        [(start, end)] = token_ranges(1)
+        for page in self.scan_token_range(
+            start, end, to_nodes=True, fetch_size=fetch_size
+        ):
+            yield from page.nodes
+
+    def _node(self, row: int) -> Node:
+        return _LazyNode.from_blobs(
+            id=self._ids[row],
+            text=self._texts[row],
+            metadata_blob=self._metadata_blobs[row],
+            links_blob=self._links_blobs[row],
+            codec=self._codec,
+        )
+
+    def _nodes_with_ids(self, ids: Iterable[str]) -> list[Node]:
+        with self._lock:
+            nodes = []
+            for node_id in ids:
+                if (row := self._rows.get(node_id)) is None:
+                    raise ValueError(f"No node with ID '{node_id}'")
+                nodes.append(self._node(row))
+            return nodes
+
+    def get_node(self, content_id: str) -> Node:
+        """Get a node by its id."""
+        return self._nodes_with_ids([content_id])[0]
+
+    async def aget_node(self, content_id: str) -> Node:
+        """Get a node by its id."""
+        return self.get_node(content_id)
+
+    def _filter_rows(self, metadata_filter: dict[str, Any]) -> set[int] | None:
+        """Return the rows matching the metadata filter, or `None` if unfiltered."""
+        rows: set[int] | None = None
+        for key, value in sorted(metadata_filter.items()):
+            if not _is_metadata_field_indexed(key, self._metadata_indexing_policy):
+                raise ValueError(
+                    "Non-indexed metadata fields cannot be used in queries."
+                )
+            entry = (key, _coerce_string(value))
+            matching = self._metadata_index.get(entry, set())
+            rows = matching.copy() if rows is None else rows & matching
+        return rows
+
+    def _similarities(
+        self, query: NDArray[np.float32], rows: NDArray[np.intp] | None
+    ) -> NDArray[np.float32]:
+        """Return the cosine similarity of the query to the rows (or all rows)."""
+        size = len(self)
+        embeddings = self._embeddings[:size] if rows is None else self._embeddings[rows]
+        norms = self._norms[:size] if rows is None else self._norms[rows]
+        query_norm = float(np.linalg.norm(query))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            similarity: NDArray[np.float32] = (embeddings @ query) / (
+                norms * query_norm
+            )
+        similarity[~np.isfinite(similarity)] = 0.0
+        return similarity
+
+    def _search_rows(
+        self,
+        query_embedding: list[float],
+        k: int,
+        rows: Iterable[int] | None = None,
+    ) -> list[int]:
+        """Return the `k` rows most similar to the query, by decreasing similarity.
+
+        Args:
+            query_embedding: The embedding of the query.
+            k: The number of rows to return.
+            rows: The rows to search, or `None` to search all the rows (using the
+                IVF index, if trained).
+        """
+        size = len(self)
+        if k <= 0 or size == 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        candidates: NDArray[np.intp] | None = None
+        if rows is not None:
+            candidates = np.fromiter(rows, dtype=np.intp)
+        elif self._centroids is not None:
+            probed = np.zeros(len(self._centroids), dtype=bool)
+            probed[self._closest_lists(query[None, :], self._ivf_probes)[0]] = True
+            candidates = np.flatnonzero(probed[self._assignments[:size]])
+        if candidates is not None:
+            # Ties are broken by row, the order the nodes were added in.
+            candidates.sort()
+            if len(candidates) == 0:
+                return []
+
+        similarity = self._similarities(query, candidates)
+        if k < len(similarity):
+            top = np.sort(np.argpartition(-similarity, k - 1)[:k])
+        else:
+            top = np.arange(len(similarity))
+        top = top[np.argsort(-similarity[top], kind="stable")]
+        result = top if candidates is None else candidates[top]
+        return [int(row) for row in result]
+
+    def similarity_search(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        metadata_filter: dict[str, Any] = {},  # noqa: B006
+        *,
+        fetch_size: int | None = None,  # noqa: ARG002
+    ) -> Iterable[Node]:
+        """Retrieve nodes similar to the given embedding, optionally filtered by metadata.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of nodes to return. Defaults to 4.
+            metadata_filter: Optional metadata to filter the results.
+            fetch_size: Unused, as the nodes are already in memory.
+        """  # noqa: E501
+        with self._lock:
+            rows = self._search_rows(embedding, k, self._filter_rows(metadata_filter))
+            return [self._node(row) for row in rows]
+
+    async def asimilarity_search(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        metadata_filter: dict[str, Any] = {},  # noqa: B006
+        *,
+        fetch_size: int | None = None,
+    ) -> AsyncIterable[Node]:
+        """Retrieve nodes similar to the given embedding, optionally filtered by metadata.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of nodes to return. Defaults to 4.
+            metadata_filter: Optional metadata to filter the results.
+            fetch_size: Unused, as the nodes are already in memory.
+        """  # noqa: E501
+        for node in self.similarity_search(
+            embedding, k, metadata_filter, fetch_size=fetch_size
+        ):
+            yield node
+
+    def _metadata_rows(self, metadata: dict[str, Any]) -> list[int]:
+        rows = self._filter_rows(metadata)
+        return list(range(len(self))) if rows is None else sorted(rows)
+
+    def metadata_search(
+        self,
+        metadata: dict[str, Any] = {},  # noqa: B006
+        n: int = 5,
+        *,
+        fetch_size: int | None = None,  # noqa: ARG002
+    ) -> Iterable[Node]:
+        """Retrieve nodes based on their metadata.
+
+        Args:
+            metadata: The metadata the nodes must have.
+            n: The maximum number of nodes to return. Defaults to 5.
+            fetch_size: Unused, as the nodes are already in memory.
+        """
+        with self._lock:
+            return [self._node(row) for row in self._metadata_rows(metadata)[:n]]
+
+    async def ametadata_search(
+        self,
+        metadata: dict[str, Any] = {},  # noqa: B006
+        n: int = 5,
+        *,
+        fetch_size: int | None = None,
+    ) -> AsyncIterable[Node]:
+        """Retrieve nodes based on their metadata.
+
+        Args:
+            metadata: The metadata the nodes must have.
+            n: The maximum number of nodes to return. Defaults to 5.
+            fetch_size: Unused, as the nodes are already in memory.
+        """
+        for node in self.metadata_search(metadata, n, fetch_size=fetch_size):
+            yield node
+
+    def metadata_search_pages(
+        self,
+        metadata: dict[str, Any] = {},  # noqa: B006
+        n: int | None = None,
+        *,
+        fetch_size: int = 1000,
+        paging_state: bytes | None = None,
+    ) -> Iterator[NodePage]:
+        """Retrieve nodes based on their metadata, page by page.
+
+        The paging state is the position of the page in the matching nodes, which
+        are in the order they were first added.
+
+        Args:
+            metadata: The metadata the nodes must have.
+            n: Optional maximum number of nodes to return.
+            fetch_size: Number of nodes per page. Defaults to 1000.
+            paging_state: Paging state of a previous search, to resume it after
+                the corresponding page. Defaults to `None` (the first page).
+
+        Returns:
+            The pages of nodes.
+        """
+        with self._lock:
+            rows = self._metadata_rows(metadata)[:n]
+        start = int(paging_state.decode()) if paging_state else 0
+        while True:
+            end = start + fetch_size
+            with self._lock:
+                nodes = [self._node(row) for row in rows[start:end]]
+            next_state = str(end).encode() if end < len(rows) else None
+            yield NodePage(nodes=nodes, paging_state=next_state)
+            if next_state is None:
+                return
+            start = end
+
+    async def ametadata_search_pages(
+        self,
+        metadata: dict[str, Any] = {},  # noqa: B006
+        n: int | None = None,
+        *,
+        fetch_size: int = 1000,
+        paging_state: bytes | None = None,
+    ) -> AsyncIterator[NodePage]:
+        """Retrieve nodes based on their metadata, page by page.
+
+        Async version of `metadata_search_pages`.
+        """
+        for page in self.metadata_search_pages(
+            metadata, n, fetch_size=fetch_size, paging_state=paging_state
+        ):
+            yield page
+
+    def _traversal(
+        self,
+        query_embedding: list[float],
+        k: int,
+        depth: int,
+        metadata_filter: dict[str, Any],
+        max_nodes: int | None,
+        time_budget: float | None,
+    ) -> list[Node]:
+        state = _TraversalState(
+            depth=depth, max_nodes=max_nodes, time_budget=time_budget
+        )
+        with self._lock:
+            allowed = self._filter_rows(metadata_filter)
+            nodes = [
+                _TraversalNode(self._ids[row], self._link_to_tags[row])
+                for row in self._search_rows(query_embedding, k, allowed)
+            ]
+
+            d = 0
+            while nodes:
+                outgoing_tags = state.visit(d, nodes)
+                if not outgoing_tags or state.exhausted():
+                    break
+
+                # The targets of the outgoing tags, in the order of the tags.
+                targets = [
+                    row
+                    for tag in sorted(outgoing_tags)
+                    for row in sorted(self._tag_index.get(tag, ()))
+                    if allowed is None or row in allowed
+                ]
+                new_ids = state.new_ids(self._ids[row] for row in targets)
+                if state.exhausted():
+                    break
+                nodes = [
+                    _TraversalNode(node_id, self._link_to_tags[self._rows[node_id]])
+                    for node_id in new_ids
+                ]
+                d += 1
+
+            return self._nodes_with_ids(state.visited_ids.keys())
+
+    def traversal_search(
+        self,
+        query: str,
+        *,
+        k: int = 4,
+        depth: int = 1,
+        metadata_filter: dict[str, Any] = {},  # noqa: B006
+        max_nodes: int | None = None,
+        time_budget: float | None = None,
+    ) -> Iterable[Node]:
+        """Retrieve documents from this knowledge store.
+
+        First, `k` nodes are retrieved using a vector search for the `query` string.
+        Then, additional nodes are discovered up to the given `depth` from those
+        starting nodes.
+
+        Args:
+            query: The query string.
+            k: The number of Documents to return from the initial vector search.
+                Defaults to 4.
+            depth: The maximum depth of edges to traverse. Defaults to 1.
+            metadata_filter: Optional metadata to filter the results.
+            max_nodes: Optional maximum number of nodes to retrieve. The traversal
+                stops once reached.
+            time_budget: Optional time (in seconds) after which the traversal
+                stops, returning the nodes visited so far.
+
+        Returns:
+            Collection of retrieved documents.
+        """
+        return self._traversal(
+            self._embedding.embed_query(query),
+            k=k,
+            depth=depth,
+            metadata_filter=metadata_filter,
+            max_nodes=max_nodes,
+            time_budget=time_budget,
+        )
+
+    async def atraversal_search(
+        self,
+        query: str,
+        *,
+        k: int = 4,
+        depth: int = 1,
+        metadata_filter: dict[str, Any] = {},  # noqa: B006
+        max_nodes: int | None = None,
+        time_budget: float | None = None,
+    ) -> Iterable[Node]:
+        """Retrieve documents from this knowledge store.
+
+        Async version of `traversal_search`.
+        """
+        return self._traversal(
+            await self._embedding.aembed_query(query),
+            k=k,
+            depth=depth,
+            metadata_filter=metadata_filter,
+            max_nodes=max_nodes,
+            time_budget=time_budget,
+        )
+
+    def _get_adjacent(
+        self,
+        tags: Iterable[_Tag],
+        query_embedding: list[float],
+        k_per_tag: int,
+        limit: int | None,
+        allowed: set[int] | None,
+    ) -> list[_Edge]:
+        """Return the target nodes with incoming links from any of the given tags.
+
+        Like the adjacency queries of `GraphStore`, this keeps the `k_per_tag`
+        targets of each tag most similar to the query, then the `limit` most
+        similar across the tags.
+        """
+        edge_lists = []
+        for tag in sorted(tags):
+            targets = self._tag_index.get(tag, set())
+            if allowed is not None:
+                targets = targets & allowed
+            rows = self._search_rows(query_embedding, k_per_tag, targets)
+            edge_lists.append(
+                [
+                    _Edge(
+                        target_content_id=self._ids[row],
+                        target_text_embedding=self._embeddings[row].tolist(),
+                        target_link_to_tags=set(self._link_to_tags[row]),
+                    )
+                    for row in rows
+                ]
+            )
+        edges = list(_merge_edges(edge_lists))
+        if limit is None or len(edges) <= limit:
+            return edges
+        # Stable, so that ties keep the order of the tags.
+        similarity = self._similarities(
+            np.asarray(query_embedding, dtype=np.float32),
+            np.array([self._rows[edge.target_content_id] for edge in edges]),
+        )
+        order = np.argsort(-similarity, kind="stable")[:limit]
+        return [edges[i] for i in order]
+
+    def _mmr_traversal(
+        self,
+        query_embedding: list[float],
+        *,
+        initial_roots: Sequence[str],
+        k: int,
+        depth: int,
+        fetch_k: int,
+        adjacent_k: int,
+        adjacent_limit: int | None,
+        lambda_mult: float,
+        score_threshold: float,
+        metadata_filter: dict[str, Any],
+        min_adjacent_similarity: float | None,
+    ) -> list[Node]:
+        if self._normalize_embeddings:
+            query_embedding = normalize_rows(
+                np.asarray([query_embedding], dtype=np.float32)
+            )[0].tolist()
+        helper = MmrHelper(
+            k=k,
+            query_embedding=query_embedding,
+            lambda_mult=lambda_mult,
+            score_threshold=score_threshold,
+            normalized=self._normalize_embeddings,
+            dtype=np.float16 if self._mmr_float16 else np.float32,
+        )
+        allowed = self._filter_rows(metadata_filter)
+
+        # For each unselected node, stores the outgoing tags.
+        outgoing_tags: dict[str, set[_Tag]] = {}
+        # Tags whose adjacent nodes have already been incorporated into the
+        # candidates.
+        visited_tags: set[_Tag] = set()
+        # Tracks the depth of each candidate.
+        depths: dict[str, int] = {}
+
+        def add_adjacent(tags: set[_Tag], next_depth: int) -> None:
+            adjacents = self._get_adjacent(
+                tags,
+                query_embedding=query_embedding,
+                k_per_tag=adjacent_k,
+                limit=adjacent_limit,
+                allowed=allowed,
+            )
+            visited_tags.update(tags)
+
+            new_candidates = {}
+            for adjacent in adjacents:
+                if adjacent.target_content_id not in outgoing_tags:
+                    outgoing_tags[adjacent.target_content_id] = set(
+                        adjacent.target_link_to_tags
+                    )
+                    new_candidates[adjacent.target_content_id] = (
+                        adjacent.target_text_embedding
+                    )
+                    if next_depth < depths.get(adjacent.target_content_id, depth + 1):
+                        depths[adjacent.target_content_id] = next_depth
+            helper.add_candidates(new_candidates)
+
+        if initial_roots:
+            # The neighborhood isn't added to the candidates.
+            outgoing_tags.update({content_id: set() for content_id in initial_roots})
+            neighborhood_tags = {
+                tag
+                for content_id in initial_roots
+                if (row := self._rows.get(content_id)) is not None
+                for tag in self._link_to_tags[row]
+            }
+            visited_tags.update(neighborhood_tags)
+            add_adjacent(neighborhood_tags, 0)
+        if fetch_k > 0:
+            candidates = {}
+            for row in self._search_rows(query_embedding, fetch_k, allowed):
+                content_id = self._ids[row]
+                if content_id not in outgoing_tags:
+                    candidates[content_id] = self._embeddings[row].tolist()
+                    outgoing_tags[content_id] = set(self._link_to_tags[row])
+                    depths[content_id] = 0
+            helper.add_candidates(candidates)
+
+        def fetch_adjacent(selected_id: str) -> None:
+            # Don't re-visit already visited tags.
+            link_to_tags = outgoing_tags.pop(selected_id) - visited_tags
+            add_adjacent(link_to_tags, depths[selected_id] + 1)
+
+        if min_adjacent_similarity is None:
+            for _ in range(k):
+                selected_id = helper.pop_best()
+                if selected_id is None:
+                    break
+                # The adjacent nodes of the last selected node can't be selected.
+                if depths[selected_id] + 1 < depth and len(helper.selected_ids) < k:
+                    fetch_adjacent(selected_id)
+            return self._nodes_with_ids(helper.selected_ids)
+
+        # Selected nodes whose adjacent nodes haven't been fetched yet, by
+        # decreasing upper bound of the score of their adjacent nodes.
+        pending: list[tuple[float, int, str]] = []
+        while len(helper.selected_ids) < k:
+            while pending and -pending[0][0] >= helper.best_score:
+                fetch_adjacent(heapq.heappop(pending)[2])
+            selected_id = helper.pop_best()
+            if selected_id is None:
+                break
+            if depths[selected_id] + 1 < depth:
+                bound = helper.adjacent_score_bound(
+                    helper.selected_similarities[-1], min_adjacent_similarity
+                )
+                heapq.heappush(pending, (-bound, len(helper.selected_ids), selected_id))
+        return self._nodes_with_ids(helper.selected_ids)
+
+    def mmr_traversal_search(
+        self,
+        query: str,
+        *,
+        initial_roots: Sequence[str] = (),
+        k: int = 4,
+        depth: int = 2,
+        fetch_k: int = 100,
+        adjacent_k: int = 10,
+        adjacent_limit: int | None = None,
+        lambda_mult: float = 0.5,
+        score_threshold: float = float("-inf"),
+        metadata_filter: dict[str, Any] = {},  # noqa: B006
+        min_adjacent_similarity: float | None = None,
+    ) -> Iterable[Node]:
+        """Retrieve documents from this graph store using MMR-traversal.
+
+        See `GraphStore.mmr_traversal_search` for the algorithm and arguments.
+        """
+        with self._lock:
+            return self._mmr_traversal(
+                self._embedding.embed_query(query),
+                initial_roots=initial_roots,
+                k=k,
+                depth=depth,
+                fetch_k=fetch_k,
+                adjacent_k=adjacent_k,
+                adjacent_limit=adjacent_limit,
+                lambda_mult=lambda_mult,
+                score_threshold=score_threshold,
+                metadata_filter=metadata_filter,
+                min_adjacent_similarity=min_adjacent_similarity,
+            )
+
+    async def ammr_traversal_search(
+        self,
+        query: str,
+        *,
+        initial_roots: Sequence[str] = (),
+        k: int = 4,
+        depth: int = 2,
+        fetch_k: int = 100,
+        adjacent_k: int = 10,
+        adjacent_limit: int | None = None,
+        lambda_mult: float = 0.5,
+        score_threshold: float = float("-inf"),
+        metadata_filter: dict[str, Any] = {},  # noqa: B006
+        min_adjacent_similarity: float | None = None,
+    ) -> Iterable[Node]:
+        """Retrieve documents from this graph store using MMR-traversal.
+
+        Async version of `mmr_traversal_search`.
+        """
+        query_embedding = await self._embedding.aembed_query(query)
+        with self._lock:
+            return self._mmr_traversal(
+                query_embedding,
+                initial_roots=initial_roots,
+                k=k,
+                depth=depth,
+                fetch_k=fetch_k,
+                adjacent_k=adjacent_k,
+                adjacent_limit=adjacent_limit,
+                lambda_mult=lambda_mult,
+                score_threshold=score_threshold,
+                metadata_filter=metadata_filter,
+                min_adjacent_similarity=min_adjacent_similarity,
+            )
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Save the store to a directory.
+
+        The embeddings are saved as NumPy arrays, which `load` memory-maps, and
+        the other columns as JSON lines. Each save writes them to a new data
+        directory, then atomically replaces the store file naming it, so a load
+        reads a complete version even if a save is interrupted or runs
+        concurrently. The previous version is removed by the next save.
+
+        Args:
+            path: The directory, created if needed.
+        """
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data_directory = Path(
+                tempfile.mkdtemp(dir=directory, prefix=_DATA_DIRECTORY_PREFIX)
+            )
+            try:
+                self._save_columns(data_directory)
+            except BaseException:
+                shutil.rmtree(data_directory, ignore_errors=True)
+                raise
+
+            store_path = directory / _STORE_FILE
+            previous = (
+                json.loads(store_path.read_text()).get("data")
+                if store_path.exists()
+                else None
+            )
+            store = {
+                "version": _FORMAT_VERSION,
+                "data": data_directory.name,
+                "size": len(self),
+                "normalize_embeddings": self._normalize_embeddings,
+            }
+            _replace_file(
+                store_path, lambda file: file.write(json.dumps(store).encode())
+            )
+
+        # Keep the previous version for the loads that already read the store
+        # file. (The memory-mapped files of a loaded store remain valid.)
+        for old in directory.glob(f"{_DATA_DIRECTORY_PREFIX}*"):
+            if old.name not in (data_directory.name, previous):
+                shutil.rmtree(old, ignore_errors=True)
+
+    def _save_columns(self, data_directory: Path) -> None:
+        size = len(self)
+        arrays: dict[str, NDArray[Any]] = {
+            _EMBEDDINGS_FILE: self._embeddings[:size],
+            _NORMS_FILE: self._norms[:size],
+        }
+        if self._centroids is not None:
+            arrays[_CENTROIDS_FILE] = self._centroids
+            arrays[_ASSIGNMENTS_FILE] = self._assignments[:size]
+        for name, array in arrays.items():
+            _write_file(data_directory / name, functools.partial(np.save, arr=array))
+
+        def write_nodes(file: IO[bytes]) -> None:
+            for row in range(size):
+                columns = [
+                    self._ids[row],
+                    self._texts[row],
+                    self._links_blobs[row],
+                    self._metadata_blobs[row],
+                ]
+                file.write(json.dumps(columns).encode() + b"\n")
+
+        _write_file(data_directory / _NODES_FILE, write_nodes)
+
+    @classmethod
+    def load(
+        cls,
+        path: str | os.PathLike[str],
+        embedding: EmbeddingModel,
+        **kwargs: Any,
+    ) -> InMemoryGraphStore:
+        """Load a store saved to a directory.
+
+        The embeddings are memory-mapped (copy-on-write), so they are read from
+        disk as they are used, and the nodes added or replaced afterwards stay in
+        memory until saved.
+
+        Args:
+            path: The directory the store was saved to.
+            embedding: The embeddings to use for the document content.
+            **kwargs: The other arguments of the store. `normalize_embeddings`
+                must be the same as when saved. The saved IVF index is used if
+                it has `ivf_lists` lists.
+
+        Returns:
+            The loaded store.
+        """
+        directory = Path(path)
+        store = json.loads((directory / _STORE_FILE).read_text())
+        if store["version"] != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported store format version {store['version']}")
+        graph_store = cls(embedding, **kwargs)
+        cls._load_columns(graph_store, directory / store["data"], store)
+        return graph_store
+
+    def _load_columns(self, directory: Path, store: dict[str, Any]) -> None:
+        if self._normalize_embeddings != store["normalize_embeddings"]:
+            raise ValueError(
+                "normalize_embeddings must be the same as when the store was saved"
+            )
+        size = store["size"]
+        with (directory / _NODES_FILE).open("rb") as file:
+            for line in file:
+                node_id, text, links_blob, metadata_blob = json.loads(line)
+                row = self._append_row(node_id)
+                self._set_row(
+                    row,
+                    text=text,
+                    links_blob=links_blob,
+                    metadata_blob=metadata_blob,
+                    links=_deserialize_links(links_blob, self._codec),
+                    metadata=_deserialize_metadata(metadata_blob, self._codec),
+                )
+        if size == 0:
+            return
+
+        self._embeddings = np.load(directory / _EMBEDDINGS_FILE, mmap_mode="c")
+        self._norms = np.load(directory / _NORMS_FILE)
+        self._assignments = np.zeros(size, dtype=np.int32)
+        centroids_path = directory / _CENTROIDS_FILE
+        if self._ivf_lists and centroids_path.exists():
+            centroids = np.load(centroids_path)
+            if len(centroids) == self._ivf_lists:
+                self._centroids = centroids
+                self._assignments = np.load(directory / _ASSIGNMENTS_FILE)
+        if (
+            self._centroids is None
+            and self._ivf_lists
+            and size >= self._ivf_lists * _IVF_MIN_ROWS_PER_LIST
+        ):
+            self.train_index()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .concurrency import map_fail_fast
+from .graph_store import token_ranges
+
+if TYPE_CHECKING:
+    import os
+
+    from .graph_store import GraphStore, Node
+    from .memory_store import InMemoryGraphStore
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingMigration:
+    """Job re-embedding the nodes of a graph store into another graph store.
+
+    This migrates a store to a new embedding model (possibly with a different
+    dimension) without downtime: the nodes of `source` are copied to `target`,
+    their text being embedded by the embedding model of `target`, while
+    `source` keeps serving queries. Once done, the application switches to
+    `target`. Nodes added during the migration should be added to both stores.
+
+    The token ring of the source node table is split into ranges, scanned in
+    parallel. The nodes of each range are re-embedded and written a batch at a
+    time, and the progress of each range is checkpointed after each batch. If
+    the job is interrupted, running it again resumes from the checkpoint. The
+    nodes are upserted, so a batch written but not checkpointed is just written
+    again.
+
+    Args:
+        source: The graph store whose nodes are migrated.
+        target: The graph store the nodes are written to. It must use a different
+            node table.
+        checkpoint_path: Optional path of the JSON file recording the progress.
+            If not set, the job can't be resumed.
+        splits: Number of token ranges the node table is split into. Defaults to
+            64.
+        max_concurrent_splits: Maximum number of token ranges migrated at once.
+            Defaults to 4.
+        batch_size: Number of nodes embedded and written at once. Defaults to
+            256.
+        fetch_size: Number of rows fetched per page when scanning the source.
+            Defaults to 1000.
+    """
+
+    def __init__(
+        self,
+        source: GraphStore | InMemoryGraphStore,
+        target: GraphStore | InMemoryGraphStore,
+        *,
+        checkpoint_path: str | os.PathLike[str] | None = None,
+        splits: int = 64,
+        max_concurrent_splits: int = 4,
+        batch_size: int = 256,
+        fetch_size: int = 1000,
+    ) -> None:
+        if source.table_name() == target.table_name():
+            raise ValueError("The source and target must use different node tables")
+        if max_concurrent_splits < 1:
+            raise ValueError("max_concurrent_splits must be at least 1")
+        self._source = source
+        self._target = target
+        self._checkpoint_path = (
+            Path(checkpoint_path) if checkpoint_path is not None else None
+        )
+        self._ranges = token_ranges(splits)
+        self._max_concurrent_splits = max_concurrent_splits
+        self._batch_size = batch_size
+        self._fetch_size = fetch_size
+        self._lock = threading.Lock()
+        # Map from the index of a token range to the token of its last migrated
+        # node (the end of the range once completed).
+        self._progress: dict[int, int] = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> dict[int, int]:
+        if self._checkpoint_path is None or not self._checkpoint_path.exists():
+            return {}
+        checkpoint = json.loads(self._checkpoint_path.read_text())
+        if checkpoint["splits"] != len(self._ranges):
+            raise ValueError(
+                f"The checkpoint has {checkpoint['splits']} splits, "
+                f"but the migration has {len(self._ranges)}"
+            )
+        return {int(index): token for index, token in checkpoint["progress"].items()}
+
+    def _save_checkpoint(self, index: int, token: int) -> None:
+        with self._lock:
+            self._progress[index] = token
+            if self._checkpoint_path is None:
+                return
+            checkpoint = {"splits": len(self._ranges), "progress": self._progress}
+            # Replacing the file makes the update atomic.
+            temp_path = self._checkpoint_path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(checkpoint))
+            temp_path.replace(self._checkpoint_path)
+
+    def is_complete(self) -> bool:
+        """Whether all the token ranges have been migrated."""
+        return all(
+            self._progress.get(index) == end
+            for index, (_, end) in enumerate(self._ranges)
+        )
+
+    def _migrate_range(self, index: int) -> int:
+        start, end = self._ranges[index]
+        start = self._progress.get(index, start)
+        if start == end:
+            return 0
+
+        count = 0
+        batch: list[Node] = []
+        token = start
+
+        def write_batch() -> None:
+            self._target.add_nodes(batch, batch_size=len(batch), return_ids=False)
+            self._save_checkpoint(index, token)
+            batch.clear()
+
+        for page in self._source.scan_token_range(
+            start, end, to_nodes=True, fetch_size=self._fetch_size
+        ):
+            for row, node in zip(page.rows, page.nodes):
+                batch.append(node)
+                token = row.token
+                count += 1
+                if len(batch) >= self._batch_size:
+                    write_batch()
+        if batch:
+            write_batch()
+        self._save_checkpoint(index, end)
+        logger.debug("Migrated token range %d (%d nodes)", index, count)
+        return count
+
+    def run(self) -> int:
+        """Run the migration (or resume it from the checkpoint).
+
+        Returns:
+            The number of nodes migrated by this run.
+        """
+        return sum(
+            map_fail_fast(
+                self._migrate_range,
+                range(len(self._ranges)),
+                max_workers=self._max_concurrent_splits,
+            )
+        )
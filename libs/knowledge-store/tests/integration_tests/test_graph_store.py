@@ -1,17 +1,38 @@
 from __future__ import annotations
 
+import asyncio
 import math
 import secrets
-from typing import Callable, Iterable, Iterator
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Sequence,
+)
 
 import numpy as np
 import pytest
 from dotenv import load_dotenv
-from ragstack_knowledge_store import EmbeddingModel
-from ragstack_knowledge_store.graph_store import GraphStore, MetadataIndexingType, Node
+from ragstack_knowledge_store import EmbeddingMigration, EmbeddingModel, concurrency
+from ragstack_knowledge_store.graph_store import (
+    ADJACENT_COLUMNS,
+    BatchProgress,
+    GraphStore,
+    MetadataIndexingType,
+    Node,
+    SetupMode,
+    token_ranges,
+)
 from ragstack_knowledge_store.links import Link
 from ragstack_tests_utils import LocalCassandraTestStore
 
+if TYPE_CHECKING:
+    from pathlib import Path
+
 load_dotenv()
 
 KEYSPACE = "default_keyspace"
@@ -81,6 +102,15 @@ class SimpleEmbeddingModel(EmbeddingModel):
         return self.embed_query(text=text)
 
 
+class FailingEmbeddingModel(SimpleEmbeddingModel):
+    """Fails to embed the text "fail"."""
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        if "fail" in texts:
+            raise ValueError("embedding failed")
+        return super().embed_texts(texts)
+
+
 @pytest.fixture(scope="session")
 def cassandra() -> Iterator[LocalCassandraTestStore]:
     store = LocalCassandraTestStore()
@@ -101,16 +131,17 @@ def graph_store_factory(
 
     def _make_graph_store(
         metadata_indexing: MetadataIndexingType = "all",
+        **kwargs: Any,
     ) -> GraphStore:
         name = secrets.token_hex(8)
 
-        node_table = f"nodes_{name}"
+        kwargs.setdefault("node_table", f"nodes_{name}")
         return GraphStore(
             embedding,
             session=session,
             keyspace=KEYSPACE,
-            node_table=node_table,
             metadata_indexing=metadata_indexing,
+            **kwargs,
         )
 
     yield _make_graph_store
@@ -212,6 +243,133 @@ def test_mmr_traversal(
     assert _result_ids(results) == ["v1", "v3", "v2"]
 
 
+def test_mmr_traversal_adjacent_queries(
+    graph_store_factory: Callable[[MetadataIndexingType], GraphStore],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    gs = graph_store_factory("all")
+    gs.add_nodes(
+        Node(
+            id=f"c{i}",
+            text=f"0.{i}",
+            links={
+                Link.incoming(kind="next", tag=f"c{i}"),
+                Link.outgoing(kind="next", tag=f"c{i + 1}"),
+            },
+        )
+        for i in range(5)
+    )
+
+    get_adjacent = gs._get_adjacent  # noqa: SLF001
+    calls: list[set[tuple[str, str]]] = []
+
+    def counting_get_adjacent(tags: set[tuple[str, str]], **kwargs: Any) -> Any:
+        calls.append(set(tags))
+        return get_adjacent(tags, **kwargs)
+
+    monkeypatch.setattr(gs, "_get_adjacent", counting_get_adjacent)
+
+    # The adjacent nodes of the last selected node aren't fetched.
+    results = gs.mmr_traversal_search("0.0", k=3, fetch_k=1, depth=10)
+    assert _result_ids(results) == ["c0", "c1", "c2"]
+    assert calls == [{("next", "c1")}, {("next", "c2")}]
+
+
+async def test_mmr_traversal_pruned_adjacent_queries(
+    graph_store_factory: Callable[[MetadataIndexingType], GraphStore],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Each node links to a near-duplicate of itself, further from the query.
+    gs = graph_store_factory("all")
+    gs.add_nodes(
+        node
+        for i, angle in enumerate([0.0, 0.4, -0.4])
+        for node in [
+            Node(
+                id=f"r{i}",
+                text=str(angle),
+                links={Link.outgoing(kind="dup", tag=f"r{i}")},
+            ),
+            Node(
+                id=f"d{i}",
+                text=str(angle + math.copysign(0.03, angle)),
+                links={Link.incoming(kind="dup", tag=f"r{i}")},
+            ),
+        ]
+    )
+
+    get_adjacent = gs._get_adjacent  # noqa: SLF001
+    aget_adjacent = gs._aget_adjacent  # noqa: SLF001
+    calls: list[set[tuple[str, str]]] = []
+
+    def counting_get_adjacent(tags: set[tuple[str, str]], **kwargs: Any) -> Any:
+        calls.append(set(tags))
+        return get_adjacent(tags, **kwargs)
+
+    async def acounting_get_adjacent(tags: set[tuple[str, str]], **kwargs: Any) -> Any:
+        calls.append(set(tags))
+        return await aget_adjacent(tags, **kwargs)
+
+    monkeypatch.setattr(gs, "_get_adjacent", counting_get_adjacent)
+    monkeypatch.setattr(gs, "_aget_adjacent", acounting_get_adjacent)
+    kwargs: dict[str, Any] = {"k": 3, "fetch_k": 4, "lambda_mult": 0.25}
+
+    results = gs.mmr_traversal_search("0.0", **kwargs)
+    assert _result_ids(results) == ["r0", "r1", "r2"]
+    assert len(calls) == 2  # noqa: PLR2004
+
+    # The near-duplicates can't beat the other candidates, so they aren't fetched.
+    kwargs["min_adjacent_similarity"] = math.cos(0.03 * math.pi)
+    calls.clear()
+    results = gs.mmr_traversal_search("0.0", **kwargs)
+    assert _result_ids(results) == ["r0", "r1", "r2"]
+    assert calls == []
+
+    results = await gs.ammr_traversal_search("0.0", **kwargs)
+    assert _result_ids(results) == ["r0", "r1", "r2"]
+    assert calls == []
+
+    # They are fetched once the other candidates are selected.
+    kwargs["k"] = 4
+    results = gs.mmr_traversal_search("0.0", **kwargs)
+    assert _result_ids(results) == ["r0", "r1", "r2", "d1"]
+
+
+def test_mmr_traversal_adjacent_limit(
+    graph_store_factory: Callable[[MetadataIndexingType], GraphStore],
+) -> None:
+    v0 = Node(
+        id="v0",
+        text="-0.124",
+        links={
+            Link(direction="out", kind="explicit", tag="a"),
+            Link(direction="out", kind="explicit", tag="b"),
+        },
+    )
+    v2 = Node(
+        id="v2",
+        text="+0.25",
+        links={Link(direction="in", kind="explicit", tag="a")},
+    )
+    v3 = Node(
+        id="v3",
+        text="+1.0",
+        links={Link(direction="in", kind="explicit", tag="b")},
+    )
+
+    gs = graph_store_factory("all")
+    gs.add_nodes([v0, v2, v3])
+
+    results = gs.mmr_traversal_search("0.0", fetch_k=0, k=4, initial_roots=["v0"])
+    assert _result_ids(results) == ["v2", "v3"]
+
+    # Only the adjacent node most similar to the query is kept.
+    results = gs.mmr_traversal_search(
+        "0.0", fetch_k=0, k=4, initial_roots=["v0"], adjacent_limit=1
+    )
+    assert _result_ids(results) == ["v2"]
+
+
 def test_write_retrieve_keywords(
     graph_store_factory: Callable[[MetadataIndexingType], GraphStore],
 ) -> None:
@@ -283,6 +441,44 @@ def test_write_retrieve_keywords(
     assert set(_result_ids(results)) == {"doc2", "doc1", "greetings"}
 
 
+def _chain_nodes() -> list[Node]:
+    # c0 -> c1 -> c2 -> c3 -> c4
+    return [
+        Node(
+            id=f"c{i}",
+            text=f"0.{i}",
+            links={
+                Link.incoming(kind="next", tag=f"c{i}"),
+                Link.outgoing(kind="next", tag=f"c{i + 1}"),
+            },
+        )
+        for i in range(5)
+    ]
+
+
+async def test_traversal_search_budgets(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    gs = graph_store_factory("all")
+    gs.add_nodes(_chain_nodes())
+
+    results = gs.traversal_search("0.0", k=1, depth=4)
+    assert _result_ids(results) == ["c0", "c1", "c2", "c3", "c4"]
+
+    results = gs.traversal_search("0.0", k=1, depth=4, max_nodes=3)
+    assert _result_ids(results) == ["c0", "c1", "c2"]
+
+    results = await gs.atraversal_search("0.0", k=1, depth=4, max_nodes=3)
+    assert _result_ids(results) == ["c0", "c1", "c2"]
+
+    # Only the initial nodes are visited before the budget is exhausted.
+    results = gs.traversal_search("0.0", k=1, depth=4, time_budget=0)
+    assert _result_ids(results) == ["c0"]
+
+    results = await gs.atraversal_search("0.0", k=1, depth=4, time_budget=0)
+    assert _result_ids(results) == ["c0"]
+
+
 def test_metadata(
     graph_store_factory: Callable[[MetadataIndexingType], GraphStore],
 ) -> None:
@@ -310,6 +506,82 @@ def test_metadata(
     }
 
 
+def test_setup_mode_async(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    gs = graph_store_factory("all", setup_mode=SetupMode.ASYNC)
+    gs.add_nodes([Node(id="a", text="A"), Node(id="b", text="B")])
+    results = gs.similarity_search(text_to_embedding("A"), k=1)
+    assert _result_ids(results) == ["a"]
+
+
+async def test_setup_mode_async_async_api(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    gs = graph_store_factory("all", setup_mode=SetupMode.ASYNC)
+    await gs.aadd_nodes([Node(id="a", text="A"), Node(id="b", text="B")])
+    node = await gs.aget_node("b")
+    assert node.text == "B"
+
+
+def test_metadata_search_pages(
+    graph_store_factory: Callable[[MetadataIndexingType], GraphStore],
+) -> None:
+    gs = graph_store_factory("all")
+    gs.add_nodes(
+        Node(id=f"n{i}", text=f"0.{i}", metadata={"even": i % 2 == 0})
+        for i in range(10)
+    )
+
+    pages = list(gs.metadata_search_pages({"even": True}, fetch_size=2))
+    assert [len(page.nodes) for page in pages] == [2, 2, 1]
+    assert pages[-1].paging_state is None
+    ids = _result_ids(node for page in pages for node in page.nodes)
+    assert sorted(ids) == ["n0", "n2", "n4", "n6", "n8"]
+
+    # Resume after the first page.
+    resumed = gs.metadata_search_pages(
+        {"even": True}, fetch_size=2, paging_state=pages[0].paging_state
+    )
+    assert [node.id for page in resumed for node in page.nodes] == ids[2:]
+
+    results = gs.metadata_search({"even": True}, n=10, fetch_size=2)
+    assert sorted(_result_ids(results)) == sorted(ids)
+
+
+async def test_ametadata_search_pages(
+    graph_store_factory: Callable[[MetadataIndexingType], GraphStore],
+) -> None:
+    gs = graph_store_factory("all")
+    await gs.aadd_nodes(
+        Node(id=f"n{i}", text=f"0.{i}", metadata={"even": i % 2 == 0})
+        for i in range(10)
+    )
+
+    pages = [
+        page async for page in gs.ametadata_search_pages({"even": True}, fetch_size=2)
+    ]
+    assert [len(page.nodes) for page in pages] == [2, 2, 1]
+    ids = [node.id for page in pages for node in page.nodes]
+
+    resumed = [
+        node.id
+        async for page in gs.ametadata_search_pages(
+            {"even": True}, fetch_size=2, paging_state=pages[0].paging_state
+        )
+        for node in page.nodes
+    ]
+    assert resumed == ids[2:]
+
+    results = [
+        node.id
+        async for node in gs.asimilarity_search(
+            angle_to_embedding(0.0), k=3, fetch_size=2
+        )
+    ]
+    assert results == ["n0", "n1", "n2"]
+
+
 def test_graph_store_metadata(
     graph_store_factory: Callable[[MetadataIndexingType], GraphStore],
 ) -> None:
@@ -397,3 +669,449 @@ def test_graph_store_metadata_routing(
         list(gs_deny.metadata_search(metadata={"mdds": "MDDS"}))
     gotten_deny = list(gs_deny.metadata_search(metadata={"mdas": "MDAS"}))[0]  # noqa: RUF015
     assert gotten_deny.metadata == test_md_allowdeny
+
+
+async def test_async_api(
+    graph_store_factory: Callable[[MetadataIndexingType], GraphStore],
+) -> None:
+    v0 = Node(
+        id="v0",
+        text="-0.124",
+        links={Link(direction="out", kind="explicit", tag="link")},
+        metadata={"even": True},
+    )
+    v1 = Node(id="v1", text="+0.127", metadata={"even": False})
+    v2 = Node(
+        id="v2",
+        text="+0.25",
+        links={Link(direction="in", kind="explicit", tag="link")},
+        metadata={"even": True},
+    )
+    v3 = Node(
+        id="v3",
+        text="+1.0",
+        links={Link(direction="in", kind="explicit", tag="link")},
+        metadata={"even": False},
+    )
+
+    gs = graph_store_factory("all")
+    assert list(await gs.aadd_nodes([v0, v1, v2, v3])) == ["v0", "v1", "v2", "v3"]
+
+    assert await gs.aget_node("v2") == v2
+    with pytest.raises(ValueError, match="No node with ID 'v4'"):
+        await gs.aget_node("v4")
+
+    results = await gs.ammr_traversal_search("0.0", k=2, fetch_k=2)
+    assert _result_ids(results) == ["v0", "v2"]
+
+    results = await gs.ammr_traversal_search("0.0", k=2, fetch_k=2, depth=0)
+    assert _result_ids(results) == ["v0", "v1"]
+
+    results = await gs.ammr_traversal_search("0.0", k=4)
+    assert _result_ids(results) == ["v0", "v2", "v1", "v3"]
+
+    results = await gs.ammr_traversal_search(
+        "0.0", fetch_k=0, k=4, initial_roots=["v0"]
+    )
+    assert _result_ids(results) == ["v2", "v3"]
+
+    results = await gs.atraversal_search("0.0", k=1, depth=0)
+    assert _result_ids(results) == ["v0"]
+
+    results = await gs.atraversal_search("0.0", k=1, depth=1)
+    assert set(_result_ids(results)) == {"v0", "v2", "v3"}
+
+    results = await gs.atraversal_search(
+        "0.0", k=1, depth=1, metadata_filter={"even": True}
+    )
+    assert _result_ids(results) == ["v0", "v2"]
+
+    results = [n async for n in gs.asimilarity_search(angle_to_embedding(0.25), k=1)]
+    assert _result_ids(results) == ["v2"]
+
+    results = [n async for n in gs.ametadata_search(metadata={"even": False})]
+    assert sorted(_result_ids(results)) == ["v1", "v3"]
+
+
+def test_mmr_traversal_adjacency_cache(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    v0 = Node(
+        id="v0",
+        text="-0.124",
+        links={Link(direction="out", kind="explicit", tag="link")},
+    )
+    v1 = Node(id="v1", text="+0.127")
+    v2 = Node(
+        id="v2",
+        text="+0.25",
+        links={Link(direction="in", kind="explicit", tag="link")},
+    )
+
+    gs = graph_store_factory("all", adjacency_cache_size=100)
+    gs.add_nodes([v0, v1, v2])
+
+    results = gs.mmr_traversal_search("0.0", k=3, fetch_k=1)
+    assert _result_ids(results) == ["v0", "v2"]
+    assert gs._adjacency_cache is not None  # noqa: SLF001
+    assert len(gs._adjacency_cache) == 1  # noqa: SLF001
+
+    # Served from the cache.
+    results = gs.mmr_traversal_search("0.0", k=3, fetch_k=1)
+    assert _result_ids(results) == ["v0", "v2"]
+    assert gs._adjacency_cache.hits == 1  # noqa: SLF001
+
+    # Adding a node linked from the tag invalidates the cached adjacency.
+    v3 = Node(
+        id="v3",
+        text="+1.0",
+        links={Link(direction="in", kind="explicit", tag="link")},
+    )
+    gs.add_nodes([v3])
+    assert len(gs._adjacency_cache) == 0  # noqa: SLF001
+    results = gs.mmr_traversal_search("0.0", k=3, fetch_k=1)
+    assert _result_ids(results) == ["v0", "v2", "v3"]
+
+
+def _edge_test_nodes() -> list[Node]:
+    return [
+        Node(
+            id="v0",
+            text="-0.124",
+            links={Link(direction="out", kind="explicit", tag="link")},
+            metadata={"even": True},
+        ),
+        Node(id="v1", text="+0.127", metadata={"even": False}),
+        Node(
+            id="v2",
+            text="+0.25",
+            links={Link(direction="in", kind="explicit", tag="link")},
+            metadata={"even": True},
+        ),
+        Node(
+            id="v3",
+            text="+1.0",
+            links={Link(direction="in", kind="explicit", tag="link")},
+            metadata={"even": False},
+        ),
+    ]
+
+
+def _check_edge_table_traversals(gs: GraphStore) -> None:
+    results = gs.mmr_traversal_search("0.0", k=4)
+    assert _result_ids(results) == ["v0", "v2", "v1", "v3"]
+
+    results = gs.mmr_traversal_search("0.0", k=4, metadata_filter={"even": True})
+    assert _result_ids(results) == ["v0", "v2"]
+
+    results = gs.mmr_traversal_search("0.0", fetch_k=0, k=4, initial_roots=["v0"])
+    assert _result_ids(results) == ["v2", "v3"]
+
+    results = gs.traversal_search("0.0", k=1, depth=1)
+    assert set(_result_ids(results)) == {"v0", "v2", "v3"}
+
+    results = gs.traversal_search("0.0", k=1, depth=1, metadata_filter={"even": True})
+    assert _result_ids(results) == ["v0", "v2"]
+
+
+def test_edge_table_adjacency_cache(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    gs = graph_store_factory(
+        "all",
+        edge_table=f"edges_{secrets.token_hex(8)}",
+        adjacency_cache_size=100,
+    )
+    gs.add_nodes(_edge_test_nodes())
+
+    results = gs.mmr_traversal_search(
+        "0.0", fetch_k=0, k=1, adjacent_k=1, initial_roots=["v0"]
+    )
+    assert _result_ids(results) == ["v2"]
+    assert gs._adjacency_cache is not None  # noqa: SLF001
+    assert len(gs._adjacency_cache) == 1  # noqa: SLF001
+
+    # The targets of the tag are cached for all the queries, and ranked for each.
+    results = gs.mmr_traversal_search(
+        "1.0", fetch_k=0, k=1, adjacent_k=1, initial_roots=["v0"]
+    )
+    assert _result_ids(results) == ["v3"]
+    assert gs._adjacency_cache.hits == 1  # noqa: SLF001
+    assert len(gs._adjacency_cache) == 1  # noqa: SLF001
+
+
+async def test_edge_table(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    gs = graph_store_factory("all", edge_table=f"edges_{secrets.token_hex(8)}")
+    await gs.aadd_nodes(_edge_test_nodes())
+    _check_edge_table_traversals(gs)
+
+    results = await gs.atraversal_search("0.0", k=1, depth=1)
+    assert set(_result_ids(results)) == {"v0", "v2", "v3"}
+
+    results = await gs.ammr_traversal_search(
+        "0.0", fetch_k=0, k=4, initial_roots=["v0"]
+    )
+    assert _result_ids(results) == ["v2", "v3"]
+
+
+def test_backfill_edge_table(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    gs = graph_store_factory("all")
+    gs.add_nodes(_edge_test_nodes())
+
+    # Enable the edge table on the existing node table.
+    gs = graph_store_factory(
+        "all",
+        node_table=gs._node_table,  # noqa: SLF001
+        edge_table=f"edges_{secrets.token_hex(8)}",
+    )
+    assert gs.backfill_edge_table() == 2  # noqa: PLR2004
+    _check_edge_table_traversals(gs)
+
+
+def test_scan(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    gs = graph_store_factory("all")
+    gs.add_nodes(Node(id=f"n{i}", text=f"0.{i}", metadata={"i": i}) for i in range(25))
+
+    nodes = list(gs.scan_nodes(splits=4, max_concurrent_splits=2, fetch_size=3))
+    assert sorted(node.id for node in nodes if node.id) == sorted(
+        f"n{i}" for i in range(25)
+    )
+    assert all(node.metadata == {"i": int(node.text[2:])} for node in nodes)
+
+    # Projection, with a callback.
+    pages: list[Sequence[Any]] = []
+    assert gs.scan(pages.append, columns=["content_id"], splits=4, fetch_size=3) == 25  # noqa: PLR2004
+    rows = [row for page in pages for row in page]
+    assert len({row.content_id for row in rows}) == 25  # noqa: PLR2004
+    assert all(not hasattr(row, "text_embedding") for row in rows)
+
+    with pytest.raises(ValueError, match="Invalid column"):
+        gs.scan(pages.append, columns=["content_id; DROP TABLE"])
+
+    # Stopping the iteration early.
+    rows_iterator = gs.scan_rows(["content_id"], splits=4, fetch_size=2)
+    assert next(rows_iterator).content_id.startswith("n")
+    rows_iterator.close()
+
+    # Resuming the scan of a token range after its first page.
+    [(start, end)] = token_ranges(1)
+    scan_pages = list(gs.scan_token_range(start, end, to_nodes=True, fetch_size=10))
+    assert [len(page.nodes) for page in scan_pages] == [10, 10, 5]
+    resumed = gs.scan_token_range(
+        scan_pages[0].token, end, to_nodes=True, fetch_size=10
+    )
+    assert [node.id for page in resumed for node in page.nodes] == [
+        node.id for page in scan_pages[1:] for node in page.nodes
+    ]
+
+    with pytest.raises(ValueError, match="default columns"):
+        next(gs.scan_token_range(start, end, columns=["content_id"], to_nodes=True))
+
+
+def test_edge_table_hop_latency(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    """Compare the latency of a traversal hop with and without the edge table."""
+    num_nodes, num_tags, k_per_tag = 200, 20, 5
+    nodes = [
+        Node(
+            id=f"n{i}",
+            text=f"{i / num_nodes}",
+            links={
+                Link.bidir(kind="k", tag=f"t{(i + j) % num_tags}") for j in range(3)
+            },
+        )
+        for i in range(num_nodes)
+    ]
+    tags = {("k", f"t{i}") for i in range(num_tags)}
+    query_embedding = angle_to_embedding(0.3)
+
+    latencies = {}
+    for edge_table in (None, f"edges_{secrets.token_hex(8)}"):
+        gs = graph_store_factory("all", edge_table=edge_table)
+        gs.add_nodes(nodes)
+        adjacent_query = gs._get_search_cql(  # noqa: SLF001
+            has_limit=True,
+            columns=ADJACENT_COLUMNS,
+            has_embedding=True,
+            has_link_from_tags=True,
+        )
+
+        start = time.perf_counter()
+        for _ in range(5):
+            edges = gs._get_adjacent(  # noqa: SLF001
+                tags,
+                adjacent_query=adjacent_query,
+                query_embedding=query_embedding,
+                k_per_tag=k_per_tag,
+            )
+        latencies[edge_table is not None] = (time.perf_counter() - start) / 5
+        assert len(list(edges)) >= k_per_tag
+
+    print(
+        f"Hop latency: {latencies[False] * 1000:.1f}ms with SAI queries, "
+        f"{latencies[True] * 1000:.1f}ms with the edge table"
+    )
+
+
+def _progress(
+    progress: list[BatchProgress],
+) -> list[tuple[int, list[str], int, str | None]]:
+    return [
+        (p.batch, p.node_ids, p.nodes_added, None if p.error is None else str(p.error))
+        for p in progress
+    ]
+
+
+def test_add_nodes_batches(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    gs = graph_store_factory("all")
+    progress: list[BatchProgress] = []
+    nodes = (Node(id=f"v{i}", text=f"{i / 10}") for i in range(5))
+    ids = gs.add_nodes(nodes, batch_size=2, on_batch=progress.append)
+    assert list(ids) == ["v0", "v1", "v2", "v3", "v4"]
+    assert _progress(progress) == [
+        (0, ["v0", "v1"], 2, None),
+        (1, ["v2", "v3"], 4, None),
+        (2, ["v4"], 5, None),
+    ]
+    assert gs.get_node("v4").text == "0.4"
+
+    # The IDs can be streamed to `on_batch` instead of being returned.
+    progress.clear()
+    nodes = (Node(id=f"u{i}", text=f"{i / 10}") for i in range(3))
+    ids = gs.add_nodes(nodes, batch_size=2, on_batch=progress.append, return_ids=False)
+    assert list(ids) == []
+    assert _progress(progress) == [
+        (0, ["u0", "u1"], 2, None),
+        (1, ["u2"], 3, None),
+    ]
+    assert gs.get_node("u2").text == "0.2"
+
+    # Failed batches are reported, and the next batches are still added.
+    gs._embedding = FailingEmbeddingModel()  # noqa: SLF001
+    progress.clear()
+    failing_nodes = [
+        Node(id="w0", text="0.1"),
+        Node(id="w1", text="fail"),
+        Node(id="w2", text="0.2"),
+    ]
+    ids = gs.add_nodes(
+        failing_nodes, batch_size=1, on_batch=progress.append, fail_fast=False
+    )
+    assert list(ids) == ["w0", "w2"]
+    assert _progress(progress) == [
+        (0, ["w0"], 1, None),
+        (1, ["w1"], 1, "embedding failed"),
+        (2, ["w2"], 2, None),
+    ]
+
+    with pytest.raises(ValueError, match="embedding failed"):
+        gs.add_nodes(failing_nodes, batch_size=1)
+
+
+async def test_aadd_nodes_batches(
+    graph_store_factory: Callable[..., GraphStore],
+) -> None:
+    gs = graph_store_factory("all")
+
+    async def generate_nodes() -> AsyncIterator[Node]:
+        for i in range(5):
+            yield Node(id=f"v{i}", text=f"{i / 10}")
+
+    progress: list[BatchProgress] = []
+    ids = await gs.aadd_nodes(generate_nodes(), batch_size=2, on_batch=progress.append)
+    assert list(ids) == ["v0", "v1", "v2", "v3", "v4"]
+    assert _progress(progress) == [
+        (0, ["v0", "v1"], 2, None),
+        (1, ["v2", "v3"], 4, None),
+        (2, ["v4"], 5, None),
+    ]
+    assert (await gs.aget_node("v4")).text == "0.4"
+
+
+async def test_async_concurrency_limit_is_store_wide(
+    graph_store_factory: Callable[..., GraphStore],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    gs = graph_store_factory("all", max_concurrent_queries=2)
+    in_flight = 0
+    max_in_flight = 0
+    aexecute = concurrency.aexecute
+
+    async def counting_aexecute(*args: Any, **kwargs: Any) -> list[Any]:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return await aexecute(*args, **kwargs)
+        finally:
+            in_flight -= 1
+
+    monkeypatch.setattr(concurrency, "aexecute", counting_aexecute)
+
+    # Concurrent operations share the limit, rather than each having its own.
+    await asyncio.gather(
+        *(
+            gs.aadd_nodes([Node(id=f"v{i}{j}", text=f"0.{j}") for j in range(3)])
+            for i in range(3)
+        )
+    )
+    assert max_in_flight == 2  # noqa: PLR2004
+    assert (await gs.aget_node("v22")).text == "0.2"
+
+
+def test_embedding_migration(
+    graph_store_factory: Callable[..., GraphStore], tmp_path: Path
+) -> None:
+    source = graph_store_factory("all")
+    source.add_nodes(
+        Node(
+            id=f"n{i}",
+            text="fail" if i == 7 else f"0.{i}",  # noqa: PLR2004
+            links={Link.bidir(kind="k", tag=f"t{i % 3}")},
+            metadata={"i": i},
+        )
+        for i in range(20)
+    )
+    target = graph_store_factory("all")
+    checkpoint_path = tmp_path / "checkpoint.json"
+
+    def migration() -> EmbeddingMigration:
+        return EmbeddingMigration(
+            source,
+            target,
+            checkpoint_path=checkpoint_path,
+            splits=4,
+            max_concurrent_splits=2,
+            batch_size=2,
+            fetch_size=3,
+        )
+
+    # The embedding of one of the nodes fails, interrupting the migration.
+    target._embedding = FailingEmbeddingModel()  # noqa: SLF001
+    with pytest.raises(ValueError, match="embedding failed"):
+        migration().run()
+    assert not migration().is_complete()
+
+    # Resuming migrates the remaining nodes.
+    target._embedding = SimpleEmbeddingModel()  # noqa: SLF001
+    job = migration()
+    assert 0 < job.run() < 20  # noqa: PLR2004
+    assert job.is_complete()
+    assert migration().run() == 0
+
+    for i in range(20):
+        node = target.get_node(f"n{i}")
+        assert node.metadata == {"i": i}
+        assert node.links == {Link.bidir(kind="k", tag=f"t{i % 3}")}
+    results = target.similarity_search(angle_to_embedding(0.3), k=1)
+    assert _result_ids(results) == ["n3"]
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+from ragstack_knowledge_store._cache import LruCache
+
+
+def test_lru_eviction() -> None:
+    cache: LruCache[str, int] = LruCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    # "b" was the least recently used entry.
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3  # noqa: PLR2004
+    assert len(cache) == 2  # noqa: PLR2004
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_ttl_expiration() -> None:
+    cache: LruCache[str, int] = LruCache(max_size=10, ttl=0.01)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_discard_if() -> None:
+    cache: LruCache[tuple[str, int], int] = LruCache(max_size=10)
+    cache.put(("a", 1), 1)
+    cache.put(("a", 2), 2)
+    cache.put(("b", 1), 3)
+    cache.discard_if(lambda key: key[0] == "a")
+    assert cache.get(("a", 1)) is None
+    assert cache.get(("b", 1)) == 3  # noqa: PLR2004
+
+    cache.clear()
+    assert len(cache) == 0
+
+    with pytest.raises(ValueError, match="max_size"):
+        LruCache(max_size=0)
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Callable
+
+import pytest
+from cassandra import OperationTimedOut
+from ragstack_knowledge_store.concurrency import (
+    AsyncConcurrentQueries,
+    ConcurrentQueries,
+    aexecute,
+    gather_fail_fast,
+)
+
+MAX_CONCURRENCY = 2
+
+
+class FakeResponseFuture:
+    """Response future completing its callbacks from a separate thread."""
+
+    def __init__(
+        self,
+        session: FakeSession,
+        query: Any,
+        pages: list[list[Any]],
+        error: Exception | None,
+    ) -> None:
+        self._session = session
+        self.query = query
+        self._pages = pages
+        self._error = error
+        self._page = 0
+        self.has_more_pages = False
+        self._callback: Callable[[list[Any]], None] | None = None
+        self._errback: Callable[[Exception], None] | None = None
+
+    def add_callbacks(
+        self,
+        callback: Callable[..., None],
+        errback: Callable[..., None],
+        callback_kwargs: dict[str, Any] | None = None,
+        errback_kwargs: dict[str, Any] | None = None,
+    ) -> None:
+        self._callback = lambda rows: callback(rows, **(callback_kwargs or {}))
+        self._errback = lambda error: errback(error, **(errback_kwargs or {}))
+        self._session.run(self._complete)
+
+    def start_fetching_next_page(self) -> None:
+        self._page += 1
+        self._session.run(self._complete)
+
+    def _complete(self) -> None:
+        assert self._callback is not None
+        assert self._errback is not None
+        if self._session.gated:
+            # Errors complete once released, and results once the errors were
+            # reported.
+            self._session.release.wait()
+            if self._error is None:
+                self._session.failed.wait()
+        elif self._error is None:
+            time.sleep(0.01)
+        self.has_more_pages = self._page + 1 < len(self._pages)
+        if not self.has_more_pages:
+            self._session.complete()
+        if self._error is not None:
+            self._errback(self._error)
+            self._session.failed.set()
+        else:
+            self._callback(self._pages[self._page])
+
+
+class FakeSession:
+    """Session returning the same pages for every query.
+
+    The given errors are returned, in order, by the first queries executed. If
+    gated, no query completes until `release` is set, and the successful ones
+    only complete after an error was reported (setting `failed`).
+    """
+
+    def __init__(
+        self,
+        pages: list[list[Any]],
+        errors: list[Exception] | None = None,
+        gated: bool = False,
+    ) -> None:
+        self.gated = gated
+        self.release = threading.Event()
+        self.failed = threading.Event()
+        self._pages = pages
+        self._errors = list(errors or [])
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._threads: list[threading.Thread] = []
+
+    def execute_async(
+        self, query: Any, _parameters: Any, **_kwargs: Any
+    ) -> FakeResponseFuture:
+        with self._lock:
+            self.executed += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            error = self._errors.pop(0) if self._errors else None
+        return FakeResponseFuture(self, query, self._pages, error)
+
+    def run(self, target: Callable[[], None]) -> None:
+        thread = threading.Thread(target=target)
+        with self._lock:
+            self._threads.append(thread)
+        thread.start()
+
+    def join(self) -> None:
+        """Wait for the callbacks of all the executed queries."""
+        for thread in self._threads:
+            thread.join()
+
+    def complete(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+async def test_aexecute_fetches_all_pages() -> None:
+    session = FakeSession([[1, 2], [3], [4, 5]])
+    rows = await aexecute(session, "query")
+    assert rows == [1, 2, 3, 4, 5]
+
+
+async def test_aexecute_raises_errors() -> None:
+    session = FakeSession([[]], errors=[RuntimeError("query failed")])
+    with pytest.raises(RuntimeError, match="query failed"):
+        await aexecute(session, "query")
+
+
+async def test_async_concurrent_queries_bounds_concurrency() -> None:
+    session = FakeSession([[1]])
+    cq = AsyncConcurrentQueries(session, max_concurrency=MAX_CONCURRENCY)
+
+    results = await asyncio.gather(*(cq.execute("query") for _ in range(6)))
+    assert results == [[1]] * 6
+    assert session.max_in_flight == MAX_CONCURRENCY
+
+
+def test_concurrent_queries_bounds_in_flight() -> None:
+    session = FakeSession([[1], [2]])
+    rows: list[Any] = []
+    with ConcurrentQueries(
+        session,
+        max_in_flight=MAX_CONCURRENCY,
+    ) as cq:
+        for _ in range(6):
+            cq.execute("query", callback=rows.extend)
+        assert cq.in_flight == MAX_CONCURRENCY
+        assert cq.queued == 4  # noqa: PLR2004
+
+    assert sorted(rows) == [1] * 6 + [2] * 6
+    assert session.max_in_flight == MAX_CONCURRENCY
+    assert (cq.queued, cq.in_flight, cq.completed, cq.failed) == (0, 0, 6, 0)
+
+
+def test_concurrent_queries_retries() -> None:
+    session = FakeSession([[1]], errors=[OperationTimedOut(), OperationTimedOut()])
+    rows: list[Any] = []
+    with ConcurrentQueries(
+        session,
+        max_retries=2,
+        retry_delay=0.001,
+    ) as cq:
+        cq.execute("query", callback=rows.extend)
+
+    assert rows == [1]
+    assert session.executed == 3  # noqa: PLR2004
+    assert (cq.completed, cq.failed, cq.retried) == (1, 0, 2)
+
+
+def test_concurrent_queries_fails_after_retries() -> None:
+    session = FakeSession([[1]], errors=[OperationTimedOut(), OperationTimedOut()])
+    with pytest.raises(OperationTimedOut), ConcurrentQueries(
+        session,
+        max_retries=1,
+        retry_delay=0.001,
+    ) as cq:
+        cq.execute("query")
+
+    assert (cq.completed, cq.failed, cq.retried) == (0, 1, 1)
+
+
+def test_concurrent_queries_does_not_retry_other_errors() -> None:
+    session = FakeSession([[1]], errors=[RuntimeError("invalid query")])
+    with pytest.raises(RuntimeError, match="invalid query"), ConcurrentQueries(
+        session,
+        max_retries=3,
+    ) as cq:
+        cq.execute("query")
+
+    assert session.executed == 1
+    assert cq.retried == 0
+
+
+def test_concurrent_queries_adaptive_limit() -> None:
+    session = FakeSession([[1]], errors=[OperationTimedOut()])
+    with ConcurrentQueries(
+        session,
+        max_in_flight=8,
+        adaptive=True,
+        max_retries=1,
+        retry_delay=0.001,
+    ) as cq:
+        cq.execute("query")
+    # Halved on the timeout, then increased after the successful retry.
+    assert cq.concurrency_limit == 4  # noqa: PLR2004
+
+    with ConcurrentQueries(
+        FakeSession([[1]]),
+        max_in_flight=8,
+        adaptive=True,
+    ) as cq:
+        cq.execute("query")
+    # Never exceeds `max_in_flight`.
+    assert cq.concurrency_limit == 8  # noqa: PLR2004
+
+    with pytest.raises(ValueError, match="requires max_in_flight"):
+        ConcurrentQueries(FakeSession([]), adaptive=True)
+
+
+def test_concurrent_queries_fail_fast() -> None:
+    session = FakeSession([[1]], errors=[RuntimeError("query failed")], gated=True)
+    rows: list[Any] = []
+    cq = ConcurrentQueries(session, max_in_flight=MAX_CONCURRENCY)
+
+    def execute_queries() -> None:
+        with cq:
+            for _ in range(6):
+                cq.execute("query", callback=rows.extend)
+            # The first query fails once all the queries are submitted.
+            session.release.set()
+            session.failed.wait()
+            # Queries executed after the failure are dropped.
+            cq.execute("query", callback=rows.extend)
+
+    with pytest.raises(RuntimeError, match="query failed"):
+        execute_queries()
+    session.join()
+
+    # The first query failed, which cancelled the queued ones. The results of
+    # the second, in flight when the first failed, are ignored.
+    assert rows == []
+    assert session.executed == MAX_CONCURRENCY
+    assert (cq.completed, cq.failed, cq.cancelled) == (0, 1, 6)
+    assert len(cq.errors) == 1
+
+
+def test_concurrent_queries_partial_results() -> None:
+    session = FakeSession([[1]], errors=[RuntimeError("query failed")])
+    rows: list[Any] = []
+    with ConcurrentQueries(
+        session, max_in_flight=MAX_CONCURRENCY, fail_fast=False
+    ) as cq:
+        for _ in range(6):
+            cq.execute("query", callback=rows.extend)
+
+    assert rows == [1] * 5
+    assert (cq.completed, cq.failed, cq.cancelled) == (5, 1, 0)
+    assert [str(e) for e in cq.errors] == ["query failed"]
+
+
+def test_concurrent_queries_callback_error() -> None:
+    def callback(_rows: Any) -> None:
+        raise ValueError("callback failed")
+
+    with pytest.raises(ValueError, match="callback failed"), ConcurrentQueries(
+        FakeSession([[1], [2]])
+    ) as cq:
+        cq.execute("query", callback=callback)
+
+
+def test_concurrent_queries_cancelled_on_exception() -> None:
+    session = FakeSession([[1]])
+    rows: list[Any] = []
+    cq = ConcurrentQueries(session, max_in_flight=1)
+
+    def execute_queries() -> None:
+        with cq:
+            cq.execute("query", callback=rows.extend)
+            cq.execute("query", callback=rows.extend)
+            raise KeyError
+
+    with pytest.raises(KeyError):
+        execute_queries()
+
+    time.sleep(0.1)
+    assert rows == []
+    assert session.executed == 1
+    assert (cq.in_flight, cq.queued, cq.cancelled) == (0, 0, 2)
+
+
+async def test_gather_fail_fast() -> None:
+    started: list[int] = []
+
+    async def run(i: int) -> int:
+        started.append(i)
+        await asyncio.sleep(0.01 * i)
+        if i == 1:
+            raise RuntimeError("failed")
+        return i
+
+    assert await gather_fail_fast(run(0), run(2)) == [0, 2]
+
+    started.clear()
+    with pytest.raises(RuntimeError, match="failed"):
+        await gather_fail_fast(run(0), run(1), run(20))
+    await asyncio.sleep(0.01)
+    assert started == [0, 1, 20]
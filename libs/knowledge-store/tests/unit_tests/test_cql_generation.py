@@ -1,3 +1,4 @@
+from ragstack_knowledge_store._cache import LruCache
 from ragstack_knowledge_store.graph_store import GraphStore, MetadataIndexingMode
 
 
@@ -23,7 +24,7 @@ def test_cql_generation() -> None:
     gs._keyspace = "test_keyspace"  # noqa: SLF001
     gs._node_table = "test_table"  # noqa: SLF001
     gs._session = FakeSession()  # noqa: SLF001
-    gs._prepared_query_cache = {}  # noqa: SLF001
+    gs._prepared_query_cache = LruCache(max_size=10)  # noqa: SLF001
 
     query, values = gs._get_search_cql_and_params(limit=2, embedding=[0, 1])  # noqa: SLF001
     assert _normalize_whitespace(query.query_string) == _normalize_whitespace("""
@@ -86,6 +87,26 @@ def test_cql_generation() -> None:
     """)
     assert values == ("link", "tag", [0, 1], 2)
 
+    # Disjunction of tags, fetching the adjacent nodes of several tags at once.
+    query = gs._get_search_cql(  # noqa: SLF001
+        has_limit=True,
+        columns="content_id",
+        has_embedding=True,
+        has_link_from_tags=True,
+        num_link_from_tags=2,
+    )
+    values = gs._get_search_params(  # noqa: SLF001
+        limit=4, embedding=[0, 1], link_from_tags=[("a", "1"), ("b", "2")]
+    )
+    assert _normalize_whitespace(query.query_string) == _normalize_whitespace("""
+        SELECT content_id
+        FROM test_keyspace.test_table
+        WHERE (link_from_tags CONTAINS (?, ?) OR link_from_tags CONTAINS (?, ?))
+        ORDER BY text_embedding ANN OF ?
+        LIMIT ?;
+    """)
+    assert values == ("a", "1", "b", "2", [0, 1], 4)
+
 
 def test_cql_generation_with_metadata() -> None:
     gs = object.__new__(GraphStore)
@@ -93,7 +114,7 @@ def test_cql_generation_with_metadata() -> None:
     gs._keyspace = "test_keyspace"  # noqa: SLF001
     gs._node_table = "test_table"  # noqa: SLF001
     gs._session = FakeSession()  # noqa: SLF001
-    gs._prepared_query_cache = {}  # noqa: SLF001
+    gs._prepared_query_cache = LruCache(max_size=10)  # noqa: SLF001
     gs._metadata_indexing_policy = (MetadataIndexingMode.DEFAULT_TO_SEARCHABLE, set())  # noqa: SLF001
 
     query, values = gs._get_search_cql_and_params(  # noqa: SLF001
@@ -174,3 +195,28 @@ def test_cql_generation_with_metadata() -> None:
         LIMIT ?;
     """)
     assert values == ("link", "tag", "3.0", [0, 1], 2)
+
+
+def test_prepared_statement_cache() -> None:
+    gs = object.__new__(GraphStore)
+
+    gs._keyspace = "test_keyspace"  # noqa: SLF001
+    gs._node_table = "test_table"  # noqa: SLF001
+    gs._session = FakeSession()  # noqa: SLF001
+    gs._prepared_query_cache = LruCache(max_size=2)  # noqa: SLF001
+    gs._metadata_indexing_policy = (MetadataIndexingMode.DEFAULT_TO_SEARCHABLE, set())  # noqa: SLF001
+
+    # Equivalent columns and metadata keys share a statement.
+    query = gs._get_search_cql(columns="a, b", metadata_keys=["x", "y"])  # noqa: SLF001
+    assert gs._get_search_cql(columns=" a,\n b ", metadata_keys=["y", "x"]) is query  # noqa: SLF001
+
+    stats = gs.prepared_statement_cache_stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+
+    # The least recently used statements are evicted.
+    gs._get_search_cql(columns="a", metadata_keys=["x"])  # noqa: SLF001
+    gs._get_search_cql(columns="a", metadata_keys=["y"])  # noqa: SLF001
+    assert gs._get_search_cql(columns="a, b", metadata_keys=["x", "y"]) is not query  # noqa: SLF001
+
+    stats = gs.prepared_statement_cache_stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 4, 2)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import pytest
+from ragstack_knowledge_store import CachedEmbeddingModel, EmbeddingModel
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class CountingEmbeddingModel(EmbeddingModel):
+    """Embedding model recording the texts it embeds."""
+
+    def __init__(self) -> None:
+        self.embedded: list[str] = []
+
+    def _embed(self, text: str) -> list[float]:
+        self.embedded.append(text)
+        return [float(len(text)), 0.5]
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [-1.0, *self._embed(text)[1:]]
+
+    async def aembed_texts(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_texts(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
+
+
+def test_embed_texts_dedup_and_cache() -> None:
+    model = CountingEmbeddingModel()
+    cached = CachedEmbeddingModel(model)
+
+    assert cached.embed_texts(["a", "bb", "a"]) == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert model.embedded == ["a", "bb"]
+
+    assert cached.embed_texts(["bb", "ccc"]) == [[2.0, 0.5], [3.0, 0.5]]
+    assert model.embedded == ["a", "bb", "ccc"]
+    assert (cached.hits, cached.misses) == (2, 3)
+
+
+def test_embed_query_cached_apart() -> None:
+    model = CountingEmbeddingModel()
+    cached = CachedEmbeddingModel(model)
+
+    assert cached.embed_texts(["a"]) == [[1.0, 0.5]]
+    assert cached.embed_query("a") == [-1.0, 0.5]
+    assert cached.embed_query("a") == [-1.0, 0.5]
+    assert model.embedded == ["a", "a"]
+
+
+async def test_async() -> None:
+    model = CountingEmbeddingModel()
+    cached = CachedEmbeddingModel(model)
+
+    assert await cached.aembed_texts(["a", "a"]) == [[1.0, 0.5], [1.0, 0.5]]
+    assert await cached.aembed_query("bb") == [-1.0, 0.5]
+    assert cached.embed_texts(["a"]) == [[1.0, 0.5]]
+    assert cached.embed_query("bb") == [-1.0, 0.5]
+    assert model.embedded == ["a", "bb"]
+
+
+def test_returns_copies() -> None:
+    model = CountingEmbeddingModel()
+    cached = CachedEmbeddingModel(model)
+
+    cached.embed_texts(["a"])[0].append(1.0)
+    embedding = cached.embed_query("a")
+    embedding[0] = 0.0
+    assert cached.embed_texts(["a", "a"]) == [[1.0, 0.5], [1.0, 0.5]]
+    assert cached.embed_query("a") == [-1.0, 0.5]
+
+
+def test_concurrent_stats() -> None:
+    model = CountingEmbeddingModel()
+    cached = CachedEmbeddingModel(model)
+    cached.embed_texts(["a"])
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(100):
+            executor.submit(cached.embed_texts, ["a"] * 100)
+    assert (cached.hits, cached.misses) == (10000, 1)
+
+
+async def test_async_sqlite(tmp_path: Path) -> None:
+    model = CountingEmbeddingModel()
+    cached = CachedEmbeddingModel(model, max_size=0, path=tmp_path / "embeddings.db")
+
+    assert await cached.aembed_texts(["a", "bb"]) == [[1.0, 0.5], [2.0, 0.5]]
+    assert await cached.aembed_query("a") == [-1.0, 0.5]
+    assert await cached.aembed_texts(["bb", "a"]) == [[2.0, 0.5], [1.0, 0.5]]
+    assert await cached.aembed_query("a") == [-1.0, 0.5]
+    assert model.embedded == ["a", "bb", "a"]
+    assert (cached.hits, cached.misses) == (3, 3)
+    cached.close()
+
+
+@pytest.mark.parametrize("max_size", [0, 1])
+def test_sqlite(tmp_path: Path, max_size: int) -> None:
+    path = tmp_path / "embeddings.db"
+    model = CountingEmbeddingModel()
+    cached = CachedEmbeddingModel(model, max_size=max_size, path=path)
+    assert cached.embed_texts(["a", "bb"]) == [[1.0, 0.5], [2.0, 0.5]]
+    cached.close()
+
+    # A new model, sharing the database.
+    cached = CachedEmbeddingModel(model, max_size=max_size, path=path)
+    assert cached.embed_texts(["bb", "a", "ccc"]) == [
+        [2.0, 0.5],
+        [1.0, 0.5],
+        [3.0, 0.5],
+    ]
+    assert model.embedded == ["a", "bb", "ccc"]
+
+    # Namespaces don't share embeddings.
+    other = CachedEmbeddingModel(model, max_size=max_size, path=path, namespace="x")
+    assert other.embed_texts(["a"]) == [[1.0, 0.5]]
+    assert model.embedded == ["a", "bb", "ccc", "a"]
+    cached.close()
+    other.close()
@@ -1,30 +1,60 @@
 from __future__ import annotations
 
+import copy
+import dataclasses
+import math
+import pickle
+from types import SimpleNamespace
 from typing import Any
 
-from ragstack_knowledge_store.graph_store import (
+import pytest
+from ragstack_knowledge_store._node_utils import (
     _deserialize_links,
     _deserialize_metadata,
     _serialize_links,
     _serialize_metadata,
 )
+from ragstack_knowledge_store.codec import Codec, JsonCodec, OrjsonCodec
+from ragstack_knowledge_store.graph_store import (
+    GraphStore,
+    Node,
+    _row_to_node,
+    token_ranges,
+)
 from ragstack_knowledge_store.links import Link
 
+CODECS = [JsonCodec(), OrjsonCodec()]
 
-def test_metadata_serialization() -> None:
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_metadata_serialization(codec: Codec) -> None:
     def assert_roundtrip(metadata: dict[str, Any]) -> None:
-        serialized = _serialize_metadata(metadata)
-        deserialized = _deserialize_metadata(serialized)
+        serialized = _serialize_metadata(metadata, codec)
+        deserialized = _deserialize_metadata(serialized, codec)
         assert metadata == deserialized
 
     assert_roundtrip({})
     assert_roundtrip({"a": "hello", "b": ["c", "d"], "c": []})
+    assert_roundtrip({"a": None, "b": [1.5, None]})
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_non_finite_floats_serialization(codec: Codec) -> None:
+    metadata = {"a": math.inf, "b": [-math.inf, None], "c": {"d": math.nan}}
+    serialized = _serialize_metadata(metadata, codec)
+    assert serialized == _serialize_metadata(metadata, JsonCodec())
 
+    deserialized = _deserialize_metadata(serialized, codec)
+    assert deserialized["a"] == math.inf
+    assert deserialized["b"] == [-math.inf, None]
+    assert math.isnan(deserialized["c"]["d"])
 
-def test_links_serialization() -> None:
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_links_serialization(codec: Codec) -> None:
     def assert_roundtrip(links: set[Link]) -> None:
-        serialized = _serialize_links(links)
-        deserialized = _deserialize_links(serialized)
+        serialized = _serialize_links(links, codec)
+        deserialized = _deserialize_links(serialized, codec)
         assert links == deserialized
 
     assert_roundtrip(set())
@@ -35,3 +65,76 @@ def test_links_serialization() -> None:
         }
     )
     assert_roundtrip({Link.bidir("a", "b")})
+
+
+def test_links_deserialization_legacy_format() -> None:
+    # Links written before the compact format.
+    serialized = '[{"kind": "a", "direction": "in", "tag": "b"}]'
+    assert _deserialize_links(serialized) == {Link.incoming("a", "b")}
+
+
+def test_row_to_node() -> None:
+    row = SimpleNamespace(
+        content_id="a",
+        text_content="text",
+        metadata_blob=_serialize_metadata({"x": 1}),
+        links_blob="not decoded",
+    )
+    node = _row_to_node(row)
+    assert node.metadata == {"x": 1}
+
+    # The links are decoded when accessed.
+    row.links_blob = _serialize_links({Link.outgoing("a", "b")})
+    node = _row_to_node(row)
+    expected = Node(
+        text="text", id="a", metadata={"x": 1}, links={Link.outgoing("a", "b")}
+    )
+    assert node == expected
+    assert expected == node
+    assert repr(node) == repr(expected)
+
+    # The nodes can be replaced, copied and pickled, before or after decoding.
+    decoded = _row_to_node(row)
+    assert decoded.links == expected.links
+    for lazy_node in [_row_to_node(row), decoded]:
+        assert copy.copy(lazy_node) == expected
+        assert pickle.loads(pickle.dumps(lazy_node)) == expected  # noqa: S301
+        assert dataclasses.replace(lazy_node, text="new") == dataclasses.replace(
+            expected, text="new"
+        )
+
+
+def test_id_batches() -> None:
+    def get_replicas(keyspace: str, key: bytes) -> list[str]:
+        assert keyspace == "test_keyspace"
+        # IDs ending with an even digit are on one replica, odd ones on another.
+        return ["even" if int(key[-1:]) % 2 == 0 else "odd"]
+
+    gs = object.__new__(GraphStore)
+    gs._keyspace = "test_keyspace"  # noqa: SLF001
+    gs._read_batch_size = 2  # noqa: SLF001
+    gs._session = SimpleNamespace(  # noqa: SLF001
+        cluster=SimpleNamespace(metadata=SimpleNamespace(get_replicas=get_replicas))
+    )
+
+    batches = gs._id_batches(["n0", "n1", "n2", "n3", "n4", "n0", "n5"])  # noqa: SLF001
+    assert batches == [["n0", "n2"], ["n4"], ["n1", "n3"], ["n5"]]
+
+    # Without a token map, the IDs are only split into batches.
+    gs._session.cluster.metadata.get_replicas = lambda _keyspace, _key: []  # noqa: SLF001
+    batches = gs._id_batches(["n0", "n1", "n2"])  # noqa: SLF001
+    assert batches == [["n0", "n1"], ["n2"]]
+
+
+def test_token_ranges() -> None:
+    ranges = token_ranges(3)
+    assert len(ranges) == 3  # noqa: PLR2004
+    assert ranges[0][0] == -(2**63)
+    assert ranges[-1][1] == 2**63 - 1
+    # The ranges are contiguous.
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+
+    assert token_ranges(1) == [(-(2**63), 2**63 - 1)]
+    with pytest.raises(ValueError, match="splits must be at least 1"):
+        token_ranges(0)
@@ -0,0 +1,550 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pytest
+from ragstack_knowledge_store import (
+    EmbeddingMigration,
+    EmbeddingModel,
+    InMemoryGraphStore,
+    Node,
+)
+from ragstack_knowledge_store.graph_store import BatchProgress, token_ranges
+from ragstack_knowledge_store.links import Link
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from pathlib import Path
+
+
+def angular_embedding(angle: float) -> list[float]:
+    return [math.cos(angle * math.pi), math.sin(angle * math.pi)]
+
+
+class AngularEmbeddingModel(EmbeddingModel):
+    """Embeds numbers (in units of pi) onto a circle."""
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return angular_embedding(float(text))
+
+    async def aembed_texts(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_texts(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
+
+
+class VectorEmbeddingModel(EmbeddingModel):
+    """Embeds comma-separated numbers as the vector they spell."""
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(value) for value in text.split(",")]
+
+    async def aembed_texts(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_texts(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
+
+
+class FlakyEmbeddingModel(AngularEmbeddingModel):
+    """Fails to embed "0.7" while `fail` is set."""
+
+    fail = True
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        if self.fail and "0.7" in texts:
+            raise ValueError("embedding failed")
+        return super().embed_texts(texts)
+
+
+def _result_ids(nodes: Iterable[Node]) -> list[str]:
+    return [n.id for n in nodes if n.id is not None]
+
+
+def _mmr_nodes() -> list[Node]:
+    return [
+        Node(
+            id="v0",
+            text="-0.124",
+            links={Link.outgoing(kind="explicit", tag="link")},
+            metadata={"even": True},
+        ),
+        Node(id="v1", text="+0.127", metadata={"even": False}),
+        Node(
+            id="v2",
+            text="+0.25",
+            links={Link.incoming(kind="explicit", tag="link")},
+            metadata={"even": True},
+        ),
+        Node(
+            id="v3",
+            text="+1.0",
+            links={Link.incoming(kind="explicit", tag="link")},
+            metadata={"even": False},
+        ),
+    ]
+
+
+def _chain_nodes() -> list[Node]:
+    # c0 -> c1 -> c2 -> c3 -> c4
+    return [
+        Node(
+            id=f"c{i}",
+            text=f"0.{i}",
+            links={
+                Link.incoming(kind="next", tag=f"c{i}"),
+                Link.outgoing(kind="next", tag=f"c{i + 1}"),
+            },
+        )
+        for i in range(5)
+    ]
+
+
+def test_mmr_traversal() -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    gs.add_nodes(_mmr_nodes())
+
+    def search(**kwargs: Any) -> list[str]:
+        return _result_ids(gs.mmr_traversal_search("0.0", **kwargs))
+
+    # The same results as the Cassandra store (see the integration tests).
+    assert search(k=2, fetch_k=2) == ["v0", "v2"]
+    assert search(k=2, fetch_k=2, depth=0) == ["v0", "v1"]
+    assert search(k=2, fetch_k=3, depth=0) == ["v0", "v2"]
+    assert search(k=2, score_threshold=0.2) == ["v0"]
+    assert search(k=4) == ["v0", "v2", "v1", "v3"]
+    assert search(k=4, metadata_filter={"even": True}) == ["v0", "v2"]
+    assert search(fetch_k=0, k=4, initial_roots=["v0"]) == ["v2", "v3"]
+    assert search(fetch_k=0, k=4, initial_roots=["v1"]) == []
+    assert search(fetch_k=2, k=4, initial_roots=["v0"]) == ["v1", "v3", "v2"]
+    assert search(fetch_k=0, k=4, initial_roots=["v0"], adjacent_limit=1) == ["v2"]
+
+
+def test_mmr_traversal_adjacent_queries(monkeypatch: pytest.MonkeyPatch) -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    gs.add_nodes(_chain_nodes())
+
+    get_adjacent = gs._get_adjacent  # noqa: SLF001
+    calls: list[set[Any]] = []
+
+    def counting_get_adjacent(tags: Iterable[Any], **kwargs: Any) -> Any:
+        calls.append(set(tags))
+        return get_adjacent(tags, **kwargs)
+
+    monkeypatch.setattr(gs, "_get_adjacent", counting_get_adjacent)
+
+    # The adjacent nodes of the last selected node aren't fetched.
+    results = gs.mmr_traversal_search("0.0", k=3, fetch_k=1, depth=10)
+    assert _result_ids(results) == ["c0", "c1", "c2"]
+    assert calls == [{("next", "c1")}, {("next", "c2")}]
+
+
+def test_mmr_traversal_pruned_adjacent_queries(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Each node links to a near-duplicate of itself, further from the query.
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    gs.add_nodes(
+        node
+        for i, angle in enumerate([0.0, 0.4, -0.4])
+        for node in [
+            Node(
+                id=f"r{i}",
+                text=str(angle),
+                links={Link.outgoing(kind="dup", tag=f"r{i}")},
+            ),
+            Node(
+                id=f"d{i}",
+                text=str(angle + math.copysign(0.03, angle)),
+                links={Link.incoming(kind="dup", tag=f"r{i}")},
+            ),
+        ]
+    )
+
+    get_adjacent = gs._get_adjacent  # noqa: SLF001
+    calls: list[set[Any]] = []
+
+    def counting_get_adjacent(tags: Iterable[Any], **kwargs: Any) -> Any:
+        calls.append(set(tags))
+        return get_adjacent(tags, **kwargs)
+
+    monkeypatch.setattr(gs, "_get_adjacent", counting_get_adjacent)
+    kwargs: dict[str, Any] = {"k": 3, "fetch_k": 4, "lambda_mult": 0.25}
+
+    results = gs.mmr_traversal_search("0.0", **kwargs)
+    assert _result_ids(results) == ["r0", "r1", "r2"]
+    assert len(calls) == 2  # noqa: PLR2004
+
+    # The near-duplicates can't beat the other candidates, so they aren't fetched.
+    kwargs["min_adjacent_similarity"] = math.cos(0.03 * math.pi)
+    calls.clear()
+    results = gs.mmr_traversal_search("0.0", **kwargs)
+    assert _result_ids(results) == ["r0", "r1", "r2"]
+    assert calls == []
+
+    # They are fetched once the other candidates are selected.
+    kwargs["k"] = 4
+    results = gs.mmr_traversal_search("0.0", **kwargs)
+    assert _result_ids(results) == ["r0", "r1", "r2", "d1"]
+
+
+def test_searches() -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    gs.add_nodes(_mmr_nodes())
+
+    assert gs.get_node("v2") == _mmr_nodes()[2]
+    with pytest.raises(ValueError, match="No node with ID 'v4'"):
+        gs.get_node("v4")
+
+    results = gs.similarity_search(angular_embedding(0.25), k=2)
+    assert _result_ids(results) == ["v2", "v1"]
+    results = gs.similarity_search(
+        angular_embedding(0.25), k=2, metadata_filter={"even": False}
+    )
+    assert _result_ids(results) == ["v1", "v3"]
+
+    assert _result_ids(gs.metadata_search({"even": True})) == ["v0", "v2"]
+    assert _result_ids(gs.metadata_search({"even": True, "fake": 1})) == []
+
+    pages = list(gs.metadata_search_pages(fetch_size=3))
+    assert [_result_ids(page.nodes) for page in pages] == [["v0", "v1", "v2"], ["v3"]]
+    resumed = gs.metadata_search_pages(fetch_size=3, paging_state=pages[0].paging_state)
+    assert [_result_ids(page.nodes) for page in resumed] == [["v3"]]
+
+    # Re-adding a node replaces it, and its index entries.
+    gs.add_nodes([Node(id="v1", text="+0.5", metadata={"even": True})])
+    assert _result_ids(gs.metadata_search({"even": True})) == ["v0", "v1", "v2"]
+    assert _result_ids(gs.similarity_search(angular_embedding(0.5), k=1)) == ["v1"]
+
+    gs = InMemoryGraphStore(AngularEmbeddingModel(), metadata_indexing="none")
+    gs.add_nodes(_mmr_nodes())
+    with pytest.raises(ValueError, match="Non-indexed metadata fields"):
+        gs.metadata_search({"even": True})
+
+
+async def test_traversal_search() -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    gs.add_nodes(_chain_nodes())
+
+    results = gs.traversal_search("0.0", k=1, depth=4)
+    assert _result_ids(results) == ["c0", "c1", "c2", "c3", "c4"]
+
+    results = gs.traversal_search("0.0", k=1, depth=2)
+    assert _result_ids(results) == ["c0", "c1", "c2"]
+
+    results = await gs.atraversal_search("0.0", k=1, depth=4, max_nodes=3)
+    assert _result_ids(results) == ["c0", "c1", "c2"]
+
+    results = gs.traversal_search("0.0", k=1, depth=4, time_budget=0)
+    assert _result_ids(results) == ["c0"]
+
+
+async def test_async_api() -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    assert list(await gs.aadd_nodes(_mmr_nodes())) == ["v0", "v1", "v2", "v3"]
+
+    assert await gs.aget_node("v2") == _mmr_nodes()[2]
+
+    results = await gs.ammr_traversal_search("0.0", k=4)
+    assert _result_ids(results) == ["v0", "v2", "v1", "v3"]
+
+    results = [n async for n in gs.asimilarity_search(angular_embedding(0.25), k=1)]
+    assert _result_ids(results) == ["v2"]
+
+    results = [n async for n in gs.ametadata_search(metadata={"even": False})]
+    assert _result_ids(results) == ["v1", "v3"]
+
+
+def test_add_nodes_without_ids() -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    progress: list[BatchProgress] = []
+    ids = gs.add_nodes(
+        _mmr_nodes(), batch_size=3, on_batch=progress.append, return_ids=False
+    )
+    assert list(ids) == []
+    assert [(p.node_ids, p.nodes_added) for p in progress] == [
+        (["v0", "v1", "v2"], 3),
+        (["v3"], 4),
+    ]
+    assert gs.get_node("v3") == _mmr_nodes()[3]
+
+
+def test_ivf_index() -> None:
+    angles = np.random.default_rng(0).uniform(-1.0, 1.0, 1000)
+    nodes = [Node(id=f"n{i}", text=str(angle)) for i, angle in enumerate(angles)]
+    exact = InMemoryGraphStore(AngularEmbeddingModel())
+    exact.add_nodes(nodes)
+    ivf = InMemoryGraphStore(AngularEmbeddingModel(), ivf_lists=16, ivf_probes=4)
+    ivf.add_nodes(nodes, batch_size=100)
+
+    recall = 0
+    for angle in np.linspace(-1.0, 1.0, 50):
+        query = angular_embedding(angle)
+        expected = set(_result_ids(exact.similarity_search(query, k=10)))
+        found = set(_result_ids(ivf.similarity_search(query, k=10)))
+        recall += len(expected & found)
+    assert recall >= 0.95 * 500
+
+
+def test_ivf_recall() -> None:
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 16))
+    vectors = centers[rng.integers(20, size=2000)] + 0.5 * rng.normal(size=(2000, 16))
+    nodes = [
+        Node(
+            id=f"n{i}",
+            text=",".join(str(value) for value in vector),
+            metadata={"even": i % 2 == 0},
+        )
+        for i, vector in enumerate(vectors)
+    ]
+    gs = InMemoryGraphStore(VectorEmbeddingModel(), ivf_lists=16, ivf_probes=4)
+    # Rows added after the index is trained are searched too.
+    gs.add_nodes(nodes[:1500])
+    gs.train_index()
+    gs.add_nodes(nodes[1500:])
+
+    # Brute-force cosine similarities.
+    unit_vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    even = np.arange(len(vectors)) % 2 == 0
+    queries = centers[rng.integers(20, size=50)] + 0.5 * rng.normal(size=(50, 16))
+    recall = 0
+    filtered_recall = 0
+    for query in queries:
+        similarities = unit_vectors @ (query / np.linalg.norm(query))
+        expected = {f"n{i}" for i in np.argsort(-similarities)[:10]}
+        found = _result_ids(gs.similarity_search(query.tolist(), k=10))
+        recall += len(expected & set(found))
+
+        similarities[~even] = -np.inf
+        expected = {f"n{i}" for i in np.argsort(-similarities)[:10]}
+        found = _result_ids(
+            gs.similarity_search(query.tolist(), k=10, metadata_filter={"even": True})
+        )
+        filtered_recall += len(expected & set(found))
+    assert recall >= 0.9 * 500
+    assert filtered_recall >= 0.9 * 500
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel(), ivf_lists=2)
+    gs.add_nodes(_mmr_nodes() + _chain_nodes())
+    gs.save(tmp_path)
+
+    loaded = InMemoryGraphStore.load(tmp_path, AngularEmbeddingModel(), ivf_lists=2)
+    assert len(loaded) == len(gs)
+    assert loaded.get_node("v0") == _mmr_nodes()[0]
+    kwargs_list: list[dict[str, Any]] = [
+        {"k": 4},
+        {"k": 4, "metadata_filter": {"even": True}},
+    ]
+    for kwargs in kwargs_list:
+        assert _result_ids(loaded.mmr_traversal_search("0.0", **kwargs)) == (
+            _result_ids(gs.mmr_traversal_search("0.0", **kwargs))
+        )
+    assert _result_ids(loaded.traversal_search("0.0", k=1, depth=4)) == _result_ids(
+        gs.traversal_search("0.0", k=1, depth=4)
+    )
+
+    # Nodes can be replaced and added to the loaded store, then saved again.
+    loaded.add_nodes([Node(id="v1", text="+0.5"), Node(id="v4", text="+0.75")])
+    loaded.save(tmp_path)
+    reloaded = InMemoryGraphStore.load(tmp_path, AngularEmbeddingModel())
+    assert _result_ids(reloaded.similarity_search(angular_embedding(0.5), k=2)) == [
+        "v1",
+        "c4",
+    ]
+    assert reloaded.get_node("v4").text == "+0.75"
+
+    with pytest.raises(ValueError, match="normalize_embeddings"):
+        InMemoryGraphStore.load(
+            tmp_path, AngularEmbeddingModel(), normalize_embeddings=True
+        )
+
+
+def test_save_after_upsert(tmp_path: Path) -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    gs.add_nodes(_mmr_nodes() + _chain_nodes())
+    gs.save(tmp_path)
+
+    # Replace a node's text, metadata and links, add a node, and save again.
+    gs.add_nodes(
+        [
+            Node(
+                id="c2",
+                text="-0.5",
+                links={Link.incoming(kind="next", tag="c2")},
+                metadata={"replaced": True},
+            ),
+            Node(id="v4", text="+0.75", metadata={"even": True}),
+        ]
+    )
+    gs.save(tmp_path)
+
+    loaded = InMemoryGraphStore.load(tmp_path, AngularEmbeddingModel())
+    assert len(loaded) == len(gs)
+    for node in gs.metadata_search(n=len(gs)):
+        assert node.id is not None
+        assert loaded.get_node(node.id) == node
+    assert _result_ids(loaded.metadata_search({"replaced": True})) == ["c2"]
+    assert _result_ids(loaded.metadata_search({"even": True})) == ["v0", "v2", "v4"]
+    assert _result_ids(loaded.similarity_search(angular_embedding(-0.5), k=1)) == ["c2"]
+    assert _result_ids(loaded.traversal_search("0.0", k=1, depth=4)) == [
+        "c0",
+        "c1",
+        "c2",
+    ]
+    assert _result_ids(loaded.mmr_traversal_search("0.0", k=4)) == _result_ids(
+        gs.mmr_traversal_search("0.0", k=4)
+    )
+
+
+def test_save_versions(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    gs.add_nodes(_chain_nodes())
+    gs.save(tmp_path)
+    gs.add_nodes(_mmr_nodes())
+    gs.save(tmp_path)
+    gs.save(tmp_path)
+    # The previous version is kept for concurrent loads.
+    assert len(list(tmp_path.glob("data-*"))) == 2  # noqa: PLR2004
+
+    # An interrupted save leaves the last saved version.
+    def failing_save(*_args: Any, **_kwargs: Any) -> None:
+        raise OSError("disk full")
+
+    gs.add_nodes([Node(id="v4", text="+0.75")])
+    with monkeypatch.context() as patch:
+        patch.setattr(np, "save", failing_save)
+        with pytest.raises(OSError, match="disk full"):
+            gs.save(tmp_path)
+    assert len(list(tmp_path.glob("data-*"))) == 2  # noqa: PLR2004
+
+    loaded = InMemoryGraphStore.load(tmp_path, AngularEmbeddingModel())
+    assert len(loaded) == len(_chain_nodes()) + len(_mmr_nodes())
+    with pytest.raises(ValueError, match="No node with ID 'v4'"):
+        loaded.get_node("v4")
+
+
+async def test_metadata_search_pages() -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    gs.add_nodes(
+        Node(id=f"n{i}", text=f"0.{i}", metadata={"even": i % 2 == 0})
+        for i in range(10)
+    )
+
+    pages = list(gs.metadata_search_pages({"even": True}, fetch_size=2))
+    expected = [["n0", "n2"], ["n4", "n6"], ["n8"]]
+    assert [_result_ids(page.nodes) for page in pages] == expected
+    assert pages[-1].paging_state is None
+
+    # Resuming after any page returns the remaining pages.
+    for i, page in enumerate(pages[:-1]):
+        resumed = gs.metadata_search_pages(
+            {"even": True}, fetch_size=2, paging_state=page.paging_state
+        )
+        assert [_result_ids(p.nodes) for p in resumed] == expected[i + 1 :]
+        aresumed = [
+            _result_ids(p.nodes)
+            async for p in gs.ametadata_search_pages(
+                {"even": True}, fetch_size=2, paging_state=page.paging_state
+            )
+        ]
+        assert aresumed == expected[i + 1 :]
+
+    # The limit applies across resumed pages.
+    pages = list(gs.metadata_search_pages({"even": True}, 3, fetch_size=2))
+    assert [_result_ids(page.nodes) for page in pages] == [["n0", "n2"], ["n4"]]
+    resumed = gs.metadata_search_pages(
+        {"even": True}, 3, fetch_size=2, paging_state=pages[0].paging_state
+    )
+    assert [_result_ids(page.nodes) for page in resumed] == [["n4"]]
+
+
+def test_scan() -> None:
+    gs = InMemoryGraphStore(AngularEmbeddingModel())
+    gs.add_nodes(_chain_nodes())
+    # Replacing a node keeps its position.
+    gs.add_nodes([Node(id="c1", text="0.5", metadata={"x": 1})])
+    ids = ["c0", "c1", "c2", "c3", "c4"]
+
+    rows = list(gs.scan_rows(fetch_size=2))
+    assert [row.content_id for row in rows] == ids
+    assert [row.token for row in rows] == [0, 1, 2, 3, 4]
+    assert rows[1].text_content == "0.5"
+    assert _result_ids(gs.scan_nodes(fetch_size=2)) == ids
+
+    # Projection, with a callback.
+    pages: list[Sequence[Any]] = []
+    columns = ["content_id", "link_from_tags", "metadata_s"]
+    assert gs.scan(pages.append, columns=columns, fetch_size=2) == len(ids)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert pages[0][0].link_from_tags == {("next", "c0")}
+    assert pages[0][1].metadata_s == {"x": "1.0"}
+    assert not hasattr(pages[0][0], "text_content")
+    with pytest.raises(ValueError, match="Invalid column"):
+        gs.scan(pages.append, columns=["content_id; DROP TABLE"])
+
+    # The nodes are in one of the token ranges, and a range scan can be resumed.
+    scan_pages = [
+        page
+        for start, end in token_ranges(4)
+        for page in gs.scan_token_range(start, end, to_nodes=True, fetch_size=2)
+    ]
+    assert [_result_ids(page.nodes) for page in scan_pages] == [
+        ["c0", "c1"],
+        ["c2", "c3"],
+        ["c4"],
+    ]
+    [(_, end)] = token_ranges(1)
+    resumed = gs.scan_token_range(scan_pages[0].token, end, to_nodes=True)
+    assert [_result_ids(page.nodes) for page in resumed] == [["c2", "c3", "c4"]]
+
+    with pytest.raises(ValueError, match="edge table"):
+        gs.backfill_edge_table()
+
+
+def test_embedding_migration(tmp_path: Path) -> None:
+    source = InMemoryGraphStore(AngularEmbeddingModel())
+    source.add_nodes(
+        Node(
+            id=f"n{i}",
+            text=f"0.{i}",
+            links={Link.bidir(kind="k", tag=f"t{i % 3}")},
+            metadata={"i": i},
+        )
+        for i in range(10)
+    )
+    embedding = FlakyEmbeddingModel()
+    target = InMemoryGraphStore(embedding)
+    checkpoint_path = tmp_path / "checkpoint.json"
+
+    def migration() -> EmbeddingMigration:
+        return EmbeddingMigration(
+            source, target, checkpoint_path=checkpoint_path, splits=4, batch_size=2
+        )
+
+    # The embedding of one of the nodes fails, interrupting the migration.
+    with pytest.raises(ValueError, match="embedding failed"):
+        migration().run()
+    assert not migration().is_complete()
+
+    # Resuming migrates the remaining nodes.
+    embedding.fail = False
+    job = migration()
+    assert job.run() == 4  # noqa: PLR2004
+    assert job.is_complete()
+    assert migration().run() == 0
+
+    assert len(target) == len(source)
+    for i in range(10):
+        node = target.get_node(f"n{i}")
+        assert node.metadata == {"i": i}
+        assert node.links == {Link.bidir(kind="k", tag=f"t{i % 3}")}
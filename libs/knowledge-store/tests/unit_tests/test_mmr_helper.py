@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import math
 
+import numpy as np
+import pytest
 from ragstack_knowledge_store._mmr_helper import MmrHelper
 
 
@@ -73,3 +75,90 @@ def test_mmr_helper_added_documetns() -> None:
         }
     )
     assert helper.pop_best() == "v2"
+
+
+def test_mmr_helper_grows_candidates() -> None:
+    helper = MmrHelper(3, angular_embedding(0.0))
+
+    # More candidates than the initial capacity, added in several batches.
+    for batch in range(4):
+        helper.add_candidates(
+            {
+                f"v{batch}_{i}": angular_embedding((batch * 10 + i) / 100)
+                for i in range(10)
+            }
+        )
+    assert len(list(helper.candidate_ids())) == 40  # noqa: PLR2004
+    assert helper.pop_best() == "v0_0"
+
+    # Selected and known candidates are not added again.
+    helper.add_candidates({"v0_0": angular_embedding(0.0), "v1_0": [0.0, 1.0]})
+    assert len(list(helper.candidate_ids())) == 39  # noqa: PLR2004
+    assert "v0_0" not in helper.candidate_ids()
+
+    # The next selections are diverse: the farthest candidate, then one in
+    # between.
+    assert helper.pop_best() == "v3_9"
+    assert helper.pop_best() == "v1_9"
+    assert helper.selected_ids == ["v0_0", "v3_9", "v1_9"]
+
+
+def test_mmr_helper_score_threshold() -> None:
+    helper = MmrHelper(5, angular_embedding(0.0), score_threshold=0.2)
+    helper.add_candidates(
+        {
+            "v0": angular_embedding(0.0),
+            "v1": angular_embedding(0.5),
+        }
+    )
+    assert helper.pop_best() == "v0"
+    # "v1" is orthogonal to the query, so its score is below the threshold.
+    assert helper.best_id == "v1"
+    assert helper.pop_best() is None
+
+
+def test_mmr_helper_normalized_embeddings() -> None:
+    # Embeddings are used as is, so these must be unit vectors.
+    helper = MmrHelper(5, [0.0, 2.0], normalized=True)
+    helper.add_candidates(
+        {
+            "v0": angular_embedding(0.5),
+            "v1": angular_embedding(0.0),
+        }
+    )
+    assert helper.best_id == "v0"
+    assert math.isclose(helper.best_score, 0.5, rel_tol=1e-6)
+
+
+def test_mmr_helper_float16() -> None:
+    helper = MmrHelper(3, angular_embedding(0.0), dtype=np.float16)
+    helper.add_candidates(
+        {
+            "v0": angular_embedding(-0.124),
+            "v1": angular_embedding(+0.127),
+            "v2": angular_embedding(+0.25),
+        }
+    )
+    assert helper.selected_embeddings.dtype == np.float16
+    assert helper.pop_best() == "v0"
+    assert helper.pop_best() == "v2"
+    assert helper.pop_best() == "v1"
+
+
+def test_mmr_helper_adjacent_score_bound() -> None:
+    helper = MmrHelper(5, angular_embedding(0.0), lambda_mult=0.25)
+    min_similarity = math.cos(0.1 * math.pi)
+
+    # The bound holds for the nodes close enough to the selected node.
+    for selected_angle in [0.0, 0.3, -0.6]:
+        bound = helper.adjacent_score_bound(
+            math.cos(selected_angle * math.pi), min_similarity
+        )
+        for offset in np.linspace(-0.1, 0.1, 21):
+            angle = selected_angle + offset
+            score = 0.25 * math.cos(angle * math.pi) - 0.75 * math.cos(offset * math.pi)
+            assert score <= bound + 1e-6
+
+    assert helper.adjacent_score_bound(1.0, min_similarity) == pytest.approx(
+        0.25 - 0.75 * min_similarity
+    )
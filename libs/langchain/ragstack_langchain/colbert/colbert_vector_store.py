@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import uuid
 from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
 
 from langchain_core.documents import Document
@@ -22,6 +23,29 @@ if TYPE_CHECKING:
     )
 
 
+CHUNK_ID_SEPARATOR = "::"
+
+
+def _to_chunk_id(doc_id: str, chunk_id: int) -> str:
+    return f"{doc_id}{CHUNK_ID_SEPARATOR}{chunk_id}"
+
+
+def _to_doc_ids(ids: List[str]) -> List[str]:
+    # Chunk ids are reduced to the id of their document.
+    doc_ids: Dict[str, None] = {}
+    for id_ in ids:
+        doc_id, separator, chunk_id = id_.rpartition(CHUNK_ID_SEPARATOR)
+        if separator and chunk_id.isdigit():
+            doc_ids[doc_id] = None
+        else:
+            doc_ids[id_] = None
+    return list(doc_ids)
+
+
+def _new_doc_ids(documents: List[Document]) -> List[str]:
+    return [getattr(d, "id", None) or str(uuid.uuid4()) for d in documents]
+
+
 class ColbertVectorStore(VectorStore):
     """VectorStore for ColBERT."""
 
@@ -45,29 +69,64 @@ class ColbertVectorStore(VectorStore):
         )
         self._retriever = self._vector_store.as_retriever()
 
+    @staticmethod
+    def _resolve_doc_ids(
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]],
+        doc_ids: Optional[List[str]],
+        doc_id_key: Optional[str],
+    ) -> Optional[List[str]]:
+        if doc_id_key is None:
+            return doc_ids
+        if doc_ids is not None:
+            raise ValueError("Only one of doc_ids and doc_id_key can be set.")
+        if metadatas is None or len(metadatas) != len(texts):
+            raise ValueError("doc_id_key requires a metadata for each text.")
+        try:
+            return [str(metadata[doc_id_key]) for metadata in metadatas]
+        except KeyError as e:
+            raise ValueError(
+                f"Metadata key '{doc_id_key}' is missing for some texts."
+            ) from e
+
     @override
     def add_texts(
         self,
         texts: Iterable[str],
         metadatas: Optional[List[Dict[str, Any]]] = None,
         doc_id: Optional[str] = None,
+        *,
+        doc_ids: Optional[List[str]] = None,
+        doc_id_key: Optional[str] = None,
         **kwargs: Any,
     ) -> List[str]:
         """Run more texts through the embeddings and add to the vectorstore.
 
+        By default, all the texts are added as the chunks of a single document.
+        To add several documents at once, set either `doc_ids` or `doc_id_key`:
+        each document is then stored in its own partition, while all the texts
+        are still embedded together.
+
         Args:
             texts: Iterable of strings to add to the vectorstore.
             metadatas: Optional list of metadatas associated with the texts.
             doc_id: Optional document ID to associate with the texts.
+            doc_ids: Optional list of document IDs, one for each text.
+            doc_id_key: Optional metadata key holding the document ID of each text.
             kwargs: vectorstore specific parameters
 
         Returns:
-            List of ids from adding the texts into the vectorstore.
+            List of chunk ids from adding the texts into the vectorstore, in the
+            format `<doc_id>::<chunk_id>`.
         """
+        texts = list(texts)
         results = self._vector_store.add_texts(
-            texts=list(texts), metadatas=metadatas, doc_id=doc_id
+            texts=texts,
+            metadatas=metadatas,
+            doc_id=doc_id,
+            doc_ids=self._resolve_doc_ids(texts, metadatas, doc_ids, doc_id_key),
         )
-        return [results[0][0]] if results else []
+        return [_to_chunk_id(doc_id, chunk_id) for doc_id, chunk_id in results]
 
     @override
     async def aadd_texts(
@@ -76,32 +135,54 @@ class ColbertVectorStore(VectorStore):
         metadatas: Optional[List[Dict[str, Any]]] = None,
         doc_id: Optional[str] = None,
         concurrent_inserts: int = 100,
+        *,
+        doc_ids: Optional[List[str]] = None,
+        doc_id_key: Optional[str] = None,
         **kwargs: Any,
     ) -> List[str]:
         """Run more texts through the embeddings and add to the vectorstore.
 
+        By default, all the texts are added as the chunks of a single document.
+        To add several documents at once, set either `doc_ids` or `doc_id_key`:
+        each document is then stored in its own partition, while all the texts
+        are still embedded together.
+
         Args:
             texts: Iterable of strings to add to the vectorstore.
             metadatas: Optional list of metadatas associated with the texts.
             doc_id: Optional document ID to associate with the texts.
             concurrent_inserts: How many concurrent inserts to make to the database.
                 Defaults to 100.
+            doc_ids: Optional list of document IDs, one for each text.
+            doc_id_key: Optional metadata key holding the document ID of each text.
             kwargs: vectorstore specific parameters
 
         Returns:
-            List of ids from adding the texts into the vectorstore.
+            List of chunk ids from adding the texts into the vectorstore, in the
+            format `<doc_id>::<chunk_id>`.
         """
+        texts = list(texts)
         results = await self._vector_store.aadd_texts(
-            texts=list(texts),
+            texts=texts,
             metadatas=metadatas,
             doc_id=doc_id,
             concurrent_inserts=concurrent_inserts,
+            doc_ids=self._resolve_doc_ids(texts, metadatas, doc_ids, doc_id_key),
         )
-        return [results[0][0]] if results else []
+        return [_to_chunk_id(doc_id, chunk_id) for doc_id, chunk_id in results]
 
     @override
     def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
-        return None if ids is None else self._vector_store.delete_chunks(doc_ids=ids)
+        """Delete documents by document id.
+
+        Chunk ids returned by `add_texts` are accepted too: the whole document
+        the chunk belongs to is deleted.
+        """
+        return (
+            None
+            if ids is None
+            else self._vector_store.delete_chunks(doc_ids=_to_doc_ids(ids))
+        )
 
     @override
     async def adelete(
@@ -110,11 +191,16 @@ class ColbertVectorStore(VectorStore):
         concurrent_deletes: int = 100,
         **kwargs: Any,
     ) -> Optional[bool]:
+        """Delete documents by document id.
+
+        Chunk ids returned by `aadd_texts` are accepted too: the whole document
+        the chunk belongs to is deleted.
+        """
         return (
             None
             if ids is None
             else await self._vector_store.adelete_chunks(
-                doc_ids=ids, concurrent_deletes=concurrent_deletes
+                doc_ids=_to_doc_ids(ids), concurrent_deletes=concurrent_deletes
             )
         )
 
@@ -190,6 +276,249 @@ class ColbertVectorStore(VectorStore):
             for (c, s) in chunk_scores
         ]
 
+    @staticmethod
+    def _as_query_embedding(embedding: List[Any]) -> List[List[float]]:
+        # A single vector is searched as a query with a single token.
+        if embedding and not isinstance(embedding[0], list):
+            return [embedding]
+        return embedding
+
+    @override
+    def similarity_search_by_vector(
+        self,
+        embedding: List[Any],
+        k: int = 5,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs most similar to the query token embedding.
+
+        Args:
+            embedding: Token embedding of the query. A single vector is searched
+                as a one-token query.
+            k: Number of Documents to return. Defaults to 5.
+            kwargs: Additional arguments for the retriever.
+
+        Returns:
+            List of Documents most similar to the query embedding.
+        """
+        chunk_scores: List[Tuple[Chunk, float]] = self._retriever.embedding_search(
+            query_embedding=self._as_query_embedding(embedding), k=k, **kwargs
+        )
+
+        return [
+            Document(page_content=c.text, metadata=c.metadata)
+            for (c, _) in chunk_scores
+        ]
+
+    @override
+    async def asimilarity_search_by_vector(
+        self,
+        embedding: List[Any],
+        k: int = 5,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs most similar to the query token embedding.
+
+        Args:
+            embedding: Token embedding of the query. A single vector is searched
+                as a one-token query.
+            k: Number of Documents to return. Defaults to 5.
+            kwargs: Additional arguments for the retriever.
+
+        Returns:
+            List of Documents most similar to the query embedding.
+        """
+        chunk_scores: List[
+            Tuple[Chunk, float]
+        ] = await self._retriever.aembedding_search(
+            query_embedding=self._as_query_embedding(embedding), k=k, **kwargs
+        )
+
+        return [
+            Document(page_content=c.text, metadata=c.metadata)
+            for (c, _) in chunk_scores
+        ]
+
+    @override
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        query_maxlen: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs selected using the maximal marginal relevance.
+
+        Maximal marginal relevance optimizes for similarity to query AND diversity
+        among selected documents. The diversity is computed with the chunk-to-chunk
+        MaxSim of the token embeddings already fetched to score the candidates.
+
+        Args:
+            query: Text to look up documents similar to.
+            k: Number of Documents to return. Defaults to 4.
+            fetch_k: Number of Documents to fetch to pass to MMR algorithm.
+                Defaults to 20.
+            lambda_mult: Number between 0 and 1 that determines the degree
+                of diversity among the results with 0 corresponding
+                to maximum diversity and 1 to minimum diversity.
+                Defaults to 0.5.
+            query_maxlen: The maximum length of the query to consider.
+                If None, the maxlen will be dynamically generated.
+            kwargs: Additional arguments for the retriever.
+
+        Returns:
+            List of Documents selected by maximal marginal relevance.
+        """
+        chunk_scores: List[Tuple[Chunk, float]] = self._retriever.mmr_text_search(
+            query_text=query,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            query_maxlen=query_maxlen,
+            **kwargs,
+        )
+
+        return [
+            Document(page_content=c.text, metadata=c.metadata)
+            for (c, _) in chunk_scores
+        ]
+
+    @override
+    async def amax_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        query_maxlen: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs selected using the maximal marginal relevance.
+
+        Maximal marginal relevance optimizes for similarity to query AND diversity
+        among selected documents. The diversity is computed with the chunk-to-chunk
+        MaxSim of the token embeddings already fetched to score the candidates.
+
+        Args:
+            query: Text to look up documents similar to.
+            k: Number of Documents to return. Defaults to 4.
+            fetch_k: Number of Documents to fetch to pass to MMR algorithm.
+                Defaults to 20.
+            lambda_mult: Number between 0 and 1 that determines the degree
+                of diversity among the results with 0 corresponding
+                to maximum diversity and 1 to minimum diversity.
+                Defaults to 0.5.
+            query_maxlen: The maximum length of the query to consider.
+                If None, the maxlen will be dynamically generated.
+            kwargs: Additional arguments for the retriever.
+
+        Returns:
+            List of Documents selected by maximal marginal relevance.
+        """
+        chunk_scores: List[
+            Tuple[Chunk, float]
+        ] = await self._retriever.ammr_text_search(
+            query_text=query,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            query_maxlen=query_maxlen,
+            **kwargs,
+        )
+
+        return [
+            Document(page_content=c.text, metadata=c.metadata)
+            for (c, _) in chunk_scores
+        ]
+
+    @override
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[Any],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs selected using the maximal marginal relevance.
+
+        Maximal marginal relevance optimizes for similarity to query AND diversity
+        among selected documents.
+
+        Args:
+            embedding: Token embedding of the query. A single vector is searched
+                as a one-token query.
+            k: Number of Documents to return. Defaults to 4.
+            fetch_k: Number of Documents to fetch to pass to MMR algorithm.
+                Defaults to 20.
+            lambda_mult: Number between 0 and 1 that determines the degree
+                of diversity among the results with 0 corresponding
+                to maximum diversity and 1 to minimum diversity.
+                Defaults to 0.5.
+            kwargs: Additional arguments for the retriever.
+
+        Returns:
+            List of Documents selected by maximal marginal relevance.
+        """
+        chunk_scores: List[Tuple[Chunk, float]] = self._retriever.mmr_embedding_search(
+            query_embedding=self._as_query_embedding(embedding),
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            **kwargs,
+        )
+
+        return [
+            Document(page_content=c.text, metadata=c.metadata)
+            for (c, _) in chunk_scores
+        ]
+
+    @override
+    async def amax_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[Any],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs selected using the maximal marginal relevance.
+
+        Maximal marginal relevance optimizes for similarity to query AND diversity
+        among selected documents.
+
+        Args:
+            embedding: Token embedding of the query. A single vector is searched
+                as a one-token query.
+            k: Number of Documents to return. Defaults to 4.
+            fetch_k: Number of Documents to fetch to pass to MMR algorithm.
+                Defaults to 20.
+            lambda_mult: Number between 0 and 1 that determines the degree
+                of diversity among the results with 0 corresponding
+                to maximum diversity and 1 to minimum diversity.
+                Defaults to 0.5.
+            kwargs: Additional arguments for the retriever.
+
+        Returns:
+            List of Documents selected by maximal marginal relevance.
+        """
+        chunk_scores: List[
+            Tuple[Chunk, float]
+        ] = await self._retriever.ammr_embedding_search(
+            query_embedding=self._as_query_embedding(embedding),
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            **kwargs,
+        )
+
+        return [
+            Document(page_content=c.text, metadata=c.metadata)
+            for (c, _) in chunk_scores
+        ]
+
     @classmethod
     @override
     def from_documents(
@@ -198,9 +527,15 @@ class ColbertVectorStore(VectorStore):
         embedding: Embeddings,
         *,
         database: Optional[ColbertBaseDatabase] = None,
+        doc_id_key: Optional[str] = None,
         **kwargs: Any,
     ) -> Self:
-        """Return VectorStore initialized from documents and embeddings."""
+        """Return VectorStore initialized from documents and embeddings.
+
+        Each Document is stored as its own document (partition), unless
+        `doc_id_key` is set, in which case Documents are grouped by the value of
+        that metadata key.
+        """
         texts = [d.page_content for d in documents]
         metadatas = [d.metadata for d in documents]
         return cls.from_texts(
@@ -208,6 +543,8 @@ class ColbertVectorStore(VectorStore):
             database=database,
             embedding=embedding,
             metadatas=metadatas,
+            doc_ids=_new_doc_ids(documents) if doc_id_key is None else None,
+            doc_id_key=doc_id_key,
             **kwargs,
         )
 
@@ -220,9 +557,15 @@ class ColbertVectorStore(VectorStore):
         *,
         database: Optional[ColbertBaseDatabase] = None,
         concurrent_inserts: int = 100,
+        doc_id_key: Optional[str] = None,
         **kwargs: Any,
     ) -> Self:
-        """Return VectorStore initialized from documents and embeddings."""
+        """Return VectorStore initialized from documents and embeddings.
+
+        Each Document is stored as its own document (partition), unless
+        `doc_id_key` is set, in which case Documents are grouped by the value of
+        that metadata key.
+        """
         texts = [d.page_content for d in documents]
         metadatas = [d.metadata for d in documents]
         return await cls.afrom_texts(
@@ -231,6 +574,8 @@ class ColbertVectorStore(VectorStore):
             embedding=embedding,
             metadatas=metadatas,
             concurrent_inserts=concurrent_inserts,
+            doc_ids=_new_doc_ids(documents) if doc_id_key is None else None,
+            doc_id_key=doc_id_key,
             **kwargs,
         )
 
@@ -243,6 +588,8 @@ class ColbertVectorStore(VectorStore):
         metadatas: Optional[List[Dict[str, Any]]] = None,
         *,
         database: Optional[ColbertBaseDatabase] = None,
+        doc_ids: Optional[List[str]] = None,
+        doc_id_key: Optional[str] = None,
         **kwargs: Any,
     ) -> Self:
         if not isinstance(embedding, TokensEmbeddings):
@@ -254,7 +601,9 @@ class ColbertVectorStore(VectorStore):
         instance = cls(
             database=database, embedding_model=embedding.get_embedding_model(), **kwargs
         )
-        instance.add_texts(texts=texts, metadatas=metadatas)
+        instance.add_texts(
+            texts=texts, metadatas=metadatas, doc_ids=doc_ids, doc_id_key=doc_id_key
+        )
         return instance
 
     @classmethod
@@ -267,6 +616,8 @@ class ColbertVectorStore(VectorStore):
         *,
         database: Optional[ColbertBaseDatabase] = None,
         concurrent_inserts: int = 100,
+        doc_ids: Optional[List[str]] = None,
+        doc_id_key: Optional[str] = None,
         **kwargs: Any,
     ) -> Self:
         if not isinstance(embedding, TokensEmbeddings):
@@ -279,7 +630,11 @@ class ColbertVectorStore(VectorStore):
             database=database, embedding_model=embedding.get_embedding_model(), **kwargs
         )
         await instance.aadd_texts(
-            texts=texts, metadatas=metadatas, concurrent_inserts=concurrent_inserts
+            texts=texts,
+            metadatas=metadatas,
+            concurrent_inserts=concurrent_inserts,
+            doc_ids=doc_ids,
+            doc_id_key=doc_id_key,
         )
         return instance
 
@@ -289,6 +644,6 @@ class ColbertVectorStore(VectorStore):
         search_kwargs = kwargs.pop("search_kwargs", {})
         search_kwargs["k"] = k
         search_type = kwargs.get("search_type", "similarity")
-        if search_type != "similarity":
+        if search_type not in ("similarity", "mmr"):
             raise ValueError(f"Unsupported search type: {search_type}")
         return super().as_retriever(search_kwargs=search_kwargs, **kwargs)
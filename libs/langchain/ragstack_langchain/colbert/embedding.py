@@ -1,36 +1,96 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, List, Optional
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 from langchain_core.embeddings import Embeddings
+from langchain_core.runnables.config import run_in_executor
 from ragstack_colbert import DEFAULT_COLBERT_MODEL, ColbertEmbeddingModel
+from ragstack_colbert.pooling import pool_embeddings
 from typing_extensions import Self, override
 
 if TYPE_CHECKING:
+    from ragstack_colbert import Embedding, Vector
     from ragstack_colbert.base_embedding_model import BaseEmbeddingModel
+    from ragstack_colbert.pooling import Pooling
 
 
 class TokensEmbeddings(Embeddings):
-    """Adapter for token-based embedding models and the LangChain Embeddings."""
+    """Adapter for token-based embedding models and the LangChain Embeddings.
 
-    def __init__(self, embedding: Optional[BaseEmbeddingModel] = None):
+    Token-based models produce one vector per token. To be usable where a single
+    vector per text is expected (single-vector stores, caches, ...), a `pooling`
+    can be set: `embed_documents` and `embed_query` then return the token vectors
+    reduced with that pooling.
+
+    Args:
+        embedding: The token-based embedding model. Defaults to a ColBERT model.
+        pooling: Optional pooling ("mean" or "max") used to compute single
+            vectors from the token embeddings. If not set, `embed_documents` and
+            `embed_query` are not supported.
+        normalize: Whether to L2-normalize the pooled vectors. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        embedding: Optional[BaseEmbeddingModel] = None,
+        pooling: Optional[Pooling] = None,
+        normalize: bool = True,
+    ):
         self.embedding = embedding or ColbertEmbeddingModel()
+        self.pooling = pooling
+        self.normalize = normalize
+
+    def _validate_pooling(self) -> Pooling:
+        if self.pooling is None:
+            raise NotImplementedError(
+                "Single-vector embeddings require a `pooling` to be set on "
+                "TokensEmbeddings creation."
+            )
+        return self.pooling
+
+    def embed_documents_with_tokens(
+        self, texts: List[str]
+    ) -> Tuple[List[Embedding], List[Vector]]:
+        """Embed texts into both token embeddings and pooled vectors.
+
+        The pooled vectors are computed from the token embeddings of the same
+        batched forward pass, so both representations can be stored at ingest
+        time without running the model twice.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            A tuple of the token embeddings and the pooled vectors, both in the
+            order of `texts`.
+        """
+        pooling = self._validate_pooling()
+        embeddings = self.embedding.embed_texts(texts=texts)
+        vectors = pool_embeddings(embeddings, pooling=pooling, normalize=self.normalize)
+        return embeddings, vectors
 
     @override
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        raise NotImplementedError
+        return self.embed_documents_with_tokens(texts)[1]
 
     @override
     def embed_query(self, text: str) -> List[float]:
-        raise NotImplementedError
+        pooling = self._validate_pooling()
+        embedding = self.embedding.embed_query(query=text)
+        vectors = pool_embeddings(
+            [embedding], pooling=pooling, normalize=self.normalize
+        )
+        return vectors[0]
 
     @override
     async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
-        raise NotImplementedError
+        self._validate_pooling()
+        return await run_in_executor(None, self.embed_documents, texts)
 
     @override
     async def aembed_query(self, text: str) -> List[float]:
-        raise NotImplementedError
+        self._validate_pooling()
+        return await run_in_executor(None, self.embed_query, text)
 
     def get_embedding_model(self) -> BaseEmbeddingModel:
         """Get the embedding model."""
@@ -47,6 +107,11 @@ class TokensEmbeddings(Embeddings):
         query_maxlen: Optional[int] = None,
         verbose: int = 3,
         chunk_batch_size: int = 640,
+        pooling: Optional[Pooling] = None,
+        normalize: bool = True,
+        background_load: bool = False,
+        warm_up_batch_size: int = 0,
+        weights_path: Optional[str] = None,
     ) -> Self:
         """Create a new ColBERT embedding model."""
         return cls(
@@ -59,5 +124,10 @@ class TokensEmbeddings(Embeddings):
                 query_maxlen,
                 verbose,
                 chunk_batch_size,
-            )
+                background_load=background_load,
+                warm_up_batch_size=warm_up_batch_size,
+                weights_path=weights_path,
+            ),
+            pooling=pooling,
+            normalize=normalize,
         )
@@ -115,6 +115,16 @@ def test_sync_from_docs(session: Session) -> None:
     results4 = retriever.invoke("What role do coral reefs play in marine ecosystems?")
     assert validate_retrieval(results4, key_value="coral reefs")
 
+    results5 = vector_store.max_marginal_relevance_search(
+        "What role do coral reefs play in marine ecosystems?", k=3, fetch_k=10
+    )
+    assert len(results5) == 3  # noqa: PLR2004
+    assert validate_retrieval(results5, key_value="coral reefs")
+
+    mmr_retriever = vector_store.as_retriever(k=2, search_type="mmr")
+    results6 = mmr_retriever.invoke("What are Xenospheric Particulates?")
+    assert validate_retrieval(results6, key_value="Xenospheric Particulates")
+
 
 @pytest.mark.parametrize("session", ["cassandra", "astra_db"], indirect=["session"])
 async def test_async_from_docs(session: Session) -> None:
@@ -166,3 +176,38 @@ async def test_async_from_docs(session: Session) -> None:
         "What role do coral reefs play in marine ecosystems?"
     )
     assert validate_retrieval(results4, key_value="coral reefs")
+
+    results5 = await vector_store.amax_marginal_relevance_search(
+        "What role do coral reefs play in marine ecosystems?", k=3, fetch_k=10
+    )
+    assert len(results5) == 3  # noqa: PLR2004
+    assert validate_retrieval(results5, key_value="coral reefs")
+
+
+@pytest.mark.parametrize("session", ["cassandra", "astra_db"], indirect=["session"])
+def test_add_texts_multiple_documents(session: Session) -> None:
+    table_name = "LangChain_test_add_texts_multiple_documents"
+
+    database = CassandraDatabase.from_session(session=session, table_name=table_name)
+
+    embedding = TokensEmbeddings.colbert(doc_maxlen=250, chunk_batch_size=5)
+    vector_store = ColbertVectorStore(
+        database=database, embedding_model=embedding.get_embedding_model()
+    )
+
+    doc_chunks: List[Document] = get_test_chunks()
+    ids = vector_store.add_texts(
+        texts=[d.page_content for d in doc_chunks],
+        metadatas=[d.metadata for d in doc_chunks],
+        doc_id_key="name",
+    )
+
+    assert len(ids) == len(doc_chunks)
+    assert {i.rsplit("::", 1)[0] for i in ids} == {"marine_animals", "nebula_voyager"}
+
+    results = vector_store.similarity_search("What are Xenospheric Particulates?")
+    assert validate_retrieval(results, key_value="Xenospheric Particulates")
+
+    vector_store.delete(ids)
+    results = vector_store.similarity_search("What are Xenospheric Particulates?")
+    assert len(results) == 0
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from typing import TYPE_CHECKING, Any
 
 from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
@@ -43,6 +44,13 @@ class ColbertRetriever(BaseRetriever):
             verbose=verbose,
         )
 
+    @staticmethod
+    def _to_nodes(chunk_scores: list[tuple[Chunk, float]]) -> list[NodeWithScore]:
+        return [
+            NodeWithScore(node=TextNode(text=c.text, extra_info=c.metadata), score=s)
+            for (c, s) in chunk_scores
+        ]
+
     def _retrieve(
         self,
         query_bundle: QueryBundle,
@@ -52,7 +60,32 @@ class ColbertRetriever(BaseRetriever):
             k=self._k,
             query_maxlen=self._query_maxlen,
         )
-        return [
-            NodeWithScore(node=TextNode(text=c.text, extra_info=c.metadata), score=s)
-            for (c, s) in chunk_scores
-        ]
+        return self._to_nodes(chunk_scores)
+
+    async def _aretrieve(
+        self,
+        query_bundle: QueryBundle,
+    ) -> list[NodeWithScore]:
+        chunk_scores: list[tuple[Chunk, float]] = await self._retriever.atext_search(
+            query_text=query_bundle.query_str,
+            k=self._k,
+            query_maxlen=self._query_maxlen,
+        )
+        return self._to_nodes(chunk_scores)
+
+    async def abatch_retrieve(
+        self,
+        queries: list[str | QueryBundle],
+    ) -> list[list[NodeWithScore]]:
+        """Retrieve nodes for several queries concurrently.
+
+        All the queries share the event loop, so the database round-trips of
+        each search are interleaved rather than executed one query at a time.
+
+        Args:
+            queries: The query strings or bundles to retrieve nodes for.
+
+        Returns:
+            One list of scored nodes per query, in the order of `queries`.
+        """
+        return list(await asyncio.gather(*(self.aretrieve(q) for q in queries)))
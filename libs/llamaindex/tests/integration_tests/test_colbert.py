@@ -113,3 +113,58 @@ def test_sync(session: Session) -> None:
         QueryBundle("How do anglerfish adapt to the deep ocean's darkness?")
     )
     assert validate_retrieval(results, key_value="anglerfish")
+
+
+@pytest.mark.parametrize("session", ["astra_db"], indirect=["session"])  # "cassandra",
+async def test_async(session: Session) -> None:
+    table_name = "LlamaIndex_colbert_async"
+
+    batch_size = 5  # 640 recommended for production use
+    chunk_size = 256
+    chunk_overlap = 50
+
+    database = CassandraDatabase.from_session(session=session, table_name=table_name)
+    embedding_model = ColbertEmbeddingModel(
+        doc_maxlen=chunk_size,
+        chunk_batch_size=batch_size,
+    )
+
+    vector_store = ColbertVectorStore(
+        database=database,
+        embedding_model=embedding_model,
+    )
+
+    splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    pipeline = IngestionPipeline(transformations=[splitter])
+
+    docs = [
+        Document(
+            text=TestData.marine_animals_text(), extra_info={"name": "marine_animals"}
+        ),
+        Document(
+            text=TestData.nebula_voyager_text(), extra_info={"name": "nebula_voyager"}
+        ),
+    ]
+    for doc in docs:
+        nodes = pipeline.run(documents=[doc])
+        await vector_store.aadd_texts(
+            texts=[node.text for node in nodes],
+            metadatas=[node.metadata for node in nodes],
+            doc_id=doc.metadata["name"],
+        )
+
+    retriever = ColbertRetriever(
+        retriever=vector_store.as_retriever(), similarity_top_k=5
+    )
+
+    results = await retriever.aretrieve("Who developed the Astroflux Navigator?")
+    assert validate_retrieval(results, key_value="Astroflux Navigator")
+
+    batch_results = await retriever.abatch_retrieve(
+        [
+            QueryBundle("Describe the phenomena known as 'Chrono-spatial Echoes'"),
+            "How do anglerfish adapt to the deep ocean's darkness?",
+        ]
+    )
+    assert validate_retrieval(batch_results[0], key_value="Chrono-spatial Echoes")
+    assert validate_retrieval(batch_results[1], key_value="anglerfish")